@@ -1,137 +1,139 @@
-from flask import Blueprint, render_template, request
-import jwt
-from db_init import get_db_connection
-from config import FLASK_CONFIG
+from flask import Blueprint, render_template, make_response, g
+import logging
+import time
+from db_init import db_connection
+from config import ADMIN_PAGE_CONFIG
+from serializers import format_date, format_datetime
+from pagination import encode_cursor
+from images import parse_variants, thumbnail_url
+
+logger = logging.getLogger(__name__)
 
 # 创建蓝图
 admin_bp = Blueprint('admin', __name__)
 
-# 管理后台
+
+# 查询当前登录用户信息
+def _current_user(c):
+    if not g.user:
+        return None
+    c.execute('SELECT id, username, email, phone, organization, is_admin FROM users WHERE id = %s', (g.user['user_id'],))
+    user_data = c.fetchone()
+    if not user_data:
+        return None
+    return {
+        'id': user_data[0],
+        'username': user_data[1],
+        'email': user_data[2],
+        'phone': user_data[3],
+        'organization': user_data[4],
+        'is_admin': user_data[5] if len(user_data) > 5 else 0
+    }
+
+
+# 渲染页面并通过 Server-Timing 响应头返回数据库查询和模板渲染耗时，超出预算时记录警告
+def _render_timed(template, started, db_done, **context):
+    html = render_template(template, **context)
+    finished = time.perf_counter()
+    db_ms = (db_done - started) * 1000
+    render_ms = (finished - db_done) * 1000
+    total_ms = (finished - started) * 1000
+    if total_ms > ADMIN_PAGE_CONFIG['render_budget_ms']:
+        logger.warning("页面 %s 耗时 %.1fms 超出预算 %sms（查询 %.1fms，渲染 %.1fms）",
+                       template, total_ms, ADMIN_PAGE_CONFIG['render_budget_ms'], db_ms, render_ms)
+    response = make_response(html)
+    response.headers['Server-Timing'] = f'db;dur={db_ms:.1f}, render;dur={render_ms:.1f}, total;dur={total_ms:.1f}'
+    return response
+
+
+# 管理后台：首屏只渲染第一页课程，其余由前端按游标分页加载
 @admin_bp.route('/admin')
 def admin_dashboard():
+    started = time.perf_counter()
+    page_size = ADMIN_PAGE_CONFIG['page_size']
     # 获取课程数据
     courses = []
     user = None
-    # 从请求头或cookie中获取token
-    token = request.headers.get('Authorization') or request.headers.get('authorization') or request.cookies.get('token')
+    next_cursor = None
     
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
+        with db_connection() as conn:
+            c = conn.cursor()
         
-        # 尝试解码token获取当前用户信息
-        if token:
-            # 移除Bearer前缀（如果有）
-            if token.startswith('Bearer '):
-                token = token[7:]
-            try:
-                # 解码token
-                data = jwt.decode(token, FLASK_CONFIG['SECRET_KEY'], algorithms=['HS256'])
-                user_id = data['user_id']
-                
-                # 获取当前用户信息
-                c.execute('SELECT id, username, email, phone, organization, is_admin FROM users WHERE id = %s', (user_id,))
-                user_data = c.fetchone()
-                if user_data:
-                    user = {
-                        'id': user_data[0],
-                        'username': user_data[1],
-                        'email': user_data[2],
-                        'phone': user_data[3],
-                        'organization': user_data[4],
-                        'is_admin': user_data[5] if len(user_data) > 5 else 0
-                    }
-            except Exception as e:
-                pass
+            # 获取当前用户信息
+            user = _current_user(c)
         
-        # 获取所有课程及其报名人数
-        c.execute('''
-            SELECT c.*, COUNT(r.id) as registered 
-            FROM courses c
-            LEFT JOIN registrations r ON c.id = r.course_id
-            GROUP BY c.id
-            ORDER BY c.date DESC
-        ''')
-        courses_data = c.fetchall()
+            # 获取第一页课程，排序与 /api/courses 的游标分页一致，多取一条用于判断是否还有下一页
+            c.execute('SELECT * FROM courses ORDER BY date DESC, id DESC LIMIT %s', (page_size + 1,))
+            courses_data = c.fetchall()
+            if len(courses_data) > page_size:
+                courses_data = courses_data[:page_size]
+                next_cursor = encode_cursor([courses_data[-1][3], courses_data[-1][0]])
         
-        for course in courses_data:
-            courses.append({
-                'id': course[0],
-                'title': course[1],
-                'description': course[2],
-                'date': course[3],
-                'time': course[4],
-                'location': course[5],
-                'capacity': course[6],
-                'registered': course[11],  # 使用COUNT(r.id)的结果
-                'registration_start': course[8],  # 正确的registration_start字段
-                'registration_end': course[9],  # 正确的registration_end字段
-                'class_start': course[8],  # 使用registration_start作为class_start
-                'image': course[10] if len(course) > 10 else ''  # 正确的image字段
-            })
-        
-        conn.close()
+            for course in courses_data:
+                courses.append({
+                    'id': course[0],
+                    'title': course[1],
+                    'description': course[2],
+                    'date': format_date(course[3]),
+                    'time': course[4],
+                    'location': course[5],
+                    'capacity': course[6],
+                    'registered': course[7],
+                    'registration_start': format_datetime(course[8]),  # 正确的registration_start字段
+                    'registration_end': format_datetime(course[9]),  # 正确的registration_end字段
+                    'class_start': format_datetime(course[8]),  # 使用registration_start作为class_start
+                    'image': course[10] if len(course) > 10 else '',  # 正确的image字段
+                    'thumbnail': thumbnail_url(course[10] if len(course) > 10 else '',
+                                               parse_variants(course[11] if len(course) > 11 else None))
+                })
     except Exception as e:
-        pass
+        logger.exception("加载管理后台课程失败")
     
-    return render_template('admin.html', courses=courses, user=user)
+    return _render_timed('admin.html', started, time.perf_counter(),
+                         courses=courses, user=user, next_cursor=next_cursor, page_size=page_size)
 
+# 用户管理：首屏只渲染第一页用户，其余由前端按游标分页加载
 @admin_bp.route('/admin/users')
 def admin_users():
-    # 从请求头或cookie中获取JWT令牌
-    token = request.headers.get('Authorization') or request.headers.get('authorization') or request.cookies.get('token')
+    started = time.perf_counter()
+    page_size = ADMIN_PAGE_CONFIG['page_size']
+    # 认证中间件已从请求头或cookie中解析出当前用户
+    token = g.token
     user = None
     users = []
+    next_cursor = None
     
     try:
         # 从数据库中获取用户信息
-        conn = get_db_connection()
-        c = conn.cursor()
-        
-        # 尝试解码token获取当前用户信息
-        if token:
-            # 移除Bearer前缀（如果有）
-            if token.startswith('Bearer '):
-                token = token[7:]
-            try:
-                # 解码token
-                data = jwt.decode(token, FLASK_CONFIG['SECRET_KEY'], algorithms=['HS256'])
-                user_id = data['user_id']
-                
-                # 获取当前用户信息
-                c.execute('SELECT id, username, email, phone, organization, is_admin FROM users WHERE id = %s', (user_id,))
-                user_data = c.fetchone()
-                if user_data:
-                    user = {
-                        'id': user_data[0],
-                        'username': user_data[1],
-                        'email': user_data[2],
-                        'phone': user_data[3],
-                        'organization': user_data[4],
-                        'is_admin': user_data[5] if len(user_data) > 5 else 0
-                    }
-            except Exception as e:
-                pass
+        with db_connection() as conn:
+            c = conn.cursor()
         
-        # 总是获取所有用户列表
-        c.execute('SELECT id, username, email, phone, organization, is_admin, wechat_unionid, wechat_openid, is_wechat_user FROM users')
-        users_data = c.fetchall()
-        for u in users_data:
-            users.append({
-                'id': u[0],
-                'username': u[1],
-                'email': u[2],
-                'phone': u[3],
-                'organization': u[4],
-                'is_admin': u[5] if len(u) > 5 else 0,
-                'is_wechat_user': u[8] if len(u) > 8 else 0
-            })
+            # 获取当前用户信息
+            user = _current_user(c)
         
-        conn.close()
+            # 获取第一页用户，排序与 /api/admin/users 的游标分页一致
+            c.execute('''SELECT id, username, email, phone, organization, is_admin, wechat_unionid, wechat_openid, is_wechat_user
+                         FROM users ORDER BY username ASC, id ASC LIMIT %s''', (page_size + 1,))
+            users_data = c.fetchall()
+            if len(users_data) > page_size:
+                users_data = users_data[:page_size]
+                next_cursor = encode_cursor([users_data[-1][1], users_data[-1][0]])
+            for u in users_data:
+                users.append({
+                    'id': u[0],
+                    'username': u[1],
+                    'email': u[2],
+                    'phone': u[3],
+                    'organization': u[4],
+                    'is_admin': u[5] if len(u) > 5 else 0,
+                    'is_wechat_user': u[8] if len(u) > 8 else 0
+                })
     except Exception as e:
-        pass
+        logger.exception("加载用户列表失败")
     
-    return render_template('user_management.html', user=user, users=users, token=token)
+    return _render_timed('user_management.html', started, time.perf_counter(),
+                         user=user, users=users, token=token, next_cursor=next_cursor, page_size=page_size)
 
 # 提供一个函数来注册蓝图
 def register_routes(app):
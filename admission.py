@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from config import ADMISSION_CONFIG, ENVIRONMENT, DB_POOL_CONFIG
+from db_init import db_connection
+
+logger = logging.getLogger(__name__)
+
+
+# 报名准入层：在进程内维护每门课程的剩余名额，课程已满的请求直接拒绝，不再访问MySQL。
+# 计数只是乐观的前置过滤，最终是否报名成功仍以数据库中的原子抢占为准。
+class SeatCounter:
+    def __init__(self, refresh_interval=5):
+        self.refresh_interval = refresh_interval
+        # course_id -> [剩余名额, 加载时间]
+        self._seats = {}
+        self._lock = threading.Lock()
+
+    def _load(self, course_id):
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT capacity - registered FROM courses WHERE id = %s', (course_id,))
+            row = c.fetchone()
+        return None if row is None else max(row[0], 0)
+
+    # 尝试占用一个名额；返回False表示课程已满，None表示课程不存在（交给数据库给出结果）
+    def try_acquire(self, course_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seats.get(course_id)
+            if entry is not None and now - entry[1] <= self.refresh_interval:
+                if entry[0] <= 0:
+                    return False
+                entry[0] -= 1
+                return True
+
+        # 缓存缺失或已过期，从数据库重新加载（其他进程的报名/取消会在这里同步过来）
+        remaining = self._load(course_id)
+        if remaining is None:
+            return None
+        with self._lock:
+            entry = self._seats[course_id] = [remaining, now]
+            if entry[0] <= 0:
+                return False
+            entry[0] -= 1
+            return True
+
+    # 归还本次请求占用但未写入数据库的名额（报名失败）
+    def release(self, course_id):
+        with self._lock:
+            entry = self._seats.get(course_id)
+            if entry is not None:
+                entry[0] += 1
+
+    # 数据库确认课程已满，后续请求直接拒绝直到下次刷新
+    def mark_full(self, course_id):
+        with self._lock:
+            entry = self._seats.get(course_id)
+            if entry is not None:
+                entry[0] = 0
+
+    # 课程容量变化或课程被删除时丢弃计数，下次访问时重新加载
+    def invalidate(self, course_id=None):
+        with self._lock:
+            if course_id is None:
+                self._seats.clear()
+            else:
+                self._seats.pop(course_id, None)
+
+    # 按报名记录表重新计算所有课程的剩余名额，启动时调用
+    def reconcile(self):
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute('''SELECT c.id, c.capacity - COUNT(r.id)
+                         FROM courses c
+                         LEFT JOIN registrations r ON c.id = r.course_id
+                         GROUP BY c.id, c.capacity''')
+            rows = c.fetchall()
+        now = time.monotonic()
+        with self._lock:
+            self._seats = {course_id: [max(remaining, 0), now] for course_id, remaining in rows}
+        return len(rows)
+
+
+seat_counter = SeatCounter(ADMISSION_CONFIG['refresh_interval'])
+
+# 每个进程同时写库的报名请求数。必须小于工作线程数（与gunicorn.conf.py的算法一致），
+# 否则所有线程都能同时拿到名额，排队不起作用
+def _max_inflight():
+    threads = min(ENVIRONMENT['production']['threads'], DB_POOL_CONFIG['pool_size'])
+    limit = max(1, threads - 1)
+    configured = ADMISSION_CONFIG['max_inflight']
+    if configured <= 0:
+        return max(1, threads // 2)
+    if configured > limit:
+        logger.warning("max_inflight=%s 不小于工作线程数 %s，改为 %s", configured, threads, limit)
+        return limit
+    return configured
+
+
+# 限制同时写库的报名请求数，抢到名额的请求在进程内排队，避免全部堆积在同一行锁上
+_write_slots = threading.BoundedSemaphore(_max_inflight())
+
+
+# 获取写库名额，超时返回False
+def acquire_write_slot():
+    return _write_slots.acquire(timeout=ADMISSION_CONFIG['queue_timeout'])
+
+
+def release_write_slot():
+    _write_slots.release()
+
+
+def is_enabled():
+    return ADMISSION_CONFIG['enabled']
+
+
+# 导出
+__all__ = ['SeatCounter', 'seat_counter', 'acquire_write_slot', 'release_write_slot', 'is_enabled']
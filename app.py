@@ -1,57 +1,96 @@
-from flask import Flask, redirect, url_for, render_template, request
+import os
+from flask import Flask, redirect, url_for
 from flask_cors import CORS
-from config import DB_CONFIG, WECHAT_CONFIG, FLASK_CONFIG, ENVIRONMENT
+from config import FLASK_CONFIG, ENVIRONMENT, STARTUP_CONFIG, UPLOAD_CONFIG
 from db_init import init_db
+from log_utils import setup_logging, register_request_id
+from uploads import UploadRequest, send_upload
 
-# 创建Flask应用
-app = Flask(__name__, template_folder='src/views')
-# 配置CORS，允许前端地址访问
-CORS(app, resources={"/*": {"origins": "http://localhost:5173"}})
-app.config['SECRET_KEY'] = FLASK_CONFIG['SECRET_KEY']
-app.config['TEMPLATES_AUTO_RELOAD'] = True
 
-# 添加uploads目录的静态文件访问
-import os
-uploads_dir = os.path.join(app.root_path, 'uploads')
-if not os.path.exists(uploads_dir):
-    os.makedirs(uploads_dir)
-# 保持默认的静态文件夹设置，同时添加uploads目录的访问
-from flask import send_from_directory
-
-@app.route('/uploads/<path:filename>')
-def uploads(filename):
-    return send_from_directory(uploads_dir, filename)
-
-# 初始化数据库
-init_db()
-
-# 导入并注册蓝图
-from user import register_routes as user_routes
-from course import register_routes as course_routes
-from login import register_routes as login_routes
-from wx_login import register_routes as wx_login_routes
-from admin import register_routes as admin_routes
-
-# 注册所有路由
-user_routes(app)
-course_routes(app)
-login_routes(app)
-wx_login_routes(app)
-admin_routes(app)
-
-# 页面路由配置
-@app.route('/')
-def index():
-    # 重定向到管理后台
-    return redirect(url_for('admin.admin_dashboard'))
-
-@app.route('/login')
-def login_page():
-    return render_template('login.html')
-
-# 管理后台
+# 是否启用快速启动（跳过数据库迁移检查）
+def _fast_startup():
+    return STARTUP_CONFIG['fast_startup'] or os.environ.get('FAST_STARTUP') == '1'
+
+
+# 创建Flask应用（应用工厂，开发服务器和生产环境的WSGI服务器共用）
+def create_app():
+    # 初始化日志
+    setup_logging()
+
+    app = Flask(__name__, template_folder='src/views')
+    # 上传文件边接收边写入uploads目录，并限制请求体大小
+    app.request_class = UploadRequest
+    app.config['MAX_CONTENT_LENGTH'] = UPLOAD_CONFIG['max_content_length']
+    # 配置CORS，允许前端地址访问
+    CORS(app, resources={"/*": {"origins": "http://localhost:5173"}})
+    app.config['SECRET_KEY'] = FLASK_CONFIG['SECRET_KEY']
+    app.config['TEMPLATES_AUTO_RELOAD'] = True
+    app.config['USE_X_SENDFILE'] = UPLOAD_CONFIG['sendfile'] == 'x-sendfile'
+
+    # 添加uploads目录的静态文件访问
+    uploads_dir = os.path.join(app.root_path, 'uploads')
+    if not os.path.exists(uploads_dir):
+        os.makedirs(uploads_dir)
+
+    # 保持默认的静态文件夹设置，同时添加uploads目录的访问
+    @app.route('/uploads/<path:filename>')
+    def uploads(filename):
+        return send_upload(uploads_dir, filename)
+
+    # 初始化数据库：执行尚未执行的迁移，快速启动模式下跳过
+    if not _fast_startup():
+        init_db()
+
+    # 启用报名准入层时，按报名记录表校准各课程剩余名额
+    import admission
+    if admission.is_enabled():
+        admission.seat_counter.reconcile()
+
+    # 定期核对课程报名人数（gunicorn预加载时只在主进程中运行）
+    import registration_counts
+    registration_counts.start_scheduler()
+
+    # 定期清理上传目录中不再被引用的文件
+    import upload_gc
+    upload_gc.start_sweeper()
+
+    # 为每个请求分配请求ID，用于日志关联
+    register_request_id(app)
+
+    # 注册认证中间件
+    from auth import register_middleware
+    register_middleware(app)
+
+    # 导入并注册蓝图
+    from user import register_routes as user_routes
+    from course import register_routes as course_routes
+    from login import register_routes as login_routes
+    from wx_login import register_routes as wx_login_routes
+    from admin import register_routes as admin_routes
+
+    # 注册所有路由
+    user_routes(app)
+    course_routes(app)
+    login_routes(app)
+    wx_login_routes(app)
+    admin_routes(app)
+
+    # 页面路由配置
+    @app.route('/')
+    def index():
+        # 重定向到管理后台
+        return redirect(url_for('admin.admin_dashboard'))
+
+    @app.route('/login')
+    def login_page():
+        from login import render_login_page
+        return render_login_page()
+
+    return app
+
 
 if __name__ == '__main__':
     env = os.environ.get('FLASK_ENV', 'development')
     config = ENVIRONMENT.get(env, ENVIRONMENT['development'])
+    app = create_app()
     app.run(debug=config['debug'], host=config['host'], port=config['port'])
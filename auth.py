@@ -1,61 +1,191 @@
-from flask import request, jsonify
+from flask import request, jsonify, g
 import jwt
-import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
-from db_init import get_db_connection
-from config import FLASK_CONFIG
+from db_init import db_connection
+from cache import cache, LocalCache
+from config import FLASK_CONFIG, AUTH_CACHE_CONFIG
 
+logger = logging.getLogger(__name__)
 
-# 管理员权限验证装饰器
-def admin_required(f):
+
+# 已验证令牌缓存：token -> 用户上下文 {'user_id'}，有容量上限和过期时间（LRU淘汰）。
+# 令牌内容不会变化，可以安全地在进程内缓存；管理员标记会变化，不放在这里
+class TokenCache:
+    def __init__(self, max_entries=10000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # token -> (用户上下文, 过期时间)
+        self._entries = OrderedDict()
+        # user_id -> 该用户已缓存的token集合，用于按用户失效
+        self._tokens_by_user = {}
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                self._remove(token)
+                return None
+            self._entries.move_to_end(token)
+            return entry[0]
+
+    # 缓存时间不超过令牌本身的过期时间
+    def put(self, token, user, token_exp=None):
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (user, expires_at)
+            self._tokens_by_user.setdefault(user['user_id'], set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    # 用户权限变化时清除该用户的所有缓存令牌
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _remove(self, token):
+        user, _ = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(user['user_id'])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user['user_id']]
+
+
+token_cache = TokenCache(AUTH_CACHE_CONFIG['max_entries'], AUTH_CACHE_CONFIG['ttl'])
+
+# 未使用redis时管理员标记的进程内缓存：失效只对当前进程生效，
+# 其他进程最多在 admin_ttl 秒内沿用旧的管理员标记
+_admin_cache = LocalCache(AUTH_CACHE_CONFIG['max_entries'], AUTH_CACHE_CONFIG['admin_ttl'])
+
+
+# 从请求中取出token：优先Authorization头，页面路由（非/api/）再回退到cookie
+def _extract_token():
+    token = request.headers.get('Authorization') or request.headers.get('authorization')
+    if not token and not request.path.startswith('/api/'):
+        token = request.cookies.get('token')
+    if token and token.startswith('Bearer '):
+        token = token[7:]
+    return token
+
+
+# 验证token并返回本次请求的用户上下文，命中缓存时不再解码
+def verify_token(token):
+    user = token_cache.get(token)
+    if user is None:
+        data = jwt.decode(token, FLASK_CONFIG['SECRET_KEY'], algorithms=['HS256'])
+        user = {'user_id': data['user_id']}
+        token_cache.put(token, user, data.get('exp'))
+    # is_admin 在本次请求第一次需要时才查询
+    return {'user_id': user['user_id'], 'is_admin': None}
+
+
+# 认证中间件：每个请求只解码一次token，结果放在 g.user / g.auth_error
+def load_current_user():
+    g.user = None
+    g.auth_error = None
+    g.token = _extract_token()
+    if not g.token:
+        g.auth_error = ('缺少认证令牌', 401)
+        return
+    try:
+        g.user = verify_token(g.token)
+    except jwt.ExpiredSignatureError:
+        g.auth_error = ('认证令牌已过期', 401)
+    except (jwt.InvalidTokenError, KeyError) as e:
+        logger.debug("无效的认证令牌: %s", e)
+        g.auth_error = ('无效的认证令牌', 401)
+
+
+def _load_is_admin(user_id):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT is_admin FROM users WHERE id = %s', (user_id,))
+        row = c.fetchone()
+    return row[0] if row else 0
+
+
+def _admin_key(user_id):
+    return f'auth:is_admin:{user_id}'
+
+
+# 判断当前用户是否为管理员，同一请求内只查询一次。
+# 缓存在多进程间共享（redis）时权限变更对所有进程同时生效；
+# 否则在进程内短暂缓存，权限变更最多滞后 AUTH_CACHE_CONFIG['admin_ttl'] 秒
+def is_admin(user):
+    if user['is_admin'] is None:
+        user_id = user['user_id']
+        if cache.shared:
+            user['is_admin'] = cache.get_or_load(_admin_key(user_id), lambda: _load_is_admin(user_id))
+        elif AUTH_CACHE_CONFIG['admin_ttl'] > 0:
+            value = _admin_cache.get(user_id)
+            if value is None:
+                value = _load_is_admin(user_id)
+                _admin_cache.set(user_id, value)
+            user['is_admin'] = value
+        else:
+            user['is_admin'] = _load_is_admin(user_id)
+    return user['is_admin'] == 1
+
+
+# 用户的管理员标记变化后调用
+def invalidate_user(user_id):
+    token_cache.invalidate_user(user_id)
+    _admin_cache.delete(user_id)
+    if cache.shared:
+        cache.delete(_admin_key(user_id))
+
+
+# 登录验证装饰器
+def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # 检查JWT认证
-        token = request.headers.get('Authorization') or request.headers.get('authorization')
-        print(f"获取到的Authorization头: {token}")
+        if g.get('user') is None:
+            message, status = g.get('auth_error') or ('缺少认证令牌', 401)
+            return jsonify({'message': message}), status
+        return f(*args, **kwargs)
 
-        if not token:
-            print("未获取到认证令牌")
-            return jsonify({'message': '缺少认证令牌'}), 401
+    return decorated_function
 
-        # 移除Bearer前缀
-        if token.startswith('Bearer '):
-            token = token[7:]
-            print(f"移除Bearer前缀后的token: {token[:20]}...")
+
+# 管理员权限验证装饰器
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if g.get('user') is None:
+            message, status = g.get('auth_error') or ('缺少认证令牌', 401)
+            return jsonify({'message': message}), status
 
         try:
-            # 解码token
-            data = jwt.decode(token, FLASK_CONFIG['SECRET_KEY'], algorithms=['HS256'])
-            user_id = data['user_id']
-            print(f"解码token成功，用户ID: {user_id}")
-
-            # 查找用户
-            conn = get_db_connection()
-            c = conn.cursor()
-            c.execute('SELECT is_admin FROM users WHERE id = %s', (user_id,))
-            user = c.fetchone()
-            print(f"查询到的用户信息: {user}")
-            conn.close()
-
-            # 检查用户是否存在且是管理员
-            if not user:
-                print("用户不存在")
+            if not is_admin(g.user):
+                logger.info("非管理员访问管理接口，用户ID: %s", g.user['user_id'])
                 return jsonify({'message': '权限不足'}), 403
-            if user[0] != 1:
-                print(f"用户不是管理员，is_admin值: {user[0]}")
-                return jsonify({'message': '权限不足'}), 403
-
-            print("JWT认证成功")
-        except jwt.ExpiredSignatureError:
-            print("认证令牌已过期")
-            return jsonify({'message': '认证令牌已过期'}), 401
-        except jwt.InvalidTokenError as e:
-            print(f"无效的认证令牌: {str(e)}")
-            return jsonify({'message': '无效的认证令牌'}), 401
-        except Exception as e:
-            print(f"服务器错误: {str(e)}")
+        except Exception:
+            logger.exception("管理员权限校验失败")
             return jsonify({'message': '服务器错误'}), 500
 
         return f(*args, **kwargs)
 
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+
+# 注册认证中间件
+def register_middleware(app):
+    app.before_request(load_current_user)
@@ -0,0 +1,85 @@
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+from captcha import CaptchaPool, render_captcha, _new_captcha
+
+
+# 优化前的生成方式：每次加载字体、RGB模式绘制、默认PNG压缩级别
+def _render_legacy(captcha_text):
+    width, height = 120, 40
+    image = Image.new('RGB', (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+
+    def random_color():
+        return (random.randint(0, 120), random.randint(0, 120), random.randint(0, 120))
+
+    for _ in range(5):
+        start = (random.randint(0, width), random.randint(0, height))
+        end = (random.randint(0, width), random.randint(0, height))
+        draw.line([start, end], fill=random_color(), width=1)
+    for _ in range(50):
+        draw.point((random.randint(0, width), random.randint(0, height)), fill=random_color())
+    try:
+        font = ImageFont.truetype('arial.ttf', 28)
+    except OSError:
+        font = ImageFont.load_default()
+    x = (width - draw.textlength(captcha_text, font=font)) // 2
+    y = (height - 30) // 2
+    for char in captcha_text:
+        char_width = draw.textlength(char, font=font)
+        draw.text((x, y), char, font=font, fill=random_color())
+        x += char_width + 2
+    buffer = BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _text():
+    return ''.join(random.choice(string.ascii_letters + string.digits) for _ in range(4))
+
+
+def _rate(func, seconds):
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        func()
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+# 对比每秒可生成/取出的验证码数量：python bench/captcha_rate.py
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='验证码生成速度')
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args(argv)
+
+    legacy = _rate(lambda: _render_legacy(_text()), args.seconds)
+    rendered = _rate(lambda: render_captcha(_text()), args.seconds)
+    print(f'优化前（每次加载字体，RGB）: {legacy:.0f} 个/秒')
+    print(f'直接生成（字体缓存，调色板）: {rendered:.0f} 个/秒')
+
+    # 请求从预生成池中取出；池大小足够时不在请求线程中绘制
+    pool = CaptchaPool(size=1000, low_watermark=500)
+    pool.take()
+    while len(pool._items) < pool.size:
+        time.sleep(0.05)
+    count = 0
+    started = time.perf_counter()
+    while len(pool._items) > pool.low_watermark:
+        pool.take()
+        count += 1
+    elapsed = time.perf_counter() - started
+    print(f'从预生成池取出: {count / elapsed:.0f} 个/秒（后台补充速度与直接生成相同: {_rate(_new_captcha, 1):.0f} 个/秒）')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+from config import PASSWORD_CONFIG
+import passwords
+
+
+def _logins(hashed, seconds, concurrency):
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        count = busy = 0
+        while time.perf_counter() < deadline:
+            try:
+                passwords.verify_password('admin123', hashed)
+                count += 1
+            except passwords.PasswordServiceBusy:
+                busy += 1
+        return count, busy
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda _: client(), range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return sum(r[0] for r in results) / elapsed, sum(r[1] for r in results)
+
+
+# 报告不同成本因子下每秒可完成的密码校验（登录）次数，以及折算到每个CPU核心的次数：
+# python bench/password_rate.py --rounds 10 12
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='密码校验吞吐量')
+    parser.add_argument('--rounds', type=int, nargs='+', default=[PASSWORD_CONFIG['rounds']])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--concurrency', type=int, default=32, help='同时登录的请求线程数')
+    args = parser.parse_args(argv)
+
+    cores = min(os.cpu_count() or 1, PASSWORD_CONFIG['workers'])
+    print(f"哈希线程数: {PASSWORD_CONFIG['workers']}  可用CPU核心: {os.cpu_count()}")
+    for rounds in args.rounds:
+        hashed = bcrypt.hashpw(b'admin123', bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+        rate, busy = _logins(hashed, args.seconds, args.concurrency)
+        print(f'rounds={rounds}: {rate:.1f} 次/秒，每核心 {rate / cores:.1f} 次/秒，返回429的请求 {busy} 次')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
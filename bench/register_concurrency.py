@@ -0,0 +1,133 @@
+import argparse
+import datetime
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from config import FLASK_CONFIG
+from db_init import db_connection
+
+
+def _create_course(capacity):
+    course_id = str(uuid.uuid4())
+    now = datetime.datetime.now().replace(microsecond=0)
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('''INSERT INTO courses (id, title, description, date, time, location, capacity, registered, registration_start, registration_end, image)
+                     VALUES (%s, %s, %s, %s, %s, %s, %s, 0, %s, %s, %s)''',
+                  (course_id, '报名压测', '', now.date(), '09:00', '', capacity,
+                   now - datetime.timedelta(hours=1), now + datetime.timedelta(hours=1), ''))
+        conn.commit()
+    return course_id
+
+
+# 报名记录的user_id有外键约束，压测用户必须真实存在
+def _create_users(count, batch=1000):
+    user_ids = [str(uuid.uuid4()) for _ in range(count)]
+    with db_connection() as conn:
+        c = conn.cursor()
+        for start in range(0, count, batch):
+            c.executemany('''INSERT INTO users (id, username, email, password, phone, organization, address, is_admin)
+                             VALUES (%s, %s, %s, %s, %s, %s, %s, 0)''',
+                          [(user_id, f'bench-{user_id[:8]}', f'{user_id}@bench.example.com', '!', '13800000000', '报名压测', '')
+                           for user_id in user_ids[start:start + batch]])
+        conn.commit()
+    return user_ids
+
+
+def _cleanup(course_id, user_ids, batch=1000):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('DELETE FROM registrations WHERE course_id = %s', (course_id,))
+        c.execute('DELETE FROM courses WHERE id = %s', (course_id,))
+        for start in range(0, len(user_ids), batch):
+            chunk = user_ids[start:start + batch]
+            c.execute(f"DELETE FROM users WHERE id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+        conn.commit()
+
+
+def _counts(course_id):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT registered FROM courses WHERE id = %s', (course_id,))
+        registered = c.fetchone()[0]
+        c.execute('SELECT COUNT(*) FROM registrations WHERE course_id = %s', (course_id,))
+        return registered, c.fetchone()[0]
+
+
+def _register(url, token):
+    req = urllib.request.Request(url, method='POST', headers={'Authorization': f'Bearer {token}'})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+# 对运行中的服务（如 gunicorn -c gunicorn.conf.py wsgi:app）同时发起大量报名请求，
+# 检查没有超卖，并报告延迟分布：python bench/register_concurrency.py --requests 2000 --capacity 100
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='课程报名并发压测')
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--capacity', type=int, default=100)
+    parser.add_argument('--p99-target', type=float, default=500, help='p99延迟目标（毫秒）')
+    args = parser.parse_args(argv)
+
+    course_id = _create_course(args.capacity)
+    user_ids = _create_users(args.requests)
+    try:
+        url = f'{args.base_url}/api/courses/{course_id}/register'
+        tokens = [jwt.encode({'user_id': user_id, 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)},
+                             FLASK_CONFIG['SECRET_KEY'], algorithm='HS256') for user_id in user_ids]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(lambda token: _register(url, token), tokens))
+        elapsed = time.perf_counter() - started
+
+        statuses = Counter(status for status, _ in results)
+        latencies = [latency * 1000 for _, latency in results]
+        registered, rows = _counts(course_id)
+        p99 = _percentile(latencies, 0.99)
+        print(f'请求数: {args.requests}  并发: {args.concurrency}  耗时: {elapsed:.2f}s  吞吐: {args.requests / elapsed:.0f} req/s')
+        print(f'状态码: {dict(statuses)}')
+        print(f'延迟 p50: {_percentile(latencies, 0.5):.1f}ms  p99: {p99:.1f}ms  max: {max(latencies):.1f}ms')
+        print(f'容量: {args.capacity}  registered: {registered}  报名记录: {rows}')
+
+        # 每个请求都必须得到确定的结果：报名成功（200）或课程已满（409）
+        unexpected = {status: count for status, count in statuses.items() if status not in (200, 409)}
+        expected_success = min(args.capacity, args.requests)
+        if unexpected:
+            print(f'失败：出现非200/409的响应 {unexpected}')
+        elif statuses[200] != registered or registered != rows or rows > args.capacity:
+            print('失败：报名人数与报名记录不一致或超卖')
+        elif statuses[200] != expected_success:
+            print(f'失败：报名成功 {statuses[200]} 人，应为 {expected_success} 人')
+        elif p99 > args.p99_target:
+            print(f'失败：p99 超出目标 {args.p99_target}ms')
+        else:
+            return 0
+        return 1
+    finally:
+        _cleanup(course_id, user_ids)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
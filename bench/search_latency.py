@@ -0,0 +1,85 @@
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SEARCH_CONFIG
+from db_init import db_connection
+from search import build_search
+
+# 生成测试课程标题和描述用的词
+_WORDS = ['急救', '心肺复苏', '培训', '院前', '创伤', '止血', '包扎', '转运', '气道', '除颤',
+          'first', 'aid', 'basic', 'life', 'support', 'trauma', 'airway', 'course']
+
+# 压测数据的标题前缀，用于清理
+_MARK = 'bench-search'
+
+
+def _fill(c, rows, batch=1000):
+    now = datetime.datetime.now().replace(microsecond=0)
+    for start in range(0, rows, batch):
+        values = []
+        for _ in range(min(batch, rows - start)):
+            title = f"{_MARK} {' '.join(random.sample(_WORDS, 3))}"
+            description = ' '.join(random.choices(_WORDS, k=30))
+            values.append((str(uuid.uuid4()), title, description, now.date(), '09:00', '', 30, 0, now, now, ''))
+        c.executemany('''INSERT INTO courses (id, title, description, date, time, location, capacity, registered, registration_start, registration_end, image)
+                         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)''', values)
+
+
+def _time_query(c, search, fulltext, repeat):
+    SEARCH_CONFIG['fulltext'] = fulltext
+    condition, params, order_sql, order_params = build_search(['title', 'description'], search)
+    sql = f'SELECT id FROM courses WHERE {condition}'
+    if order_sql:
+        sql += f' ORDER BY {order_sql}'
+        params = params + order_params
+    sql += ' LIMIT 20'
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        c.execute(sql, params)
+        c.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+# 对比LIKE与FULLTEXT(ngram)搜索课程的延迟：python bench/search_latency.py --rows 100000
+# 会向配置的数据库写入压测课程，结束后删除
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='课程搜索延迟对比')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--keep', action='store_true', help='保留压测数据，便于重复运行')
+    args = parser.parse_args(argv)
+
+    with db_connection() as conn:
+        c = conn.cursor()
+        try:
+            c.execute('SELECT COUNT(*) FROM courses WHERE title LIKE %s', (f'{_MARK}%',))
+            existing = c.fetchone()[0]
+            if existing < args.rows:
+                _fill(c, args.rows - existing)
+                conn.commit()
+
+            print(f'课程数: {args.rows}  每个查询执行 {args.repeat} 次，取中位数')
+            print(f"{'搜索词':<12}{'LIKE(ms)':>12}{'FULLTEXT(ms)':>16}")
+            for search in ['心肺复苏', '止血 包扎', 'airway', 'aid', '急']:
+                like_ms = _time_query(c, search, False, args.repeat)
+                fulltext_ms = _time_query(c, search, True, args.repeat)
+                print(f'{search:<12}{like_ms:>12.2f}{fulltext_ms:>16.2f}')
+        finally:
+            if not args.keep:
+                c.execute('DELETE FROM courses WHERE title LIKE %s', (f'{_MARK}%',))
+                conn.commit()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
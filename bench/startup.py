@@ -0,0 +1,46 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在新进程中测量：导入wsgi（创建应用）的耗时，以及第一个请求的耗时
+_PROBE = '''
+import time
+started = time.perf_counter()
+import wsgi
+imported = time.perf_counter()
+with wsgi.app.test_client() as client:
+    status = client.get(%r).status_code
+finished = time.perf_counter()
+print(imported - started, finished - imported, status)
+'''
+
+
+def _measure(path, fast):
+    env = dict(os.environ, FAST_STARTUP='1' if fast else '0')
+    output = subprocess.run([sys.executable, '-c', _PROBE % path], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout.split()
+    return float(output[0]) * 1000, float(output[1]) * 1000, int(output[2])
+
+
+# 对比正常启动与快速启动（FAST_STARTUP=1）的应用创建耗时和首个请求耗时：python bench/startup.py
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='应用启动耗时')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--path', default='/api/courses', help='首个请求的路径')
+    args = parser.parse_args(argv)
+
+    print(f"{'模式':<10}{'导入(ms)':>12}{'首个请求(ms)':>16}")
+    for fast in (False, True):
+        results = [_measure(args.path, fast) for _ in range(args.repeat)]
+        import_ms = statistics.median(r[0] for r in results)
+        first_ms = statistics.median(r[1] for r in results)
+        print(f"{'快速启动' if fast else '正常启动':<10}{import_ms:>12.1f}{first_ms:>16.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
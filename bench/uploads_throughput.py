@@ -0,0 +1,40 @@
+import argparse
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _fetch(url):
+    started = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=30) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def _run(url, requests, concurrency):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = sorted(pool.map(lambda _: _fetch(url), range(requests)))
+    elapsed = time.perf_counter() - started
+    return requests / elapsed, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+# 对比上传图片的访问吞吐量，例如由Flask发送与由nginx（X-Accel-Redirect）发送：
+# python bench/uploads_throughput.py http://127.0.0.1:5000/uploads/<文件名> http://127.0.0.1/uploads/<文件名>
+# 没有wrk时使用；wrk的结果更准确
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='上传文件访问吞吐量')
+    parser.add_argument('urls', nargs='+')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args(argv)
+
+    for url in args.urls:
+        _fetch(url)  # 预热
+        rps, p50, p99 = _run(url, args.requests, args.concurrency)
+        print(f'{url}\n  吞吐: {rps:.0f} req/s  p50: {p50:.1f}ms  p99: {p99:.1f}ms')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
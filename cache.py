@@ -0,0 +1,188 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from config import CACHE_CONFIG
+
+
+# 进程内缓存：LRU淘汰，每个条目有过期时间
+class LocalCache:
+    # 每个工作进程各有一份，失效只对当前进程生效
+    shared = False
+
+    def __init__(self, max_entries=1000, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (值, 过期时间)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def size(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Redis缓存：多个工作进程共享缓存和失效，值以JSON保存
+class RedisCache:
+    shared = True
+
+    def __init__(self, url, ttl=30):
+        import redis
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self._client.setex(key, self.ttl if ttl is None else ttl, json.dumps(value, ensure_ascii=False))
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def size(self):
+        return self._client.dbsize()
+
+    def clear(self):
+        self._client.flushdb()
+
+
+# 读穿透缓存：未命中时调用loader加载并写入缓存，统计命中率。
+# 一组缓存项（如课程列表的各种查询条件）通过"版本"失效：版本号是缓存键的一部分，
+# 换用新版本号后旧的缓存项不再被访问，随LRU/过期自然淘汰。
+# 版本号是随机值而不是递增计数，和缓存项一样会过期：进程内缓存在多进程下各自生成版本号，
+# 不会出现不同进程的相同版本号对应不同数据的情况，其他进程的修改最多延迟一个TTL可见。
+class Cache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        value = self.backend.get(key)
+        if value is not None:
+            with self._lock:
+                self._hits += 1
+            return value
+        with self._lock:
+            self._misses += 1
+        value = loader()
+        if value is not None:
+            self.backend.set(key, value)
+        return value
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    # 缓存和失效是否在所有工作进程间共享
+    @property
+    def shared(self):
+        return self.backend.shared
+
+    # 资源的当前版本号，不存在或已过期时生成新版本号
+    def version(self, name):
+        value = self.backend.get(f'version:{name}')
+        if value is None:
+            value = self.bump(name)
+        return value
+
+    # 资源发生变化：换用新版本号，使该资源的所有缓存项失效
+    def bump(self, name):
+        value = uuid.uuid4().hex[:16]
+        self.backend.set(f'version:{name}', value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self._hits, self._misses
+        total = hits + misses
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': self.backend.size(),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else None
+        }
+
+    def clear(self):
+        self.backend.clear()
+
+
+def _create_backend():
+    if CACHE_CONFIG['backend'] == 'redis':
+        return RedisCache(CACHE_CONFIG['redis_url'], CACHE_CONFIG['ttl'])
+    return LocalCache(CACHE_CONFIG['max_entries'], CACHE_CONFIG['ttl'])
+
+
+cache = Cache(_create_backend())
+
+
+# 课程列表缓存键：由查询参数和课程列表的版本号组成
+def course_list_key(args):
+    parts = [f'{name}={args.get(name, "")}' for name in ('search', 'status', 'page', 'per_page', 'cursor', 'with_total')]
+    # cursor参数存在与否决定分页方式，空字符串和未传入需要区分
+    parts.append('keyset' if args.get('cursor') is not None else 'offset')
+    return f"courses:{cache.version('courses')}:{'&'.join(parts)}"
+
+
+# 单个课程的缓存键
+def course_key(course_id):
+    return f"course:{course_id}:{cache.version(f'course:{course_id}')}"
+
+
+# 用户报名课程列表的版本：课程信息、报名人数或该用户的报名变化时都会改变；只在共享缓存下用于ETag
+def my_courses_key(user_id):
+    return f"my-courses:{user_id}:{cache.version('courses')}:{cache.version(f'my-courses:{user_id}')}"
+
+
+# 由缓存键生成强ETag，缓存键中的版本号变化时ETag随之变化
+def make_etag(key):
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+# 课程信息或报名人数变化后调用：使该课程的详情缓存和所有课程列表缓存失效
+def invalidate_course(course_id=None):
+    if course_id is not None:
+        cache.bump(f'course:{course_id}')
+    cache.bump('courses')
+
+
+# 用户报名或取消报名后调用
+def invalidate_my_courses(user_id):
+    cache.bump(f'my-courses:{user_id}')
+
+
+# 导出
+__all__ = ['LocalCache', 'RedisCache', 'Cache', 'cache', 'course_list_key', 'course_key', 'my_courses_key', 'make_etag',
+           'invalidate_course', 'invalidate_my_courses']
@@ -1,76 +1,254 @@
 from PIL import Image, ImageDraw, ImageFont
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+import datetime
+import hashlib
+import hmac
+import logging
+import os
 import random
 import string
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
 from io import BytesIO
-from flask import session
+from config import CAPTCHA_CONFIG, CACHE_CONFIG, FLASK_CONFIG
 
-# 生成验证码图片
-def generate_captcha():
-    # 验证码字符集
-    chars = string.ascii_letters + string.digits
-    # 生成4位验证码
-    captcha_text = ''.join(random.choice(chars) for _ in range(4))
-    # 保存验证码到session
-    session['captcha'] = captcha_text.lower()
-    
+logger = logging.getLogger(__name__)
+
+# 验证码字符集
+CHARS = string.ascii_letters + string.digits
+WIDTH, HEIGHT = 120, 40
+
+
+# 字体只在模块加载时加载一次
+def _load_font():
+    for name in CAPTCHA_CONFIG['fonts']:
+        try:
+            return ImageFont.truetype(name, 28)
+        except OSError:
+            continue
+    # 如果系统没有可用字体，使用默认字体
+    return ImageFont.load_default()
+
+
+FONT = _load_font()
+
+# 调色板：0为白色背景，其余为随机深色。以调色板模式绘制和编码，PNG更小、压缩更快
+_PALETTE_COLORS = 32
+_palette = [255, 255, 255]
+for _ in range(_PALETTE_COLORS - 1):
+    _palette.extend(random.randint(0, 120) for _ in range(3))
+
+
+# 随机颜色（调色板中的深色）
+def _random_color():
+    return random.randint(1, _PALETTE_COLORS - 1)
+
+
+# 绘制验证码图片，返回PNG数据
+def render_captcha(captcha_text):
     # 创建图片
-    width, height = 120, 40
-    image = Image.new('RGB', (width, height), (255, 255, 255))
+    image = Image.new('P', (WIDTH, HEIGHT), 0)
+    image.putpalette(_palette)
     
     # 创建画笔
     draw = ImageDraw.Draw(image)
     
-    # 生成随机颜色
-    def random_color():
-        return (random.randint(0, 120), random.randint(0, 120), random.randint(0, 120))
-    
     # 绘制干扰线
     for _ in range(5):
-        start = (random.randint(0, width), random.randint(0, height))
-        end = (random.randint(0, width), random.randint(0, height))
-        draw.line([start, end], fill=random_color(), width=1)
+        start = (random.randint(0, WIDTH), random.randint(0, HEIGHT))
+        end = (random.randint(0, WIDTH), random.randint(0, HEIGHT))
+        draw.line([start, end], fill=_random_color(), width=1)
     
     # 绘制噪点
     for _ in range(50):
-        draw.point((random.randint(0, width), random.randint(0, height)), fill=random_color())
-    
-    # 绘制验证码文本
-    try:
-        # 尝试使用系统字体
-        font = ImageFont.truetype('arial.ttf', 28)
-    except:
-        # 如果系统没有arial字体，使用默认字体
-        font = ImageFont.load_default()
+        draw.point((random.randint(0, WIDTH), random.randint(0, HEIGHT)), fill=_random_color())
     
     # 计算文本宽度
-    text_width = draw.textlength(captcha_text, font=font)
+    text_width = draw.textlength(captcha_text, font=FONT)
     # 居中绘制文本
-    x = (width - text_width) // 2
-    y = (height - 30) // 2
+    x = (WIDTH - text_width) // 2
+    y = (HEIGHT - 30) // 2
     
     # 逐个字符绘制，增加随机性
-    for i, char in enumerate(captcha_text):
-        char_width = draw.textlength(char, font=font)
-        draw.text((x, y), char, font=font, fill=random_color())
+    for char in captcha_text:
+        char_width = draw.textlength(char, font=FONT)
+        draw.text((x, y), char, font=FONT, fill=_random_color())
         x += char_width + 2
     
-    # 保存到内存
+    # 低压缩级别：图片很小，压缩率差别不大，编码快得多
     buffer = BytesIO()
-    image.save(buffer, 'PNG')
-    buffer.seek(0)
-    
-    return buffer
+    image.save(buffer, 'PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+# 生成一个新的验证码，返回 (答案, PNG数据)
+def _new_captcha():
+    # 生成4位验证码
+    captcha_text = ''.join(random.choice(CHARS) for _ in range(4))
+    return captcha_text.lower(), render_captcha(captcha_text)
+
+
+# 预生成验证码池：请求直接从池中取出（O(1)），数量低于低水位时由后台线程补满。
+# 每个验证码只会被取出一次
+class CaptchaPool:
+    def __init__(self, size, low_watermark):
+        self.size = size
+        self.low_watermark = low_watermark
+        self._items = deque()
+        self._refill = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    # 后台线程在第一次使用时启动；fork后的子进程中重新启动
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._items.clear()
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='captcha-pool', daemon=True).start()
+            self._refill.set()
+
+    def _run(self):
+        while True:
+            self._refill.wait()
+            self._refill.clear()
+            try:
+                while len(self._items) < self.size:
+                    self._items.append(_new_captcha())
+            except Exception:
+                logger.exception("预生成验证码失败")
+
+    def take(self):
+        self._ensure_worker()
+        try:
+            item = self._items.popleft()
+        except IndexError:
+            # 池已取空（如突发流量），直接生成
+            item = _new_captcha()
+        if len(self._items) < self.low_watermark:
+            self._refill.set()
+        return item
+
 
-# 验证验证码
-def verify_captcha(user_input):
-    if 'captcha' not in session:
+_pool = CaptchaPool(CAPTCHA_CONFIG['pool_size'], CAPTCHA_CONFIG['low_watermark']) if CAPTCHA_CONFIG['pool_size'] > 0 else None
+
+
+# 已使用验证码的进程内记录：captcha_id -> 过期时间。
+# 只能阻止在同一进程内重复使用，只适用于单进程运行（开发服务器）；多进程部署使用database或redis。
+# 记录满时只清理已过期的项，仍然满时拒绝新的验证码，不会提前淘汰未过期的记录而允许重放
+class LocalCaptchaStore:
+    def __init__(self, ttl=300, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # 标记验证码已使用；已经使用过或记录已满时返回False
+    def claim(self, captcha_id):
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._entries.get(captcha_id)
+            if expires_at is not None and expires_at > now:
+                return False
+            self._entries.pop(captcha_id, None)
+            if len(self._entries) >= self.max_entries:
+                # 按插入顺序即过期顺序，从最早的开始清理
+                while self._entries and next(iter(self._entries.values())) <= now:
+                    self._entries.popitem(last=False)
+                if len(self._entries) >= self.max_entries:
+                    logger.warning("已使用验证码记录已满（%s），拒绝验证", self.max_entries)
+                    return False
+            self._entries[captcha_id] = now + self.ttl
+        return True
+
+
+# 已使用验证码的数据库记录（captcha_claims表），多个工作进程共享；主键冲突即为重复使用。
+# 过期记录由各进程定期删除
+class DatabaseCaptchaStore:
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._purged_at = 0
+        self._lock = threading.Lock()
+
+    def claim(self, captcha_id):
+        from db_init import db_connection
+        now = datetime.datetime.now().replace(microsecond=0)
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute('INSERT IGNORE INTO captcha_claims (captcha_id, expires_at) VALUES (%s, %s)',
+                      (captcha_id, now + datetime.timedelta(seconds=self.ttl)))
+            claimed = c.rowcount == 1
+            if self._should_purge():
+                c.execute('DELETE FROM captcha_claims WHERE expires_at < %s', (now,))
+            conn.commit()
+        return claimed
+
+    # 每个进程每个有效期内最多清理一次
+    def _should_purge(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._purged_at < self.ttl:
+                return False
+            self._purged_at = now
+            return True
+
+
+# 已使用验证码的Redis记录，多个工作进程共享
+class RedisCaptchaStore:
+    def __init__(self, url, ttl=300):
+        import redis
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+
+    # SET NX：只有第一次使用能写入成功
+    def claim(self, captcha_id):
+        return bool(self._client.set(f'captcha:used:{captcha_id}', 1, nx=True, ex=self.ttl))
+
+
+def _create_store():
+    if CAPTCHA_CONFIG['store'] == 'redis':
+        return RedisCaptchaStore(CACHE_CONFIG['redis_url'], CAPTCHA_CONFIG['ttl'])
+    if CAPTCHA_CONFIG['store'] == 'local':
+        return LocalCaptchaStore(CAPTCHA_CONFIG['ttl'], CAPTCHA_CONFIG['max_entries'])
+    return DatabaseCaptchaStore(CAPTCHA_CONFIG['ttl'])
+
+
+captcha_store = _create_store()
+
+# 验证码令牌：签名并带时间戳的 [验证码ID, 答案摘要]，放在登录表单的隐藏字段中。
+# 任何工作进程都能校验，不依赖生成验证码的进程；答案只以带密钥的摘要出现，无法从令牌中还原
+_serializer = URLSafeTimedSerializer(FLASK_CONFIG['SECRET_KEY'], salt='captcha')
+
+
+def _answer_digest(captcha_id, answer):
+    message = f'{captcha_id}:{answer}'.encode('utf-8')
+    return hmac.new(FLASK_CONFIG['SECRET_KEY'].encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+
+# 生成验证码，返回 (验证码令牌, PNG数据)
+def generate_captcha():
+    captcha_text, png = _pool.take() if _pool else _new_captcha()
+    captcha_id = uuid.uuid4().hex
+    token = _serializer.dumps([captcha_id, _answer_digest(captcha_id, captcha_text)])
+    return token, png
+
+# 验证验证码：令牌签名有效且未过期、答案正确；每个验证码只能提交一次（无论答案是否正确）
+def verify_captcha(token, user_input):
+    if not token or not user_input:
         return False
-    
-    stored_captcha = session['captcha']
-    # 验证后删除验证码，防止重复使用
-    del session['captcha']
-    
-    return user_input.lower() == stored_captcha
+    try:
+        captcha_id, digest = _serializer.loads(token, max_age=CAPTCHA_CONFIG['ttl'])
+    except (BadSignature, ValueError, TypeError):
+        return False
+    if not captcha_store.claim(captcha_id):
+        return False
+    return hmac.compare_digest(digest, _answer_digest(captcha_id, user_input.lower()))
 
 # 导出函数
-__all__ = ['generate_captcha', 'verify_captcha']
+__all__ = ['generate_captcha', 'verify_captcha', 'render_captcha', 'CaptchaPool',
+           'LocalCaptchaStore', 'DatabaseCaptchaStore', 'RedisCaptchaStore', 'captcha_store']
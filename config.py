@@ -6,10 +6,146 @@ DB_CONFIG = {
     'database': 'training_system'
 }
 
+# 数据库连接池配置（models.engine 使用，原生SQL与ORM共用同一个连接池）
+DB_POOL_CONFIG = {
+    'pool_size': 10,         # 每个进程常驻的连接数
+    'max_overflow': 5,       # 高峰期允许临时超出 pool_size 的连接数
+    'pool_timeout': 10,      # 连接池耗尽时等待空闲连接的秒数
+    'pool_recycle': 1800,    # 连接使用超过该秒数后重建，避免被MySQL wait_timeout断开
+    'pool_pre_ping': True    # 借出前检查连接是否存活
+}
+
+# 报名准入层配置（报名开放瞬间的高并发削峰）
+ADMISSION_CONFIG = {
+    'enabled': False,        # 是否启用进程内剩余名额计数
+    'refresh_interval': 5,   # 剩余名额计数从数据库刷新的间隔（秒）
+    'max_inflight': 0,       # 每个进程同时写库的报名请求数，0表示取工作线程数的一半；须小于线程数才能起到排队作用
+    'queue_timeout': 3       # 排队等待写库的最长时间（秒），超时返回503
+}
+
+# 分页配置
+PAGINATION_CONFIG = {
+    'count_cache_ttl': 30    # 列表总数（COUNT(*)）的缓存秒数，0表示不缓存
+}
+
+# 搜索配置
+SEARCH_CONFIG = {
+    'fulltext': True,        # 使用FULLTEXT(ngram)索引搜索；数据库不支持时设为False退回LIKE匹配
+    'ngram_token_size': 2    # 与MySQL的ngram_token_size保持一致
+}
+
+# 报名人数校准配置：courses.registered 由报名/取消报名增量维护，定期与报名记录表核对
+RECONCILE_CONFIG = {
+    'interval': 600,         # 后台校准间隔（秒），0表示不启动后台校准
+    'auto_fix': True         # 发现偏差时是否自动修正，False时只记录日志
+}
+
+# 认证缓存配置（已验证的JWT -> 用户ID）；管理员标记只在 CACHE_CONFIG['backend'] 为 redis 时跨请求缓存
+AUTH_CACHE_CONFIG = {
+    'max_entries': 10000,    # 最多缓存的令牌数
+    'ttl': 300,              # 缓存秒数
+    'admin_ttl': 5           # 未使用redis时管理员标记在进程内缓存的秒数，即撤销管理员权限后其他工作进程最多沿用旧权限的时间
+}
+
+# 日志配置
+LOGGING_CONFIG = {
+    'level': 'INFO',             # 全局日志级别
+    'format': 'text',            # text 或 json
+    'queue_size': 10000,         # 异步日志队列长度，队列满时丢弃新日志而不阻塞请求
+    'debug_sample_rate': 0.1,    # DEBUG日志的采样比例
+    'levels': {                  # 按模块单独设置日志级别
+        'course': 'INFO',
+        'auth': 'INFO'
+    }
+}
+
+# 启动配置
+STARTUP_CONFIG = {
+    'fast_startup': False    # 跳过启动时的数据库迁移检查（也可设置环境变量 FAST_STARTUP=1），迁移需单独执行
+}
+
+# 接口缓存配置（课程列表和课程详情）
+CACHE_CONFIG = {
+    'backend': 'local',      # local：进程内LRU缓存；redis：多进程共享的Redis缓存
+    'redis_url': 'redis://localhost:6379/0',
+    'max_entries': 1000,     # 进程内缓存的最大条目数
+    'ttl': 30                # 缓存秒数；多进程使用进程内缓存时，其他进程的写操作最多延迟这么久可见
+}
+
+# 上传文件访问配置
+UPLOAD_CONFIG = {
+    'immutable_max_age': 31536000,  # 内容哈希命名的文件（内容永不改变）的缓存秒数
+    'max_age': 86400,        # 其他文件（旧的随机命名文件）的缓存秒数
+    'sendfile': None,        # None：由Flask发送文件；'x-sendfile'：Apache/lighttpd；'x-accel'：nginx
+    'accel_prefix': '/internal-uploads/',  # nginx中对应uploads目录的internal location
+    'max_content_length': 12 * 1024 * 1024,  # 单个请求体的最大字节数，超出时在读取前直接返回413
+    'max_file_size': 10 * 1024 * 1024,       # 单个上传文件的最大字节数，接收过程中超出即中止
+    'grace_period': 600      # 最近这么多秒内写入的文件不会被清理（避免与正在进行的上传冲突）
+}
+
+# 上传目录清理配置（删除不再被任何课程引用的文件）
+UPLOAD_GC_CONFIG = {
+    'interval': 3600,        # 后台清理间隔（秒），0表示不启动后台清理
+    'mode': 'quarantine',    # quarantine：移动到 uploads/.quarantine；delete：直接删除
+    'quarantine_retention': 7 * 86400,  # 隔离区文件保留秒数，过期后删除
+    'batch_size': 500,       # 每批检查的文件数
+    'batch_pause': 0.05      # 每批之间暂停的秒数，降低对磁盘的压力
+}
+
+# 课程图片处理配置
+IMAGE_CONFIG = {
+    'formats': ['JPEG', 'PNG', 'GIF', 'WEBP'],   # 允许上传的图片格式（按文件内容识别）
+    'max_pixels': 40000000,  # 单张图片最大像素数，防止解压炸弹
+    'variants': {            # 生成的尺寸版本：名称 -> 最长边像素
+        'thumb': 320,
+        'medium': 800,
+        'large': 1600
+    },
+    'quality': 82,           # JPEG/WebP压缩质量
+    'workers': 2             # 后台生成图片版本的线程数
+}
+
+# 管理后台页面配置
+ADMIN_PAGE_CONFIG = {
+    'page_size': 20,         # 页面首屏渲染的课程/用户数，其余由前端按游标分页加载
+    'render_budget_ms': 200  # 页面服务端耗时预算（毫秒），超出时记录警告日志
+}
+
+# 密码哈希配置
+PASSWORD_CONFIG = {
+    'rounds': 12,            # bcrypt成本因子；修改后用户下次登录时自动按新成本重新哈希
+    'workers': 4,            # 执行bcrypt的线程数，建议不超过CPU核数
+    'max_pending': 16,       # 每个进程最多排队等待的哈希任务数，超出时返回429
+    'timeout': 5             # 单次哈希/校验等待结果的最长秒数
+}
+
+# 验证码配置
+CAPTCHA_CONFIG = {
+    'pool_size': 200,        # 预先生成的验证码图片数，0表示不使用预生成池
+    'low_watermark': 50,     # 池中剩余数量低于此值时后台线程开始补充
+    'fonts': ['arial.ttf', 'DejaVuSans.ttf'],  # 依次尝试加载的字体，都不可用时使用Pillow默认字体
+    'store': 'database',     # 已使用验证码的记录位置（答案在签名令牌中，任何进程都能校验）：database：captcha_claims表，多进程共享；redis：多进程共享（使用CACHE_CONFIG['redis_url']）；local：进程内，只能用于单进程运行
+    'ttl': 300,              # 验证码有效秒数
+    'max_entries': 10000     # local模式最多记录的已使用验证码数，记录满且没有过期项时拒绝验证
+}
+
 # 微信公众号配置
 WECHAT_CONFIG = {
     'app_id': 'your-wechat-app-id',
-    'app_secret': 'your-wechat-app-secret'
+    'app_secret': 'your-wechat-app-secret',
+    'api_base': 'https://api.weixin.qq.com'  # 微信接口地址（测试时可指向本地模拟服务）
+}
+
+# 调用外部接口（微信API）的HTTP客户端配置
+HTTP_CLIENT_CONFIG = {
+    'pool_maxsize': 16,          # 每个主机保持的最大连接数
+    'connect_timeout': 3,        # 建立连接的超时秒数
+    'read_timeout': 5,           # 等待响应的超时秒数
+    'retries': 2,                # 连接失败或返回502/503/504时的重试次数
+    'backoff': 0.2,              # 重试等待的基准秒数（指数退避，随机抖动）
+    'backoff_max': 2,            # 单次重试等待的最长秒数
+    'breaker_threshold': 5,      # 连续失败多少次后熔断，熔断期间直接失败不再请求
+    'breaker_reset': 30          # 熔断持续秒数，之后放行一个试探请求
 }
 
 # Flask应用配置
@@ -27,6 +163,8 @@ ENVIRONMENT = {
     'production': {
         'debug': False,
         'host': '0.0.0.0',
-        'port': 5000
+        'port': 5000,
+        'workers': 0,    # gunicorn工作进程数，0表示按CPU核数推算
+        'threads': 4     # 每个工作进程的线程数
     }
 }
@@ -1,11 +1,24 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, make_response, current_app, g
 import uuid
 import datetime
 import os
-from db_init import get_db_connection
-from auth import admin_required
-from config import FLASK_CONFIG
-import jwt
+import json
+import logging
+import mysql.connector
+from mysql.connector import errorcode
+from werkzeug.exceptions import HTTPException
+from db_init import get_db_connection, db_connection
+from auth import admin_required, login_required
+import admission
+import images
+from uploads import remove_unreferenced
+import registration_counts
+from cache import cache, course_list_key, course_key, my_courses_key, make_etag, invalidate_course, invalidate_my_courses
+from search import build_search
+from serializers import format_date, format_datetime
+from pagination import InvalidCursorError, encode_cursor, decode_cursor, keyset_condition, count_cache, wants_total
+
+logger = logging.getLogger(__name__)
 
 # 创建蓝图
 course_bp = Blueprint('course', __name__)
@@ -26,25 +39,15 @@ def create_course():
         registration_start = request.form.get('registration_start')
         registration_end = request.form.get('registration_end')
 
-        # 处理文件上传
+        # 处理文件上传：校验图片并保存原图（存储相对路径），缩略图等版本在后台生成
         image = ''
+        upload_folder = os.path.join(current_app.root_path, 'uploads')
         if 'image' in request.files:
             file = request.files['image']
             if file.filename:
-                # 确保上传目录存在
-                upload_folder = os.path.join(current_app.root_path, 'uploads')
-                if not os.path.exists(upload_folder):
-                    os.makedirs(upload_folder)
-                
-                # 生成唯一的文件名
-                filename = str(uuid.uuid4()) + '.' + file.filename.rsplit('.', 1)[1].lower()
-                filepath = os.path.join(upload_folder, filename)
-                file.save(filepath)
-                
-                # 存储相对路径
-                image = '/uploads/' + filename
-
-        print(f"获取到的表单数据: title={title}, description={description}, date={date}")
+                image = images.save_upload(file, upload_folder)
+
+        logger.debug("获取到的表单数据: title=%s, date=%s", title, date)
 
         conn = None
         try:
@@ -53,25 +56,32 @@ def create_course():
 
             # 创建课程
             course_id = str(uuid.uuid4())
-            print(f"准备插入课程，course_id={course_id}")
             c.execute('''INSERT INTO courses (id, title, description, date, time, location, capacity, registered, registration_start, registration_end, image)
                          VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)''',
                       (course_id, title, description, date, time, location, capacity, 0, registration_start,
                        registration_end, image))
 
             conn.commit()
-            print(f"课程创建成功，course_id={course_id}")
+            invalidate_course()
+            if image:
+                images.process_async(course_id, image, upload_folder)
+            logger.info("课程创建成功，course_id=%s", course_id)
             return jsonify({'message': '课程创建成功', 'course_id': course_id}), 201
         except Exception as e:
             if conn:
                 conn.rollback()
-            print(f"数据库操作失败: {str(e)}")
+            logger.exception("课程创建失败，数据库操作失败")
             return jsonify({'message': f'课程创建失败: {str(e)}'}), 500
         finally:
             if conn:
                 conn.close()
     except Exception as e:
-        print(f"处理请求失败: {str(e)}")
+        if isinstance(e, images.InvalidImageError):
+            return jsonify({'message': str(e)}), 400
+        if isinstance(e, HTTPException):
+            # 如上传文件超过大小限制（413）
+            raise
+        logger.exception("课程创建失败，处理请求失败")
         return jsonify({'message': f'课程创建失败: {str(e)}'}), 500
 
 
@@ -89,23 +99,16 @@ def update_course(course_id):
     registration_start = request.form.get('registration_start')
     registration_end = request.form.get('registration_end')
 
-    # 处理文件上传
+    # 处理文件上传：校验图片并保存原图（存储相对路径），缩略图等版本在后台生成
     image = None
+    upload_folder = os.path.join(current_app.root_path, 'uploads')
     if 'image' in request.files:
         file = request.files['image']
         if file.filename:
-            # 确保上传目录存在
-            upload_folder = os.path.join(current_app.root_path, 'uploads')
-            if not os.path.exists(upload_folder):
-                os.makedirs(upload_folder)
-            
-            # 生成唯一的文件名
-            filename = str(uuid.uuid4()) + '.' + file.filename.rsplit('.', 1)[1].lower()
-            filepath = os.path.join(upload_folder, filename)
-            file.save(filepath)
-            
-            # 存储相对路径
-            image = '/uploads/' + filename
+            try:
+                image = images.save_upload(file, upload_folder)
+            except images.InvalidImageError as e:
+                return jsonify({'message': str(e)}), 400
 
     conn = None
     try:
@@ -113,24 +116,20 @@ def update_course(course_id):
         c = conn.cursor()
 
         # 检查课程是否存在
-        c.execute('SELECT id, date FROM courses WHERE id = %s', (course_id,))
+        c.execute('SELECT id, registration_end, image, image_variants FROM courses WHERE id = %s', (course_id,))
         course = c.fetchone()
         if not course:
             return jsonify({'message': '课程不存在'}), 404
 
         # 检查课程是否已结束
         today = datetime.datetime.now()
-        c.execute('SELECT registration_end FROM courses WHERE id = %s', (course_id,))
-        db_registration_end = c.fetchone()
-        if db_registration_end:
-            class_end_date = datetime.datetime.strptime(db_registration_end[0], '%Y-%m-%d %H:%M:%S')
-            end_date = class_end_date + datetime.timedelta(days=1)
-            if today > end_date:
-                return jsonify({'message': '已结束课程不可编辑'}), 400
+        end_date = course[1] + datetime.timedelta(days=1)
+        if today > end_date:
+            return jsonify({'message': '已结束课程不可编辑'}), 400
 
         # 更新课程
         if image:
-            c.execute('''UPDATE courses SET title = %s, description = %s, date = %s, time = %s, location = %s, capacity = %s, registration_start = %s, registration_end = %s, image = %s
+            c.execute('''UPDATE courses SET title = %s, description = %s, date = %s, time = %s, location = %s, capacity = %s, registration_start = %s, registration_end = %s, image = %s, image_variants = NULL
                          WHERE id = %s''',
                       (title, description, date, time, location, capacity, registration_start, registration_end, image, course_id))
         else:
@@ -139,6 +138,14 @@ def update_course(course_id):
                       (title, description, date, time, location, capacity, registration_start, registration_end, course_id))
 
         conn.commit()
+        # 容量可能变化，丢弃准入层计数
+        admission.seat_counter.invalidate(course_id)
+        invalidate_course(course_id)
+        if image:
+            images.process_async(course_id, image, upload_folder)
+            # 删除不再被引用的旧图片
+            if course[2] != image:
+                remove_unreferenced(course[2], images.parse_variants(course[3]), upload_folder)
         return jsonify({'message': '课程更新成功'}), 200
     except Exception as e:
         if conn:
@@ -159,13 +166,13 @@ def delete_course(course_id):
         c = conn.cursor()
 
         # 检查课程是否存在
-        c.execute('SELECT id, date FROM courses WHERE id = %s', (course_id,))
+        c.execute('SELECT id, date, image, image_variants FROM courses WHERE id = %s', (course_id,))
         course = c.fetchone()
         if not course:
             return jsonify({'message': '课程不存在'}), 404
 
         # 检查课程是否已结束
-        today = datetime.date.today().strftime('%Y-%m-%d')
+        today = datetime.date.today()
         if course[1] < today:
             return jsonify({'message': '已结束课程不可删除'}), 400
 
@@ -176,6 +183,11 @@ def delete_course(course_id):
         c.execute('DELETE FROM courses WHERE id = %s', (course_id,))
 
         conn.commit()
+        admission.seat_counter.invalidate(course_id)
+        invalidate_course(course_id)
+        # 删除不再被引用的课程图片
+        remove_unreferenced(course[2], images.parse_variants(course[3]),
+                            os.path.join(current_app.root_path, 'uploads'))
         return jsonify({'message': '课程删除成功'}), 200
     except Exception as e:
         if conn:
@@ -186,35 +198,61 @@ def delete_course(course_id):
             conn.close()
 
 
-# 获取课程列表
-@course_bp.route('/api/courses', methods=['GET'])
-def get_courses():
-    conn = None
-    try:
-        conn = get_db_connection()
+# 客户端缓存的版本仍是最新时返回304，不再查询和序列化
+def _not_modified(etag):
+    if etag not in request.if_none_match:
+        return None
+    response = make_response('', 304)
+    response.set_etag(etag)
+    return response
+
+
+# 由响应数据生成ETag：缓存不在进程间共享时，各进程的版本号互不相同，其他进程上的修改不会改变本进程的版本号，
+# 只有按数据生成的ETag才能保证304时客户端的数据确实是最新的
+def _data_etag(data):
+    return make_etag(json.dumps(data, sort_keys=True, ensure_ascii=False))
+
+
+# 返回带ETag的JSON响应；客户端每次使用前都需要用If-None-Match重新验证
+def _with_etag(data, etag, private=False):
+    response = make_response(jsonify(data), 200)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache' if private else 'no-cache'
+    return response
+
+
+# 查询课程列表，返回响应数据
+def _load_courses(args):
+    with db_connection() as conn:
         c = conn.cursor()
 
         # 获取查询参数
-        search = request.args.get('search', '')
-        status = request.args.get('status', '')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
+        search = args.get('search', '')
+        status = args.get('status', '')
+        page = int(args.get('page', 1))
+        per_page = int(args.get('per_page', 10))
         offset = (page - 1) * per_page
+        # 传入cursor参数时使用游标分页（首页传空字符串），否则沿用页码分页
+        cursor = args.get('cursor')
 
         # 构建SQL查询
         query = 'SELECT * FROM courses'
         count_query = 'SELECT COUNT(*) FROM courses'
         conditions = []
         params = []
+        order_sql, order_params = None, []
 
         # 添加搜索条件
         if search:
-            conditions.append('(title LIKE %s OR description LIKE %s)')
-            params.extend([f'%{search}%', f'%{search}%'])
+            search_sql, search_params, order_sql, order_params = build_search(['title', 'description'], search)
+            conditions.append(search_sql)
+            params.extend(search_params)
 
-        # 添加状态筛选条件
+        # 添加状态筛选条件。状态条件绑定的是当前时间，总数缓存按状态名而不是时间取值，否则永远不会命中；
+        # 因此带状态筛选的总数最多滞后一个缓存周期
+        count_key = (tuple(params), status)
         if status:
-            now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            now = datetime.datetime.now().replace(microsecond=0)
             if status == 'upcoming':
                 conditions.append('registration_start > %s')
                 params.append(now)
@@ -227,23 +265,42 @@ def get_courses():
 
         # 组合查询条件
         if conditions:
-            query += ' WHERE ' + ' AND '.join(conditions)
             count_query += ' WHERE ' + ' AND '.join(conditions)
+        count_params = list(params)
+
+        # 游标分页：从上一页最后一条记录的 (date, id) 之后继续取
+        if cursor:
+            keyset_sql, keyset_params = keyset_condition(['date', 'id'], decode_cursor(cursor, 2), descending=True)
+            conditions.append(keyset_sql)
+            params.extend(keyset_params)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
 
-        # 添加排序
-        query += ' ORDER BY date DESC'
+        # 添加排序：页码分页下的全文搜索按相关度排序，其余按 (date, id) 排序
+        order_by_relevance = order_sql is not None and cursor is None
+        if order_by_relevance:
+            query += f' ORDER BY {order_sql}, date DESC, id DESC'
+            params.extend(order_params)
+        else:
+            query += ' ORDER BY date DESC, id DESC'
 
-        # 添加分页
-        query += ' LIMIT %s OFFSET %s'
-        params.extend([per_page, offset])
+        # 添加分页，多取一条用于判断是否还有下一页
+        if cursor is not None:
+            query += ' LIMIT %s'
+            params.append(per_page + 1)
+        else:
+            query += ' LIMIT %s OFFSET %s'
+            params.extend([per_page + 1, offset])
 
         # 执行查询
         c.execute(query, params)
         courses = c.fetchall()
+        has_more = len(courses) > per_page
+        courses = courses[:per_page]
+        next_cursor = encode_cursor([courses[-1][3], courses[-1][0]]) if has_more and not order_by_relevance else None
 
-        # 获取总记录数
-        c.execute(count_query, params[:-2])
-        total = c.fetchone()[0]
+        # 获取总记录数（with_total=0 时跳过）
+        total = count_cache.get_or_count(c, count_query, count_params, count_key) if wants_total(args) else None
 
         # 转换为字典格式
         course_list = []
@@ -253,251 +310,262 @@ def get_courses():
                     'id': course[0],
                     'title': course[1],
                     'description': course[2],
-                    'date': course[3],
+                    'date': format_date(course[3]),
                     'time': course[4],
                     'location': course[5],
                     'capacity': course[6],
                     'registered': course[7],
-                    'registration_start': course[8],
-                    'registration_end': course[9],
+                    'registration_start': format_datetime(course[8]),
+                    'registration_end': format_datetime(course[9]),
                     'image': course[10] if len(course) > 10 else '',
-                    'class_start': course[8]  # 使用registration_start作为class_start
+                    'class_start': format_datetime(course[8])  # 使用registration_start作为class_start
                 }
+                # 列表使用缩略图，后台尚未生成时为原图
+                variants = images.parse_variants(course[11] if len(course) > 11 else None)
+                course_dict['thumbnail'] = images.thumbnail_url(course_dict['image'], variants)
+                course_dict['thumbnail_webp'] = images.thumbnail_url(course_dict['image'], variants, webp=True)
                 course_list.append(course_dict)
 
         # 返回带分页信息的响应
-        return jsonify({
-            'courses': course_list,
-            'pagination': {
+        if cursor is not None:
+            pagination = {
+                'total': total,
+                'per_page': per_page,
+                'has_more': has_more,
+                'next_cursor': next_cursor
+            }
+        else:
+            pagination = {
                 'total': total,
                 'page': page,
                 'per_page': per_page,
-                'has_more': (page * per_page) < total
+                'has_more': has_more,
+                'next_cursor': next_cursor
             }
-        }), 200
+        return {
+            'courses': course_list,
+            'pagination': pagination
+        }
+
+
+# 获取课程列表（按查询参数缓存，支持ETag条件请求）
+@course_bp.route('/api/courses', methods=['GET'])
+def get_courses():
+    try:
+        key = course_list_key(request.args)
+        # 共享缓存（redis）下版本号全局一致，可以在查询前按版本号返回304
+        if cache.shared:
+            etag = make_etag(key)
+            not_modified = _not_modified(etag)
+            if not_modified is not None:
+                return not_modified
+        data = cache.get_or_load(key, lambda: _load_courses(request.args))
+        if not cache.shared:
+            etag = _data_etag(data)
+            not_modified = _not_modified(etag)
+            if not_modified is not None:
+                return not_modified
+        return _with_etag(data, etag)
+    except InvalidCursorError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
-        print(f"获取课程列表失败: {str(e)}")
+        logger.exception("获取课程列表失败")
         return jsonify({'message': f'获取课程列表失败: {str(e)}'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 
-# 获取单个课程信息
-@course_bp.route('/api/courses/<course_id>', methods=['GET'])
-def get_course(course_id):
-    conn = None
-    try:
-        conn = get_db_connection()
+# 查询单个课程信息，课程不存在时返回None
+def _load_course(course_id):
+    with db_connection() as conn:
         c = conn.cursor()
 
         # 查询课程信息
         c.execute('SELECT * FROM courses WHERE id = %s', (course_id,))
         course = c.fetchone()
 
-        if not course:
+    if not course:
+        return None
+
+    # 构造课程信息
+    return {
+        'id': course[0],
+        'title': course[1],
+        'description': course[2],
+        'date': format_date(course[3]),
+        'time': course[4],
+        'location': course[5],
+        'capacity': course[6],
+        'registered': course[7],
+        'registration_start': format_datetime(course[8]),
+        'registration_end': format_datetime(course[9]),
+        'image': course[10] if len(course) > 10 else '',
+        'image_variants': images.parse_variants(course[11] if len(course) > 11 else None)
+    }
+
+
+# 获取单个课程信息（缓存，课程变化或报名人数变化时失效；支持ETag条件请求）
+@course_bp.route('/api/courses/<course_id>', methods=['GET'])
+def get_course(course_id):
+    try:
+        key = course_key(course_id)
+        if cache.shared:
+            etag = make_etag(key)
+            not_modified = _not_modified(etag)
+            if not_modified is not None:
+                return not_modified
+        course_dict = cache.get_or_load(key, lambda: _load_course(course_id))
+        if course_dict is None:
             return jsonify({'message': '课程不存在'}), 404
-
-        # 查询报名人数
-        c.execute('SELECT COUNT(*) FROM registrations WHERE course_id = %s', (course_id,))
-        registered_count = c.fetchone()[0]
-
-        # 构造课程信息
-        course_dict = {
-            'id': course[0],
-            'title': course[1],
-            'description': course[2],
-            'date': course[3],
-            'time': course[4],
-            'location': course[5],
-            'capacity': course[6],
-            'registered': registered_count,  # 使用实际报名人数
-            'registration_start': course[8],
-            'registration_end': course[9],
-            'image': course[10] if len(course) > 10 else ''
-        }
-
-        return jsonify(course_dict), 200
+        if not cache.shared:
+            etag = _data_etag(course_dict)
+            not_modified = _not_modified(etag)
+            if not_modified is not None:
+                return not_modified
+        return _with_etag(course_dict, etag)
     except Exception as e:
-        print(f"获取课程信息失败: {str(e)}")
+        logger.exception("获取课程信息失败，课程ID: %s", course_id)
         return jsonify({'message': f'获取课程信息失败: {str(e)}'}), 500
-    finally:
-        if conn:
-            conn.close()
+
+
+# 报名名额抢占：条件UPDATE在一条语句内完成时间窗口、容量检查和计数加一，
+# InnoDB行锁保证并发请求不会超卖；随后插入报名记录，唯一索引冲突即为重复报名。
+# 返回 (提示信息, HTTP状态码)，调用方负责提交或回滚事务。
+def _claim_seat(conn, course_id, user_id):
+    c = conn.cursor()
+    now = datetime.datetime.now().replace(microsecond=0)
+    c.execute('''UPDATE courses SET registered = registered + 1
+                 WHERE id = %s AND registered < capacity
+                   AND registration_start <= %s AND registration_end >= %s''',
+              (course_id, now, now))
+    if c.rowcount == 0:
+        # 未抢到名额，再查一次课程以给出确定的失败原因
+        c.execute('SELECT registration_start, registration_end FROM courses WHERE id = %s', (course_id,))
+        course = c.fetchone()
+        if not course:
+            return '课程不存在', 404
+        if now < course[0]:
+            return '报名尚未开始', 400
+        if now > course[1]:
+            return '报名已经结束', 400
+        return '课程已满', 409
+
+    try:
+        registration_id = str(uuid.uuid4())
+        c.execute('INSERT INTO registrations (id, course_id, user_id, registration_date) VALUES (%s, %s, %s, %s)',
+                  (registration_id, course_id, user_id, now))
+    except mysql.connector.IntegrityError as e:
+        if e.errno == errorcode.ER_DUP_ENTRY:
+            return '您已报名此课程', 409
+        raise
+    return '报名成功', 200
 
 
 # 学生报名课程
 @course_bp.route('/api/courses/<course_id>/register', methods=['POST'])
+@login_required
 def register_course(course_id):
     try:
-        # 从Authorization头中获取token
-        token = request.headers.get('Authorization') or request.headers.get('authorization')
-        print(f"获取到的Authorization头: {token}")
-        if not token:
-            return jsonify({'message': '缺少认证令牌'}), 401
-
-        # 移除Bearer前缀
-        if token.startswith('Bearer '):
-            token = token[7:]
-            print(f"移除Bearer前缀后的token: {token[:20]}...")
-
-        try:
-            # 解码token
-            data = jwt.decode(token, FLASK_CONFIG['SECRET_KEY'], algorithms=['HS256'])
-            user_id = data['user_id']
-            print(f"解码token成功，用户ID: {user_id}")
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': '认证令牌已过期'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': '无效的认证令牌'}), 401
-        except Exception as e:
-            print(f"认证失败: {str(e)}")
-            return jsonify({'message': f'认证失败: {str(e)}'}), 500
+        user_id = g.user['user_id']
+
+        # 准入层：进程内计数显示课程已满时直接拒绝，不访问数据库
+        use_admission = admission.is_enabled()
+        admitted = None
+        if use_admission:
+            admitted = admission.seat_counter.try_acquire(course_id)
+            if admitted is False:
+                return jsonify({'message': '课程已满'}), 409
+            if not admission.acquire_write_slot():
+                if admitted:
+                    admission.seat_counter.release(course_id)
+                return jsonify({'message': '报名人数过多，请稍后重试'}), 503
 
         conn = None
+        status = 500
         try:
             conn = get_db_connection()
-            c = conn.cursor()
 
-            # 检查课程是否存在
-            print(f"检查课程是否存在，课程ID: {course_id}")
-            c.execute('SELECT capacity, registered, registration_start, registration_end FROM courses WHERE id = %s',
-                      (course_id,))
-            course = c.fetchone()
-            print(f"查询到的课程信息: {course}")
-            if not course:
-                return jsonify({'message': '课程不存在'}), 404
-
-            # 检查是否在报名时间内
-            now = datetime.datetime.now()
-            print(f"当前时间: {now}")
-            print(f"报名开始时间: {course[2]}")
-            print(f"报名结束时间: {course[3]}")
-            registration_start = datetime.datetime.strptime(course[2], '%Y-%m-%d %H:%M:%S')
-            registration_end = datetime.datetime.strptime(course[3], '%Y-%m-%d %H:%M:%S')
-
-            if now < registration_start:
-                return jsonify({'message': '报名尚未开始'}), 400
-            if now > registration_end:
-                return jsonify({'message': '报名已经结束'}), 400
-
-            # 检查课程是否已满
-            print(f"课程容量: {course[0]}, 已报名人数: {course[1]}")
-            if course[1] >= course[0]:  # registered >= capacity
-                return jsonify({'message': '课程已满'}), 400
-
-            # 检查用户是否已报名
-            print(f"检查用户是否已报名，用户ID: {user_id}, 课程ID: {course_id}")
-            c.execute('SELECT id FROM registrations WHERE course_id = %s AND user_id = %s', (course_id, user_id))
-            if c.fetchone():
-                return jsonify({'message': '您已报名此课程'}), 400
-
-            # 报名课程
-            print(f"开始报名课程，用户ID: {user_id}, 课程ID: {course_id}")
-            registration_id = str(uuid.uuid4())
-            registration_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            print(f"生成报名记录ID: {registration_id}, 报名时间: {registration_date}")
-            c.execute('INSERT INTO registrations (id, course_id, user_id, registration_date) VALUES (%s, %s, %s, %s)',
-                      (registration_id, course_id, user_id, registration_date))
-            c.execute('UPDATE courses SET registered = registered + 1 WHERE id = %s', (course_id,))
+            # 原子抢占名额并写入报名记录
+            logger.debug("开始报名课程，用户ID: %s, 课程ID: %s", user_id, course_id)
+            message, status = _claim_seat(conn, course_id, user_id)
+            if status != 200:
+                conn.rollback()
+                return jsonify({'message': message}), status
 
             conn.commit()
-            print("报名成功")
+            # 报名人数变化
+            invalidate_course(course_id)
+            invalidate_my_courses(user_id)
+            logger.info("报名成功，用户ID: %s, 课程ID: %s", user_id, course_id)
             return jsonify({'message': '报名成功'}), 200
         except Exception as e:
+            status = 500
             if conn:
                 conn.rollback()
-            print(f"报名课程失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("报名课程失败，用户ID: %s, 课程ID: %s", user_id, course_id)
             return jsonify({'message': f'报名课程失败: {str(e)}'}), 500
         finally:
             if conn:
                 conn.close()
+            if use_admission:
+                admission.release_write_slot()
+                # 数据库未确认报名时归还占用的名额；数据库判定已满时同步计数
+                if admitted and status != 200:
+                    if status == 409 and message == '课程已满':
+                        admission.seat_counter.mark_full(course_id)
+                    else:
+                        admission.seat_counter.release(course_id)
     except Exception as e:
-        print(f"处理报名请求失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("处理报名请求失败，课程ID: %s", course_id)
         return jsonify({'message': f'处理报名请求失败: {str(e)}'}), 500
 
 
 # 学生取消报名
 @course_bp.route('/api/courses/<course_id>/unregister', methods=['DELETE'])
+@login_required
 def unregister_course(course_id):
-    # 从Authorization头中获取token
-    token = request.headers.get('Authorization') or request.headers.get('authorization')
-    if not token:
-        return jsonify({'message': '缺少认证令牌'}), 401
-
-    # 移除Bearer前缀
-    if token.startswith('Bearer '):
-        token = token[7:]
-
-    try:
-        # 解码token
-        data = jwt.decode(token, FLASK_CONFIG['SECRET_KEY'], algorithms=['HS256'])
-        user_id = data['user_id']
-    except jwt.ExpiredSignatureError:
-        return jsonify({'message': '认证令牌已过期'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'message': '无效的认证令牌'}), 401
-    except Exception as e:
-        return jsonify({'message': f'认证失败: {str(e)}'}), 500
+    user_id = g.user['user_id']
 
     conn = None
     try:
         conn = get_db_connection()
         c = conn.cursor()
 
-        # 检查用户是否已报名
-        c.execute('SELECT id FROM registrations WHERE course_id = %s AND user_id = %s', (course_id, user_id))
-        registration = c.fetchone()
-        if not registration:
+        # 取消报名，以删除的行数判断是否已报名，避免并发取消时重复扣减人数
+        c.execute('DELETE FROM registrations WHERE course_id = %s AND user_id = %s', (course_id, user_id))
+        if c.rowcount == 0:
             return jsonify({'message': '您尚未报名此课程'}), 400
-
-        # 取消报名
-        c.execute('DELETE FROM registrations WHERE id = %s', (registration[0],))
-        c.execute('UPDATE courses SET registered = registered - 1 WHERE id = %s', (course_id,))
+        c.execute('UPDATE courses SET registered = registered - 1 WHERE id = %s AND registered > 0', (course_id,))
 
         conn.commit()
+        invalidate_course(course_id)
+        invalidate_my_courses(user_id)
+        # 名额由数据库重新加载，而不是直接加一：并发的重新加载可能已经读到删除后的人数，再加一会多放出名额
+        if admission.is_enabled():
+            admission.seat_counter.invalidate(course_id)
         return jsonify({'message': '取消报名成功'}), 200
     except Exception as e:
         if conn:
             conn.rollback()
-        print(f"取消报名失败: {str(e)}")
+        logger.exception("取消报名失败，用户ID: %s, 课程ID: %s", user_id, course_id)
         return jsonify({'message': f'取消报名失败: {str(e)}'}), 500
     finally:
         if conn:
             conn.close()
 
 
-# 获取学生报名的课程列表
+# 获取学生报名的课程列表（支持ETag条件请求）。
+# 缓存在多进程间共享时按版本号生成ETag，未变化时不查询数据库；
+# 进程内缓存的版本号只在当前进程失效，此时由查询结果生成ETag，避免其他进程返回过期的304
 @course_bp.route('/api/my-courses', methods=['GET'])
+@login_required
 def get_my_courses():
     try:
-        # 从Authorization头中获取token
-        token = request.headers.get('Authorization') or request.headers.get('authorization')
-        print(f"获取到的Authorization头: {token}")
-        if not token:
-            return jsonify({'message': '缺少认证令牌'}), 401
-
-        # 移除Bearer前缀
-        if token.startswith('Bearer '):
-            token = token[7:]
-            print(f"移除Bearer前缀后的token: {token[:20]}...")
-
-        try:
-            # 解码token
-            data = jwt.decode(token, FLASK_CONFIG['SECRET_KEY'], algorithms=['HS256'])
-            user_id = data['user_id']
-            print(f"解码token成功，用户ID: {user_id}")
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': '认证令牌已过期'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': '无效的认证令牌'}), 401
-        except Exception as e:
-            print(f"认证失败: {str(e)}")
-            return jsonify({'message': f'认证失败: {str(e)}'}), 500
+        user_id = g.user['user_id']
+        etag = None
+        if cache.shared:
+            etag = make_etag(my_courses_key(user_id))
+            not_modified = _not_modified(etag)
+            if not_modified is not None:
+                return not_modified
 
         conn = None
         try:
@@ -505,49 +573,47 @@ def get_my_courses():
             c = conn.cursor()
 
             # 查询学生报名的课程
-            print(f"执行SQL查询获取用户报名记录，用户ID: {user_id}")
             c.execute('''SELECT c.*, r.registration_date
                          FROM courses c
                          JOIN registrations r ON c.id = r.course_id
                          WHERE r.user_id = %s
                          ORDER BY c.date DESC''', (user_id,))
             courses = c.fetchall()
-            print(f"查询结果数量: {len(courses)}")
 
             # 转换为字典格式
             course_list = []
             for course in courses:
-                print(f"处理课程记录: {course}")
                 if isinstance(course, tuple) and len(course) >= 10:
                     course_dict = {
                         'id': course[0],
                         'title': course[1],
                         'description': course[2],
-                        'date': course[3],
+                        'date': format_date(course[3]),
                         'time': course[4],
                         'location': course[5],
                         'capacity': course[6],
                         'registered': course[7],
-                        'registration_start': course[8],
-                        'registration_end': course[9],
-                        'registered_at': course[11] if len(course) > 11 else None
+                        'registration_start': format_datetime(course[8]),
+                        'registration_end': format_datetime(course[9]),
+                        'registered_at': format_datetime(course[-1])
                     }
                     course_list.append(course_dict)
 
-            print(f"返回课程列表数量: {len(course_list)}")
-            return jsonify(course_list), 200
+            logger.debug("获取我的课程，用户ID: %s, 课程数量: %s", user_id, len(course_list))
+            if etag is None:
+                etag = _data_etag(course_list)
+                not_modified = _not_modified(etag)
+                if not_modified is not None:
+                    return not_modified
+            return _with_etag(course_list, etag, private=True)
         except Exception as e:
-            print(f"获取我的课程失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("获取我的课程失败，用户ID: %s", user_id)
             return jsonify({'message': f'获取我的课程失败: {str(e)}'}), 500
         finally:
             if conn:
                 conn.close()
     except Exception as e:
-        print(f"处理请求失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("获取我的课程失败，处理请求失败")
         return jsonify({'message': f'处理请求失败: {str(e)}'}), 500
 
 
@@ -555,19 +621,18 @@ def get_my_courses():
 @course_bp.route('/api/course-registrations/<course_id>', methods=['GET'])
 def get_course_registrations(course_id):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
+        with db_connection() as conn:
+            c = conn.cursor()
 
-        # 查询报名人员列表
-        c.execute('''
-            SELECT DISTINCT u.id, u.username, u.email, u.phone, u.organization, r.registration_date
-            FROM registrations r
-            JOIN users u ON r.user_id = u.id
-            WHERE r.course_id = %s
-            ORDER BY r.registration_date DESC
-        ''', (course_id,))
-        registrations = c.fetchall()
-        conn.close()
+            # 查询报名人员列表
+            c.execute('''
+                SELECT DISTINCT u.id, u.username, u.email, u.phone, u.organization, r.registration_date
+                FROM registrations r
+                JOIN users u ON r.user_id = u.id
+                WHERE r.course_id = %s
+                ORDER BY r.registration_date DESC
+            ''', (course_id,))
+            registrations = c.fetchall()
 
         # 转换为字典列表
         registrations_list = []
@@ -579,7 +644,7 @@ def get_course_registrations(course_id):
                     'email': reg[2],
                     'phone': reg[3],
                     'organization': reg[4],
-                    'registration_date': reg[5]
+                    'registration_date': format_datetime(reg[5])
                 }
                 registrations_list.append(registration_dict)
 
@@ -588,6 +653,31 @@ def get_course_registrations(course_id):
     except Exception as e:
         return jsonify({'message': f'获取报名人员列表失败: {str(e)}'}), 500
 
+# 管理员查看接口缓存命中率
+@course_bp.route('/api/admin/cache-stats', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    try:
+        return jsonify(cache.stats()), 200
+    except Exception as e:
+        logger.exception("获取缓存统计失败")
+        return jsonify({'message': f'获取缓存统计失败: {str(e)}'}), 500
+
+
+# 管理员查看报名人数偏差报告，fix=1 时同时修正
+@course_bp.route('/api/admin/registration-counts', methods=['GET'])
+@admin_required
+def get_registration_counts():
+    try:
+        report = registration_counts.reconcile(request.args.get('fix') == '1')
+        if report is None:
+            return jsonify({'message': '其他进程正在校准，请稍后重试'}), 409
+        return jsonify(report), 200
+    except Exception as e:
+        logger.exception("核对报名人数失败")
+        return jsonify({'message': f'核对报名人数失败: {str(e)}'}), 500
+
+
 # 提供一个函数来注册蓝图
 def register_routes(app):
     app.register_blueprint(course_bp)
@@ -0,0 +1,42 @@
+import multiprocessing
+from config import ENVIRONMENT, DB_POOL_CONFIG, CAPTCHA_CONFIG
+
+# 生产环境gunicorn配置：gunicorn -c gunicorn.conf.py wsgi:app
+_config = ENVIRONMENT['production']
+
+bind = f"{_config['host']}:{_config['port']}"
+
+# 工作进程数：未配置时按CPU核数推算（2 * 核数 + 1）
+workers = _config['workers'] or multiprocessing.cpu_count() * 2 + 1
+# 进程内的验证码使用记录不在进程间共享，多进程时同一个验证码可以在其他进程上重复提交
+if CAPTCHA_CONFIG['store'] == 'local' and workers > 1:
+    raise RuntimeError("CAPTCHA_CONFIG['store'] 为 local 时只能使用一个工作进程，多进程部署请改用 database 或 redis")
+
+# 每个进程的线程数，不超过连接池常驻连接数，避免线程排队等待数据库连接
+worker_class = 'gthread'
+threads = min(_config['threads'], DB_POOL_CONFIG['pool_size'])
+
+# 在主进程中加载应用，数据库初始化只执行一次
+preload_app = True
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# 处理一定数量请求后平滑重启工作进程，随机抖动避免同时重启
+max_requests = 2000
+max_requests_jitter = 200
+
+
+# 工作进程启动后：丢弃从主进程继承的数据库连接，重启日志输出线程
+def post_fork(server, worker):
+    from models import engine
+    from log_utils import restart_listener
+    engine.dispose(close=False)
+    restart_listener()
+
+
+# 主进程准备就绪后关闭初始化用过的连接，工作进程各自建立连接池
+def when_ready(server):
+    from models import engine
+    engine.dispose()
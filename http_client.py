@@ -0,0 +1,161 @@
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError
+from config import HTTP_CLIENT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 可以安全重试的响应状态码（请求未被上游处理）
+_RETRY_STATUS = (502, 503, 504)
+
+
+# 连接阶段的失败（连接超时、连接被拒绝、域名解析失败），请求还没有发出，可以安全重试。
+# 读取响应体时超时或连接断开也会以 requests.ConnectionError 抛出，此时上游可能已经处理了请求，不能重试
+def _is_connect_failure(error):
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    # urllib3 的 NewConnectionError（含域名解析失败）是 ConnectTimeoutError 的子类
+    return isinstance(reason, ConnectTimeoutError)
+
+
+# 外部接口调用失败（连接失败、超时、熔断中）
+class HttpClientError(Exception):
+    pass
+
+
+class CircuitOpenError(HttpClientError):
+    pass
+
+
+# 熔断器：连续失败达到阈值后熔断，熔断期间的请求直接失败；
+# 熔断时间过后放行一个试探请求，成功则恢复，失败则继续熔断
+class CircuitBreaker:
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                if self._opened_at is None or self._probing:
+                    logger.warning("外部接口连续失败 %s 次，熔断 %s 秒", self._failures, self.reset_timeout)
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+
+# 共享的HTTP客户端：复用连接池（keep-alive），每次调用都有超时，
+# 连接失败和502/503/504时带随机抖动地退避重试，按主机熔断
+class HttpClient:
+    def __init__(self, config):
+        self.config = config
+        self._session = None
+        self._pid = None
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    # Session在第一次使用时创建；fork后的子进程不复用父进程的连接
+    def _get_session(self):
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.config['pool_maxsize'], max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+                self._pid = os.getpid()
+            return self._session
+
+    def _breaker(self, host):
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(self.config['breaker_threshold'], self.config['breaker_reset'])
+            return breaker
+
+    # 退避等待时间：指数增长，在 [0, 上限] 内随机取值，避免大量请求同时重试
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.config['backoff_max'], self.config['backoff'] * 2 ** attempt))
+
+    # 发送GET请求并解析JSON。只重试连接阶段的失败和502/503/504：读超时时上游可能已经处理了请求
+    # （如微信登录的code只能使用一次），不再重试。
+    # 无论以何种异常结束都记录为失败，熔断试探请求不会一直占着试探名额
+    def get_json(self, url, params=None, timeout=None):
+        host = urlsplit(url).netloc
+        breaker = self._breaker(host)
+        if not breaker.allow():
+            raise CircuitOpenError(f'{host} 暂时不可用')
+
+        succeeded = False
+        try:
+            data = self._get_json(host, url, params, timeout)
+            succeeded = True
+            return data
+        finally:
+            if succeeded:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+
+    def _get_json(self, host, url, params, timeout):
+        timeout = timeout or (self.config['connect_timeout'], self.config['read_timeout'])
+        session = self._get_session()
+        attempt = 0
+        while True:
+            try:
+                response = session.get(url, params=params, timeout=timeout)
+                if response.status_code in _RETRY_STATUS and attempt < self.config['retries']:
+                    error = HttpClientError(f'{host} 返回 {response.status_code}')
+                else:
+                    response.raise_for_status()
+                    return response.json()
+            except requests.ConnectionError as e:
+                if not _is_connect_failure(e) or attempt >= self.config['retries']:
+                    raise HttpClientError(f'请求 {host} 失败: {e}') from e
+                error = e
+            except (requests.RequestException, ValueError) as e:
+                raise HttpClientError(f'请求 {host} 失败: {e}') from e
+
+            attempt += 1
+            logger.info("请求 %s 失败，第 %s 次重试: %s", host, attempt, error)
+            time.sleep(self._backoff(attempt))
+
+
+# 微信接口客户端
+wechat_client = HttpClient(HTTP_CLIENT_CONFIG)
+
+
+# 导出
+__all__ = ['HttpClientError', 'CircuitOpenError', 'CircuitBreaker', 'HttpClient', 'wechat_client']
@@ -0,0 +1,240 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from config import IMAGE_CONFIG
+from db_init import db_connection
+from uploads import IncomingFile
+
+logger = logging.getLogger(__name__)
+
+# 超过像素上限的图片在解码前就被Pillow拒绝
+Image.MAX_IMAGE_PIXELS = IMAGE_CONFIG['max_pixels']
+
+# 图片格式 -> 保存原图使用的扩展名
+_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+
+class InvalidImageError(ValueError):
+    pass
+
+
+# 文件头 -> 图片格式，在交给Pillow解码前先排除明显不是图片的文件
+_SIGNATURES = [
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF')
+]
+
+
+def _sniff(head):
+    for signature, image_format in _SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+# 计算文件内容的sha256，分块读取
+def _file_digest(stream):
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(65536), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+# 校验上传的图片（按文件内容识别格式，只读取文件头）并保存原图，返回访问路径 /uploads/<文件名>。
+# 文件名取内容的sha256，相同图片只保存一份，URL对应的内容永不改变，可以长期缓存
+def save_upload(file, upload_folder):
+    # 上传时已由 uploads.IncomingFile 边接收边计算哈希并保留文件头
+    incoming = isinstance(file.stream, IncomingFile)
+    if incoming:
+        file.stream.flush()
+        if _sniff(file.stream.head) not in IMAGE_CONFIG['formats']:
+            raise InvalidImageError('无法识别的图片文件')
+    file.stream.seek(0)
+    try:
+        with Image.open(file.stream) as img:
+            image_format = img.format
+            width, height = img.size
+            img.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise InvalidImageError('无法识别的图片文件')
+    if image_format not in IMAGE_CONFIG['formats']:
+        raise InvalidImageError(f'不支持的图片格式: {image_format}')
+    if width * height > IMAGE_CONFIG['max_pixels']:
+        raise InvalidImageError('图片尺寸过大')
+
+    if not os.path.exists(upload_folder):
+        os.makedirs(upload_folder)
+    digest = file.stream.hexdigest() if incoming else _file_digest(file.stream)
+    filename = f'{digest}.{_EXTENSIONS[image_format]}'
+    path = os.path.join(upload_folder, filename)
+    if incoming:
+        # 已接收的文件直接改名到最终位置
+        file.stream.commit(path)
+    elif not os.path.exists(path):
+        # 先写临时文件再改名，并发上传同一图片时不会读到写了一半的文件
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        file.save(tmp_path)
+        os.replace(tmp_path, path)
+    return '/uploads/' + filename
+
+
+# 生成各尺寸版本（原格式 + WebP），返回 {名称: {'src', 'webp', 'width', 'height'}}；
+# 原图文件名是内容哈希，版本文件已存在时说明同一图片已处理过，直接复用
+def generate_variants(path):
+    stem = os.path.splitext(path)[0]
+    quality = IMAGE_CONFIG['quality']
+    variants = {}
+    with Image.open(path) as img:
+        # 按EXIF方向旋转；GIF只取第一帧
+        img = ImageOps.exif_transpose(img)
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+        for name, size in IMAGE_CONFIG['variants'].items():
+            existing = _existing_variant(stem, name)
+            if existing is not None:
+                variants[name] = existing
+                continue
+            variant = img.copy()
+            # 只缩小不放大
+            variant.thumbnail((size, size), Image.LANCZOS)
+            src = f'{stem}_{name}.png' if has_alpha else f'{stem}_{name}.jpg'
+            webp = f'{stem}_{name}.webp'
+            if has_alpha:
+                _save_atomic(variant, src, 'PNG', optimize=True)
+            else:
+                _save_atomic(variant, src, 'JPEG', quality=quality, optimize=True, progressive=True)
+            _save_atomic(variant, webp, 'WEBP', quality=quality, method=4)
+            variants[name] = {
+                'src': '/uploads/' + os.path.basename(src),
+                'webp': '/uploads/' + os.path.basename(webp),
+                'width': variant.width,
+                'height': variant.height
+            }
+    return variants
+
+
+# 写临时文件再改名，其他线程不会读到不完整的版本文件
+def _save_atomic(img, path, image_format, **options):
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    img.save(tmp_path, image_format, **options)
+    os.replace(tmp_path, path)
+
+
+# 查找已生成的版本文件，只读取文件头获取尺寸
+def _existing_variant(stem, name):
+    webp = f'{stem}_{name}.webp'
+    if not os.path.exists(webp):
+        return None
+    for src in (f'{stem}_{name}.jpg', f'{stem}_{name}.png'):
+        if os.path.exists(src):
+            with Image.open(src) as img:
+                width, height = img.size
+            return {
+                'src': '/uploads/' + os.path.basename(src),
+                'webp': '/uploads/' + os.path.basename(webp),
+                'width': width,
+                'height': height
+            }
+    return None
+
+
+# 生成图片版本并写回课程记录；课程图片在此期间被替换时丢弃结果
+def _process(course_id, image, path):
+    try:
+        variants = generate_variants(path)
+    except Exception:
+        logger.exception("生成图片版本失败，课程ID: %s, 图片: %s", course_id, image)
+        return
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('UPDATE courses SET image_variants = %s WHERE id = %s AND image = %s',
+                  (json.dumps(variants), course_id, image))
+        updated = c.rowcount
+        conn.commit()
+    if updated:
+        from cache import invalidate_course
+        invalidate_course(course_id)
+    logger.info("图片版本已生成，课程ID: %s, 图片: %s", course_id, image)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# 线程池在第一次使用时创建，gunicorn预加载时不会在主进程中创建线程
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_CONFIG['workers'], thread_name_prefix='image')
+        return _executor
+
+
+# 在后台线程中生成课程图片的各个版本，不阻塞请求
+def process_async(course_id, image, upload_folder):
+    path = os.path.join(upload_folder, os.path.basename(image))
+    return _get_executor().submit(_process, course_id, image, path)
+
+
+# 解析课程记录中的图片版本
+def parse_variants(value):
+    if not value:
+        return {}
+    try:
+        return json.loads(value)
+    except ValueError:
+        return {}
+
+
+# 列表使用的缩略图地址，尚未生成时返回原图
+def thumbnail_url(image, variants, webp=False):
+    thumb = variants.get('thumb')
+    if not thumb:
+        return image if not webp else None
+    return thumb['webp'] if webp else thumb['src']
+
+
+# 为已有的课程图片补充生成版本：python images.py
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='为课程图片生成缩略图和WebP版本')
+    parser.add_argument('--all', action='store_true', help='重新生成所有课程的图片版本')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    upload_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+    query = "SELECT id, image FROM courses WHERE image IS NOT NULL AND image <> ''"
+    if not args.all:
+        query += ' AND image_variants IS NULL'
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(query)
+        rows = c.fetchall()
+
+    for course_id, image in rows:
+        path = os.path.join(upload_folder, os.path.basename(image))
+        if not os.path.exists(path):
+            logger.warning("图片文件不存在，课程ID: %s, 图片: %s", course_id, image)
+            continue
+        _process(course_id, image, path)
+    print(f'已处理 {len(rows)} 门课程的图片')
+    return 0
+
+
+# 导出
+__all__ = ['InvalidImageError', 'save_upload', 'generate_variants', 'process_async', 'parse_variants', 'thumbnail_url']
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
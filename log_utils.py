@@ -0,0 +1,148 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import uuid
+from flask import g, request, has_request_context
+from config import LOGGING_CONFIG
+
+
+# 给每条日志附加当前请求ID，必须在产生日志的请求线程中执行
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        request_id = '-'
+        if has_request_context():
+            request_id = g.get('request_id', '-')
+        record.request_id = request_id
+        return True
+
+
+# DEBUG日志按比例采样，避免高并发下调试日志刷屏
+class DebugSampleFilter(logging.Filter):
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+# 每条日志输出为一行JSON，便于日志系统检索
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+# 队列满时丢弃日志并计数，不阻塞请求线程，也不把异常交给 handleError 向stderr输出traceback；
+# 队列恢复后补发一条警告说明丢弃了多少条
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+        self._unreported = 0
+        self._drop_lock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+                self._unreported += 1
+            return
+        if self._unreported:
+            with self._drop_lock:
+                count, self._unreported = self._unreported, 0
+            if count:
+                self._report_dropped(count)
+
+    def _report_dropped(self, count):
+        record = logging.LogRecord(__name__, logging.WARNING, __file__, 0, '日志队列已满，丢弃了 %s 条日志', (count,), None)
+        record.request_id = '-'
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drop_lock:
+                self._unreported += count
+
+
+_listener = None
+_queue_handler = None
+
+
+# 初始化日志：请求线程只把日志放入队列，由后台线程负责格式化和输出
+def setup_logging():
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    if LOGGING_CONFIG['format'] == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s')
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(LOGGING_CONFIG['queue_size'])
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(DebugSampleFilter(LOGGING_CONFIG['debug_sample_rate']))
+
+    root = logging.getLogger()
+    root.setLevel(LOGGING_CONFIG['level'])
+    root.addHandler(queue_handler)
+    _queue_handler = queue_handler
+    for name, level in LOGGING_CONFIG['levels'].items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+# fork后子进程中没有日志输出线程，需要重新启动（gunicorn post_fork中调用）
+def restart_listener():
+    global _listener
+    if _listener is None:
+        return
+    # 换用新队列，避免继承fork时可能处于加锁状态的旧队列
+    log_queue = queue.Queue(LOGGING_CONFIG['queue_size'])
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+# 因队列满被丢弃的日志条数
+def dropped_records():
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+# 为每个请求分配请求ID：优先沿用上游传入的 X-Request-ID，并在响应头中返回
+def register_request_id(app):
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+
+    @app.after_request
+    def echo_request_id(response):
+        response.headers['X-Request-ID'] = g.get('request_id', '')
+        return response
+
+
+# 导出
+__all__ = ['setup_logging', 'restart_listener', 'dropped_records', 'register_request_id', 'DroppingQueueHandler', 'RequestIdFilter', 'DebugSampleFilter', 'JsonFormatter']
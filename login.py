@@ -1,12 +1,17 @@
 from flask import Blueprint, request, jsonify, render_template, redirect, make_response, send_file
-import bcrypt
+import base64
+import logging
 import jwt
 import datetime
+from io import BytesIO
 from db_init import get_db_connection
 from config import FLASK_CONFIG
 from models import User
+from passwords import PasswordServiceBusy, verify_password, hash_password, needs_rehash
 from captcha import generate_captcha, verify_captcha
 
+logger = logging.getLogger(__name__)
+
 # 创建蓝图
 login_bp = Blueprint('login', __name__)
 
@@ -39,10 +44,19 @@ def login():
             return jsonify({'message': '用户不存在'}), 401
 
         # 验证密码
-        if not bcrypt.checkpw(password.encode('utf-8'), user.password.encode('utf-8')):
+        if not verify_password(password, user.password):
             db.close()
             return jsonify({'message': '密码错误'}), 401
 
+        # 成本因子调整后，登录成功时按新成本重新哈希
+        if needs_rehash(user.password):
+            try:
+                user.password = hash_password(password)
+                db.commit()
+            except Exception:
+                db.rollback()
+                logger.exception("重新哈希密码失败，用户ID: %s", user.id)
+
         # 生成JWT令牌
         token = jwt.encode(
             {'user_id': user.id, 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)},
@@ -61,28 +75,39 @@ def login():
             'is_admin': user.is_admin,
             'is_wechat_user': user.is_wechat_user
         }}), 200
+    except PasswordServiceBusy as e:
+        if 'db' in locals() and db:
+            db.close()
+        return jsonify({'message': str(e)}), 429
     except Exception as e:
         if 'db' in locals() and db:
             db.close()
         return jsonify({'message': f'登录失败: {str(e)}'}), 500
 
+# 渲染登录页面：验证码图片内嵌在页面中，令牌放在表单隐藏字段里，提交到任何工作进程都能校验
+def render_login_page(error=None):
+    captcha_token, png = generate_captcha()
+    return render_template('login.html', error=error, captcha_token=captcha_token,
+                           captcha_image=base64.b64encode(png).decode('ascii'))
+
 # 管理员登录页面
 @login_bp.route('/admin/login', methods=['GET', 'POST'])
 def admin_login_page():
     if request.method == 'GET':
-        return render_template('login.html')
+        return render_login_page()
     else:
         # 处理登录逻辑
         email = request.form.get('email')
         password = request.form.get('password')
         captcha = request.form.get('captcha')
+        captcha_token = request.form.get('captcha_token')
         
         # 验证验证码
         if not captcha:
-            return render_template('login.html', error='请输入验证码')
+            return render_login_page('请输入验证码')
         
-        if not verify_captcha(captcha):
-            return render_template('login.html', error='验证码错误')
+        if not verify_captcha(captcha_token, captcha):
+            return render_login_page('验证码错误')
         
         conn = None
         try:
@@ -94,11 +119,20 @@ def admin_login_page():
             user = c.fetchone()
             
             if not user:
-                return render_template('login.html', error='用户不存在')
+                return render_login_page('用户不存在')
             
             # 验证密码
-            if not bcrypt.checkpw(password.encode('utf-8'), user[3].encode('utf-8') if isinstance(user[3], str) else user[3]):
-                return render_template('login.html', error='密码错误')
+            if not verify_password(password, user[3]):
+                return render_login_page('密码错误')
+
+            # 成本因子调整后，登录成功时按新成本重新哈希
+            if needs_rehash(user[3]):
+                try:
+                    c.execute('UPDATE users SET password = %s WHERE id = %s', (hash_password(password), user[0]))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    logger.exception("重新哈希密码失败，用户ID: %s", user[0])
             
             # 生成JWT令牌
             token = jwt.encode(
@@ -115,8 +149,10 @@ def admin_login_page():
             
             # 返回响应
             return resp
+        except PasswordServiceBusy as e:
+            return render_login_page(str(e)), 429
         except Exception as e:
-            return render_template('login.html', error=f'登录失败: {str(e)}')
+            return render_login_page(f'登录失败: {str(e)}')
         finally:
             if conn:
                 conn.close()
@@ -133,11 +169,14 @@ def admin_logout():
     # 返回响应
     return resp
 
-# 验证码图片生成
+# 刷新验证码：返回新的验证码图片，对应的令牌通过 X-Captcha-Token 响应头返回，由页面写入表单
 @login_bp.route('/api/captcha', methods=['GET'])
 def get_captcha():
-    captcha_image = generate_captcha()
-    return send_file(captcha_image, mimetype='image/png')
+    captcha_token, png = generate_captcha()
+    response = send_file(BytesIO(png), mimetype='image/png')
+    response.headers['X-Captcha-Token'] = captcha_token
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 # 提供一个函数来注册蓝图
 def register_routes(app):
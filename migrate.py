@@ -0,0 +1,234 @@
+import argparse
+import datetime
+import importlib
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# MySQL不支持在线执行某个ALTER时返回的错误码
+_ONLINE_DDL_UNSUPPORTED = (1845, 1846)
+
+# MySQL表不存在的错误码（ER_NO_SUCH_TABLE）
+_NO_SUCH_TABLE = 1146
+
+# 全文解析器（如ngram）不可用时的错误码：MySQL未定义该解析器、MariaDB未加载该插件
+_PARSER_UNAVAILABLE = (1128, 1524)
+
+
+def _is_missing_table(error):
+    return getattr(error, 'errno', None) == _NO_SUCH_TABLE or 'no such table' in str(error)
+
+
+# 迁移执行上下文：迁移文件只通过它访问数据库，以便同时支持MySQL和SQLite替身，以及dry-run
+class MigrationContext:
+    def __init__(self, conn, dialect='mysql', dry_run=False):
+        self.conn = conn
+        self.dialect = dialect
+        self.dry_run = dry_run
+        # dry-run时记录本应执行的语句
+        self.statements = []
+        self._cursor = conn.cursor()
+
+    def _sql(self, sql):
+        # SQLite使用?作为参数占位符
+        return sql.replace('%s', '?') if self.dialect == 'sqlite' else sql
+
+    # 迁移工具自身的簿记语句（如创建版本表），不记录到dry-run输出中；dry-run时不应调用
+    def run(self, sql, params=()):
+        self._cursor.execute(self._sql(sql), params)
+
+    # 只读查询，dry-run时也会执行；dry-run时前面迁移的建表语句只被记录而没有执行，
+    # 查询尚不存在的表按空表处理，使新部署也能输出完整的待执行SQL
+    def query(self, sql, params=()):
+        try:
+            self._cursor.execute(self._sql(sql), params)
+        except Exception as e:
+            if self.dry_run and _is_missing_table(e):
+                return []
+            raise
+        return self._cursor.fetchall()
+
+    # 修改结构或数据的语句，dry-run时只记录不执行
+    def execute(self, sql, params=()):
+        if self.dry_run:
+            self.statements.append(sql if not params else f'{sql} -- {params!r}')
+            return
+        self._cursor.execute(self._sql(sql), params)
+
+    # 在线执行ALTER TABLE：优先 ALGORITHM=INPLACE, LOCK=NONE，MySQL不支持时退回默认方式
+    def online_alter(self, sql):
+        if self.dialect != 'mysql':
+            self.execute(sql)
+            return
+        try:
+            self.execute(f'{sql}, ALGORITHM=INPLACE, LOCK=NONE')
+        except Exception as e:
+            if getattr(e, 'errno', None) not in _ONLINE_DDL_UNSUPPORTED:
+                raise
+            logger.info("无法在线执行，改用默认方式: %s", sql)
+            self.execute(sql)
+
+    # 查询列的数据类型（小写，不含长度），列不存在时返回None
+    def column_type(self, table, column):
+        if self.dialect == 'sqlite':
+            for row in self.query(f'PRAGMA table_info({table})'):
+                if row[1] == column:
+                    return re.split(r'[\s(]', row[2].lower(), maxsplit=1)[0]
+            return None
+        rows = self.query('''SELECT DATA_TYPE FROM information_schema.COLUMNS
+                             WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s''', (table, column))
+        return rows[0][0].lower() if rows else None
+
+    # 查询索引是否存在
+    def index_exists(self, table, index):
+        if self.dialect == 'sqlite':
+            return any(row[1] == index for row in self.query(f'PRAGMA index_list({table})'))
+        rows = self.query('''SELECT 1 FROM information_schema.STATISTICS
+                             WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1''', (table, index))
+        return bool(rows)
+
+    # 索引不存在时创建，rebuild为True时删除已有索引后重建；全文索引只在MySQL上创建。
+    # 数据库不支持指定的全文解析器（如MariaDB没有ngram）时跳过并记录警告，不中断迁移
+    def create_index(self, table, index, columns, fulltext=False, parser=None, rebuild=False):
+        exists = self.index_exists(table, index)
+        if exists and not rebuild:
+            return
+        if self.dialect == 'sqlite':
+            if not fulltext:
+                if exists:
+                    self.execute(f'DROP INDEX {index}')
+                self.execute(f"CREATE INDEX {index} ON {table} ({', '.join(columns)})")
+            return
+        kind = 'FULLTEXT INDEX' if fulltext else 'INDEX'
+        drop = f'DROP INDEX {index}, ' if exists else ''
+        sql = f"ALTER TABLE {table} {drop}ADD {kind} {index} ({', '.join(columns)})"
+        if parser:
+            sql += f' WITH PARSER {parser}'
+        try:
+            self.online_alter(sql)
+        except Exception as e:
+            if not parser or getattr(e, 'errno', None) not in _PARSER_UNAVAILABLE:
+                raise
+            logger.warning("数据库不支持全文解析器 %s，跳过索引 %s.%s，请设置 SEARCH_CONFIG['fulltext'] = False: %s",
+                           parser, table, index, e)
+
+    def commit(self):
+        if not self.dry_run:
+            self.conn.commit()
+
+
+# 按文件名中的版本号加载迁移：migrations/0001_name.py，每个文件定义 upgrade(ctx)
+def load_migrations():
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r'^(\d{4})_(\w+)\.py$', filename)
+        if not match:
+            continue
+        module = importlib.import_module(f'migrations.{filename[:-3]}')
+        migrations.append((int(match.group(1)), match.group(2), module.upgrade))
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError('迁移版本号重复')
+    return migrations
+
+
+# dry-run不修改数据库，版本表不存在时查询按空表处理，即所有迁移都待执行
+def _ensure_version_table(ctx):
+    if ctx.dry_run:
+        return
+    ctx.run('CREATE TABLE IF NOT EXISTS schema_version (version INT PRIMARY KEY, name VARCHAR(255) NOT NULL, applied_at DATETIME NOT NULL)')
+
+
+def _applied_versions(ctx):
+    return {row[0] for row in ctx.query('SELECT version FROM schema_version')}
+
+
+# 返回 (已执行的版本集合, 待执行的迁移列表)
+def pending_migrations(ctx, target=None):
+    _ensure_version_table(ctx)
+    applied = _applied_versions(ctx)
+    pending = [m for m in load_migrations() if m[0] not in applied and (target is None or m[0] <= target)]
+    return applied, pending
+
+
+# 执行尚未执行的迁移，返回已执行（dry-run时为将要执行）的版本号列表；
+# MySQL上多进程同时迁移时用数据库锁串行化
+def run_migrations(conn, dialect='mysql', dry_run=False, target=None):
+    ctx = MigrationContext(conn, dialect, dry_run)
+    _, pending = pending_migrations(ctx, target)
+    if not pending:
+        return ctx, []
+
+    locked = dialect == 'mysql' and not dry_run
+    if locked:
+        if ctx.query("SELECT GET_LOCK('schema_migration', 60)")[0][0] != 1:
+            raise RuntimeError('等待数据库迁移锁超时')
+    try:
+        # 拿到锁后重新读取，其他进程可能已经完成迁移
+        _, pending = pending_migrations(ctx, target)
+        executed = []
+        for version, name, upgrade in pending:
+            logger.info("执行数据库迁移 %04d_%s", version, name)
+            if dry_run:
+                ctx.statements.append(f'-- {version:04d}_{name}')
+            upgrade(ctx)
+            ctx.execute('INSERT INTO schema_version (version, name, applied_at) VALUES (%s, %s, %s)',
+                        (version, name, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            ctx.commit()
+            executed.append(version)
+        return ctx, executed
+    finally:
+        if locked:
+            ctx.query("SELECT RELEASE_LOCK('schema_migration')")
+
+
+def _connect(args):
+    if args.sqlite:
+        import sqlite3
+        return sqlite3.connect(args.sqlite), 'sqlite'
+    from db_init import get_db_connection, create_database
+    # 只有真正执行迁移时才建库，查看状态和dry-run不修改数据库
+    if args.command == 'upgrade' and not args.dry_run:
+        create_database()
+    return get_db_connection(), 'mysql'
+
+
+# 命令行入口：python migrate.py [status|upgrade] [--dry-run] [--target N] [--sqlite PATH]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='数据库迁移工具')
+    parser.add_argument('command', nargs='?', default='upgrade', choices=['status', 'upgrade'])
+    parser.add_argument('--dry-run', action='store_true', help='只输出将要执行的SQL，不修改数据库')
+    parser.add_argument('--target', type=int, help='只迁移到指定版本')
+    parser.add_argument('--sqlite', help='使用SQLite数据库文件代替MySQL（用于本地测试）')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    conn, dialect = _connect(args)
+    try:
+        if args.command == 'status':
+            ctx = MigrationContext(conn, dialect, dry_run=True)
+            applied, pending = pending_migrations(ctx, args.target)
+            for version, name, _ in load_migrations():
+                state = '已执行' if version in applied else '待执行'
+                print(f'{version:04d}_{name}\t{state}')
+            return 0
+
+        ctx, executed = run_migrations(conn, dialect, args.dry_run, args.target)
+        if args.dry_run:
+            for statement in ctx.statements:
+                print(statement)
+        if not executed:
+            print('数据库已是最新版本')
+        else:
+            print(f"{'将执行' if args.dry_run else '已执行'}迁移: {', '.join(f'{v:04d}' for v in executed)}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,5 @@
+# 创建基础表
+def upgrade(ctx):
+    ctx.execute('CREATE TABLE IF NOT EXISTS users (id VARCHAR(36) PRIMARY KEY, username VARCHAR(255) NOT NULL, email VARCHAR(255) UNIQUE NOT NULL, password VARCHAR(255) NOT NULL, phone VARCHAR(20) NOT NULL, organization VARCHAR(255) NOT NULL, address VARCHAR(255) NOT NULL, is_admin INT DEFAULT 0, wechat_unionid VARCHAR(255) UNIQUE, wechat_openid VARCHAR(255) UNIQUE, is_wechat_user INT DEFAULT 0)')
+    ctx.execute('CREATE TABLE IF NOT EXISTS courses (id VARCHAR(36) PRIMARY KEY, title VARCHAR(255) NOT NULL, description TEXT NOT NULL, date DATE NOT NULL, time VARCHAR(20) NOT NULL, location VARCHAR(255) NOT NULL, capacity INT NOT NULL, registered INT DEFAULT 0, registration_start DATETIME NOT NULL, registration_end DATETIME NOT NULL, image VARCHAR(255))')
+    ctx.execute('CREATE TABLE IF NOT EXISTS registrations (id VARCHAR(36) PRIMARY KEY, user_id VARCHAR(36) NOT NULL, course_id VARCHAR(36) NOT NULL, registration_date DATETIME NOT NULL, FOREIGN KEY (user_id) REFERENCES users (id), FOREIGN KEY (course_id) REFERENCES courses (id), UNIQUE (user_id, course_id))')
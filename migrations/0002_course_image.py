@@ -0,0 +1,4 @@
+# 为旧表补充image列
+def upgrade(ctx):
+    if ctx.column_type('courses', 'image') is None:
+        ctx.execute('ALTER TABLE courses ADD COLUMN image VARCHAR(255)')
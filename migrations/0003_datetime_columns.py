@@ -0,0 +1,63 @@
+import calendar
+import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 无法解析的旧日期统一改为该时间（课程视为已结束、不可报名），并在日志中列出课程ID以便人工修正
+INVALID_DATETIME = datetime.datetime(1970, 1, 1)
+
+
+# 解析旧的日期字符串，日份越界（如 2026-02-29）时取当月最后一天；无法解析时返回None
+def _parse_legacy_date(value):
+    try:
+        return datetime.datetime.strptime(value[:10], '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        pass
+    try:
+        year, month = int(value[:4]), int(value[5:7])
+        return datetime.date(year, month, calendar.monthrange(year, month)[1])
+    except (TypeError, ValueError):
+        return None
+
+
+# 解析旧的时间字符串，兼容 datetime-local 控件的 T 分隔和省略秒的写法；无法解析时返回None
+def _parse_legacy_datetime(value):
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M'):
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            pass
+    date = _parse_legacy_date(value)
+    return None if date is None else datetime.datetime.combine(date, datetime.time())
+
+
+# 课程日期和报名时间从VARCHAR迁移为原生DATE/DATETIME列
+def upgrade(ctx):
+    if ctx.column_type('courses', 'date') == 'varchar':
+        # 先把已有数据规范化为MySQL可直接转换的格式，再原地修改列类型（保持列顺序不变）
+        rows = ctx.query('SELECT id, date, registration_start, registration_end FROM courses')
+        invalid = []
+        for course_id, date, registration_start, registration_end in rows:
+            date = _parse_legacy_date(date)
+            registration_start = _parse_legacy_datetime(registration_start)
+            registration_end = _parse_legacy_datetime(registration_end)
+            if date is None or registration_start is None or registration_end is None:
+                invalid.append(course_id)
+            ctx.execute('UPDATE courses SET date = %s, registration_start = %s, registration_end = %s WHERE id = %s',
+                        ((date or INVALID_DATETIME.date()).strftime('%Y-%m-%d'),
+                         (registration_start or INVALID_DATETIME).strftime('%Y-%m-%d %H:%M:%S'),
+                         (registration_end or INVALID_DATETIME).strftime('%Y-%m-%d %H:%M:%S'),
+                         course_id))
+        if invalid:
+            logger.warning("%d 门课程的日期无法解析，已改为 %s，请人工修正，课程ID: %s",
+                           len(invalid), INVALID_DATETIME.date(), ', '.join(invalid))
+        # 修改列类型需要重建表，无法在线执行；SQLite列类型是动态的，无需修改
+        if ctx.dialect == 'mysql':
+            ctx.execute('''ALTER TABLE courses MODIFY date DATE NOT NULL,
+                           MODIFY registration_start DATETIME NOT NULL,
+                           MODIFY registration_end DATETIME NOT NULL''')
+
+    if ctx.column_type('registrations', 'registration_date') == 'varchar' and ctx.dialect == 'mysql':
+        # 报名时间一直由服务端按 %Y-%m-%d %H:%M:%S 生成，可以直接转换
+        ctx.execute('ALTER TABLE registrations MODIFY registration_date DATETIME NOT NULL')
@@ -0,0 +1,6 @@
+# 列表排序、游标分页和排期查询使用的索引
+def upgrade(ctx):
+    # InnoDB二级索引隐含主键id，即按 (username, id) 有序
+    ctx.create_index('users', 'idx_users_username', ['username'])
+    ctx.create_index('courses', 'idx_courses_registration_window', ['registration_start', 'registration_end'])
+    ctx.create_index('courses', 'idx_courses_date', ['date'])
@@ -0,0 +1,4 @@
+# 搜索使用的全文索引，ngram分词支持中文
+def upgrade(ctx):
+    ctx.create_index('users', 'ft_users_search', ['username', 'email', 'phone', 'organization'], fulltext=True, parser='ngram')
+    ctx.create_index('courses', 'ft_courses_search', ['title', 'description'], fulltext=True, parser='ngram')
@@ -0,0 +1,67 @@
+import uuid
+
+
+# 默认管理员和示例课程
+def upgrade(ctx):
+    # 添加管理员用户（如果不存在）
+    admin_id = str(uuid.uuid4())
+    admin_email = 'admin@example.com'
+    name = 'admin'
+    phone = '13800138000'
+    organization = '系统管理员'
+    if not ctx.query('SELECT id FROM users WHERE email = %s', (admin_email,)):
+        # 哈希管理员密码（只有需要创建管理员时才加载bcrypt）
+        import bcrypt
+        hashed_password = bcrypt.hashpw('admin123'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        ctx.execute('''INSERT INTO users (id, username, email, password, phone, organization, is_admin, wechat_unionid, wechat_openid, is_wechat_user, address) 
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)''',
+                    (admin_id, name, admin_email, hashed_password, phone, organization, 1, '', '', 0, ''))
+    
+    # 只有当课程表为空时才初始化课程数据
+    if not ctx.query('SELECT id FROM courses LIMIT 1'):
+        # 初始化课程数据
+        courses = [
+            {
+                'title': '急救基础培训',
+                'description': '掌握基本急救技能，包括心肺复苏、止血、包扎等',
+                'date': '2026-02-15',
+                'time': '09:00-17:00',
+                'location': '市急救中心',
+                'capacity': 50,
+                'registered': 0,
+                'registration_start': '2026-01-28 00:00:00',
+                'registration_end': '2026-02-14 23:59:59'
+            },
+            {
+                'title': '创伤急救进阶',
+                'description': '针对各种创伤的急救处理，包括骨折、烧伤、头部创伤等',
+                'date': '2026-02-22',
+                'time': '09:00-17:00',
+                'location': '市急救中心',
+                'capacity': 30,
+                'registered': 0,
+                'registration_start': '2026-01-28 00:00:00',
+                'registration_end': '2026-02-21 23:59:59'
+            },
+            {
+                'title': '心脑血管急症处理',
+                'description': '掌握心脑血管急症的识别和处理方法',
+                'date': '2026-03-01',
+                'time': '09:00-17:00',
+                'location': '市急救中心',
+                'capacity': 40,
+                'registered': 0,
+                'registration_start': '2026-01-28 00:00:00',
+                'registration_end': '2026-02-28 23:59:59'
+            }
+        ]
+        
+        # 插入课程数据
+        for course in courses:
+            # 生成UUID作为课程ID
+            course_id = str(uuid.uuid4())
+            # 插入课程数据
+            ctx.execute('INSERT INTO courses (id, title, description, date, time, location, capacity, registered, registration_start, registration_end, image) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+                        (course_id, course['title'], course['description'], course['date'],
+                         course['time'], course['location'], course['capacity'], course['registered'],
+                         course['registration_start'], course['registration_end'], course.get('image', '')))
@@ -0,0 +1,4 @@
+# 课程图片的缩略图/WebP版本（JSON），追加在表末尾，不影响按位置读取的已有列
+def upgrade(ctx):
+    if ctx.column_type('courses', 'image_variants') is None:
+        ctx.online_alter('ALTER TABLE courses ADD COLUMN image_variants TEXT NULL')
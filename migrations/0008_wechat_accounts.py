@@ -0,0 +1,4 @@
+# 微信账号：空的unionid/openid改为NULL（唯一索引允许多个NULL，但不允许多个空字符串）
+def upgrade(ctx):
+    ctx.execute("UPDATE users SET wechat_unionid = NULL WHERE wechat_unionid = ''")
+    ctx.execute("UPDATE users SET wechat_openid = NULL WHERE wechat_openid = ''")
@@ -0,0 +1,20 @@
+# 重建全文索引并关闭InnoDB默认停用词表：默认停用词包含 a、i 等单个字母，
+# ngram分词会丢弃所有包含停用词的词元，导致英文用户名、邮箱的子串搜索结果与LIKE不一致。
+# 停用词设置在建索引时随索引保存，查询时沿用，因此只需在当前会话中关闭后重建
+FULLTEXT_INDEXES = [
+    ('users', 'ft_users_search', ['username', 'email', 'phone', 'organization']),
+    ('courses', 'ft_courses_search', ['title', 'description'])
+]
+
+
+def upgrade(ctx):
+    if ctx.dialect != 'mysql':
+        return
+    # 迁移使用连接池中的连接，重建后恢复原来的会话设置，避免影响之后借用该连接的请求
+    enabled = ctx.query('SELECT @@SESSION.innodb_ft_enable_stopword')[0][0]
+    ctx.execute('SET SESSION innodb_ft_enable_stopword = OFF')
+    try:
+        for table, index, columns in FULLTEXT_INDEXES:
+            ctx.create_index(table, index, columns, fulltext=True, parser='ngram', rebuild=True)
+    finally:
+        ctx.execute(f"SET SESSION innodb_ft_enable_stopword = {'ON' if enabled else 'OFF'}")
@@ -0,0 +1,4 @@
+# 已使用的验证码：多个工作进程共享的一次性校验记录，过期后删除
+def upgrade(ctx):
+    ctx.execute('CREATE TABLE IF NOT EXISTS captcha_claims (captcha_id VARCHAR(32) PRIMARY KEY, expires_at DATETIME NOT NULL)')
+    ctx.create_index('captcha_claims', 'idx_captcha_claims_expires_at', ['expires_at'])
@@ -0,0 +1 @@
+# 数据库迁移文件，按文件名中的四位版本号顺序执行，见 migrate.py
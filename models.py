@@ -1,13 +1,13 @@
-from sqlalchemy import create_engine, Column, String, Integer, Text
+from sqlalchemy import create_engine, Column, String, Integer, Text, Date, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from config import DB_CONFIG
+from config import DB_CONFIG, DB_POOL_CONFIG
 
 # 创建数据库连接URL
-DATABASE_URL = f"mysql+mysqlconnector://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:3306/training_system"
+DATABASE_URL = f"mysql+mysqlconnector://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:3306/{DB_CONFIG['database']}"
 
-# 创建引擎
-engine = create_engine(DATABASE_URL)
+# 创建引擎，整个进程共用这一个连接池
+engine = create_engine(DATABASE_URL, **DB_POOL_CONFIG)
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -38,14 +38,15 @@ class Course(Base):
     id = Column(String(36), primary_key=True, index=True)
     title = Column(String(255), nullable=False)
     description = Column(Text, nullable=False)
-    date = Column(String(10), nullable=False)
+    date = Column(Date, nullable=False, index=True)
     time = Column(String(20), nullable=False)
     location = Column(String(255), nullable=False)
     capacity = Column(Integer, nullable=False)
     registered = Column(Integer, default=0)
-    registration_start = Column(String(19), nullable=False)
-    registration_end = Column(String(19), nullable=False)
+    registration_start = Column(DateTime, nullable=False)
+    registration_end = Column(DateTime, nullable=False)
     image = Column(String(255), nullable=True)
+    image_variants = Column(Text, nullable=True)
 
 # 报名记录模型
 class Registration(Base):
@@ -54,7 +55,7 @@ class Registration(Base):
     id = Column(String(36), primary_key=True, index=True)
     user_id = Column(String(36), nullable=False, index=True)
     course_id = Column(String(36), nullable=False, index=True)
-    registration_date = Column(String(30), nullable=False)
+    registration_date = Column(DateTime, nullable=False)
 
 # 获取数据库会话
 def get_db():
@@ -0,0 +1,89 @@
+import base64
+import json
+import threading
+import time
+from config import PAGINATION_CONFIG
+
+
+# 游标格式不正确
+class InvalidCursorError(ValueError):
+    pass
+
+
+# 把排序键编码成不透明的游标字符串
+def encode_cursor(values):
+    raw = json.dumps(list(values), default=str, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+# 解析游标，返回排序键列表
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise InvalidCursorError('无效的分页游标')
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError('无效的分页游标')
+    return values
+
+
+# 生成"位于游标之后"的条件，columns为排序列（同一方向），如 ['date', 'id']
+def keyset_condition(columns, values, descending=False):
+    op = '<' if descending else '>'
+    clauses = []
+    params = []
+    for i, column in enumerate(columns):
+        parts = [f'{prev} = %s' for prev in columns[:i]] + [f'{column} {op} %s']
+        clauses.append('(' + ' AND '.join(parts) + ')')
+        params.extend(values[:i + 1])
+    return '(' + ' OR '.join(clauses) + ')', params
+
+
+# 总数缓存：同样的筛选条件在TTL内复用COUNT(*)结果，避免每一页都做一次全表计数
+class CountCache:
+    def __init__(self, ttl=30, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    # key 默认由查询和参数组成；参数里含有当前时间等每次都不同的值时，由调用方传入稳定的key
+    def get_or_count(self, cursor, query, params, key=None):
+        if self.ttl <= 0:
+            cursor.execute(query, params)
+            return cursor.fetchone()[0]
+
+        key = (query, tuple(params)) if key is None else (query, key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+
+        cursor.execute(query, params)
+        total = cursor.fetchone()[0]
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # 先清理过期项，仍然过多时整体清空
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[key] = (total, now + self.ttl)
+        return total
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+count_cache = CountCache(PAGINATION_CONFIG['count_cache_ttl'])
+
+
+# 是否需要返回总数：with_total=0 时跳过COUNT(*)
+def wants_total(args):
+    return args.get('with_total', '1') not in ('0', 'false')
+
+
+# 导出
+__all__ = ['InvalidCursorError', 'encode_cursor', 'decode_cursor', 'keyset_condition', 'CountCache', 'count_cache', 'wants_total']
@@ -0,0 +1,88 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import bcrypt
+from config import PASSWORD_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+# 不可用的密码标记：只能通过微信登录的账号保存此值，不是有效的bcrypt哈希，任何密码都无法通过校验
+UNUSABLE_PASSWORD = '!'
+
+
+# 哈希线程池已满，调用方应返回429
+class PasswordServiceBusy(Exception):
+    pass
+
+
+_executor = None
+_executor_lock = threading.Lock()
+# 正在执行和排队的任务数上限
+_slots = threading.BoundedSemaphore(PASSWORD_CONFIG['workers'] + PASSWORD_CONFIG['max_pending'])
+
+
+# 线程池在第一次使用时创建，gunicorn预加载时不会在主进程中创建线程
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_CONFIG['workers'], thread_name_prefix='bcrypt')
+        return _executor
+
+
+# bcrypt计算期间释放GIL，放在固定大小的线程池中执行：同时进行的哈希数有上限，
+# 登录高峰时多余的请求立即失败而不是占满所有请求线程
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise PasswordServiceBusy('服务繁忙，请稍后重试')
+    try:
+        future = _get_executor().submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=PASSWORD_CONFIG['timeout'])
+    except FutureTimeoutError:
+        raise PasswordServiceBusy('服务繁忙，请稍后重试')
+
+
+def _to_bytes(value):
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+def _hash(password):
+    return bcrypt.hashpw(_to_bytes(password), bcrypt.gensalt(rounds=PASSWORD_CONFIG['rounds'])).decode('utf-8')
+
+
+def _check(password, hashed):
+    try:
+        return bcrypt.checkpw(_to_bytes(password), _to_bytes(hashed))
+    except ValueError:
+        # 存储的不是有效的bcrypt哈希
+        return False
+
+
+# 哈希密码
+def hash_password(password):
+    return _run(_hash, password)
+
+
+# 校验密码
+def verify_password(password, hashed):
+    if not password or not hashed or hashed == UNUSABLE_PASSWORD:
+        return False
+    return _run(_check, password, hashed)
+
+
+# 哈希的成本因子与当前配置不同时需要重新哈希
+def needs_rehash(hashed):
+    try:
+        return int(hashed.split('$')[2]) != PASSWORD_CONFIG['rounds']
+    except (AttributeError, IndexError, ValueError):
+        return False
+
+
+# 导出
+__all__ = ['UNUSABLE_PASSWORD', 'PasswordServiceBusy', 'hash_password', 'verify_password', 'needs_rehash']
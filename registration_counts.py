@@ -0,0 +1,110 @@
+import argparse
+import logging
+import threading
+from config import RECONCILE_CONFIG
+from db_init import db_connection
+
+logger = logging.getLogger(__name__)
+
+# courses.registered 是课程报名人数的唯一来源：报名/取消报名时在同一事务内增减，
+# 读取时不再聚合报名记录表。这里负责定期核对计数与报名记录，发现并修正偏差。
+
+
+# 查询计数与报名记录不一致的课程，返回 [{'course_id', 'title', 'registered', 'actual'}]
+def find_drift(conn):
+    c = conn.cursor()
+    c.execute('''SELECT c.id, c.title, c.registered, COUNT(r.id)
+                 FROM courses c
+                 LEFT JOIN registrations r ON c.id = r.course_id
+                 GROUP BY c.id, c.title, c.registered
+                 HAVING c.registered <> COUNT(r.id)''')
+    return [{'course_id': row[0], 'title': row[1], 'registered': row[2], 'actual': row[3]}
+            for row in c.fetchall()]
+
+
+# 用报名记录重新计算指定课程的计数；在一条UPDATE内完成，不会覆盖核对期间发生的报名
+def _fix(conn, course_ids):
+    c = conn.cursor()
+    for course_id in course_ids:
+        c.execute('''UPDATE courses SET registered = (SELECT COUNT(*) FROM registrations WHERE course_id = %s)
+                     WHERE id = %s''', (course_id, course_id))
+    conn.commit()
+
+
+# 核对所有课程的报名人数，fix为True时修正偏差；返回偏差报告。
+# 多个进程同时核对时只有拿到数据库锁的进程执行，其余直接返回None
+def reconcile(fix=True):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT GET_LOCK('registration_reconcile', 0)")
+        if c.fetchone()[0] != 1:
+            return None
+        try:
+            drift = find_drift(conn)
+            if drift and fix:
+                _fix(conn, [item['course_id'] for item in drift])
+        finally:
+            c.execute("SELECT RELEASE_LOCK('registration_reconcile')")
+            c.fetchone()
+
+    for item in drift:
+        logger.warning("课程报名人数偏差，课程ID: %s, 计数: %s, 实际: %s%s",
+                       item['course_id'], item['registered'], item['actual'], '（已修正）' if fix else '')
+    if drift and fix:
+        # 修正后丢弃准入层缓存的剩余名额和课程缓存，下次访问时重新加载
+        import admission
+        from cache import invalidate_course
+        for item in drift:
+            admission.seat_counter.invalidate(item['course_id'])
+            invalidate_course(item['course_id'])
+    return {'drift': drift, 'fixed': bool(drift) and fix}
+
+
+_scheduler = None
+
+
+# 启动后台校准线程（同一进程只启动一次）
+def start_scheduler():
+    global _scheduler
+    interval = RECONCILE_CONFIG['interval']
+    if interval <= 0 or _scheduler is not None:
+        return
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                reconcile(RECONCILE_CONFIG['auto_fix'])
+            except Exception:
+                logger.exception("报名人数校准失败")
+
+    _scheduler = threading.Thread(target=run, name='registration-reconcile', daemon=True)
+    _scheduler.start()
+
+
+# 命令行入口：python registration_counts.py [--fix]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='核对课程报名人数')
+    parser.add_argument('--fix', action='store_true', help='修正发现的偏差')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    report = reconcile(args.fix)
+    if report is None:
+        print('其他进程正在校准，请稍后重试')
+        return 1
+    if not report['drift']:
+        print('所有课程报名人数一致')
+        return 0
+    for item in report['drift']:
+        print(f"{item['course_id']}\t{item['title']}\t计数 {item['registered']}\t实际 {item['actual']}")
+    print(f"共 {len(report['drift'])} 门课程存在偏差{'，已修正' if report['fixed'] else ''}")
+    return 0
+
+
+# 导出
+__all__ = ['find_drift', 'reconcile', 'start_scheduler']
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
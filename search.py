@@ -0,0 +1,36 @@
+from config import SEARCH_CONFIG
+
+# InnoDB布尔模式下有特殊含义的字符
+_BOOLEAN_OPERATORS = '+-<>()~*"@'
+
+
+# 把用户输入转换为布尔模式查询串：每个词都必须出现；
+# 长度不小于ngram分词长度的词按短语匹配（ngram下等价于子串匹配），更短的词按前缀匹配
+def _boolean_query(search):
+    terms = []
+    for word in search.split():
+        word = word.strip(_BOOLEAN_OPERATORS).replace('"', '')
+        if not word:
+            continue
+        if len(word) >= SEARCH_CONFIG['ngram_token_size']:
+            terms.append(f'+"{word}"')
+        else:
+            terms.append(f'+{word}*')
+    return ' '.join(terms)
+
+
+# 构建搜索条件，返回 (条件SQL, 条件参数, 排序SQL, 排序参数)；
+# 未启用全文索引或输入无法转换时退回LIKE匹配，此时排序SQL为None
+def build_search(columns, search):
+    query = _boolean_query(search) if SEARCH_CONFIG['fulltext'] else ''
+    if query:
+        match = f"MATCH({', '.join(columns)}) AGAINST (%s IN BOOLEAN MODE)"
+        return match, [query], f'{match} DESC', [query]
+
+    pattern = f'%{search}%'
+    condition = '(' + ' OR '.join(f'{column} LIKE %s' for column in columns) + ')'
+    return condition, [pattern] * len(columns), None, []
+
+
+# 导出
+__all__ = ['build_search']
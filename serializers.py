@@ -0,0 +1,21 @@
+import datetime
+
+
+# 日期列（DATE）输出为 YYYY-MM-DD，与改为原生类型之前的字符串格式保持一致
+def format_date(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+# 时间列（DATETIME）输出为 YYYY-MM-DD HH:MM:SS
+def format_datetime(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, datetime.date):
+        return value.strftime('%Y-%m-%d 00:00:00')
+    return value
+
+
+# 导出函数
+__all__ = ['format_date', 'format_datetime']
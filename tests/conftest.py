@@ -0,0 +1,111 @@
+import datetime
+import os
+import sys
+import uuid
+import pytest
+
+# 项目模块都在仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+# 测试使用独立的数据库，不启动后台定时任务
+config.DB_CONFIG['database'] = os.environ.get('TEST_DB_NAME', 'training_system_test')
+config.RECONCILE_CONFIG['interval'] = 0
+config.UPLOAD_GC_CONFIG['interval'] = 0
+
+
+# 需要MySQL的测试：依赖未安装或数据库连不上时跳过
+@pytest.fixture(scope='session')
+def mysql_db():
+    pytest.importorskip('sqlalchemy')
+    mysql_connector = pytest.importorskip('mysql.connector')
+    from db_init import create_database, run_migrations
+    try:
+        create_database()
+    except mysql_connector.Error as e:
+        pytest.skip(f'MySQL不可用: {e}')
+    run_migrations()
+    return config.DB_CONFIG['database']
+
+
+@pytest.fixture(scope='session')
+def app(mysql_db):
+    pytest.importorskip('flask')
+    os.environ['FAST_STARTUP'] = '1'
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+# 生成指定用户的JWT令牌
+@pytest.fixture
+def make_token():
+    jwt = pytest.importorskip('jwt')
+
+    def make(user_id):
+        return jwt.encode(
+            {'user_id': user_id, 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)},
+            config.FLASK_CONFIG['SECRET_KEY'],
+            algorithm='HS256'
+        )
+
+    return make
+
+
+# 创建一门正在报名中的课程，测试结束后删除课程及其报名记录
+@pytest.fixture
+def open_course(mysql_db):
+    from db_init import db_connection
+    created = []
+
+    def create(capacity):
+        course_id = str(uuid.uuid4())
+        now = datetime.datetime.now().replace(microsecond=0)
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute('''INSERT INTO courses (id, title, description, date, time, location, capacity, registered, registration_start, registration_end, image)
+                         VALUES (%s, %s, %s, %s, %s, %s, %s, 0, %s, %s, %s)''',
+                      (course_id, '并发报名测试', '', now.date(), '09:00', '', capacity,
+                       now - datetime.timedelta(hours=1), now + datetime.timedelta(hours=1), ''))
+            conn.commit()
+        created.append(course_id)
+        return course_id
+
+    yield create
+
+    with db_connection() as conn:
+        c = conn.cursor()
+        for course_id in created:
+            c.execute('DELETE FROM registrations WHERE course_id = %s', (course_id,))
+            c.execute('DELETE FROM courses WHERE id = %s', (course_id,))
+        conn.commit()
+
+
+# 创建测试用户（报名记录的user_id有外键约束，必须是真实用户），测试结束后删除用户及其报名记录
+@pytest.fixture
+def create_users(mysql_db):
+    from db_init import db_connection
+    created = []
+
+    def create(count):
+        user_ids = [str(uuid.uuid4()) for _ in range(count)]
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.executemany('''INSERT INTO users (id, username, email, password, phone, organization, address, is_admin)
+                             VALUES (%s, %s, %s, %s, %s, %s, %s, 0)''',
+                          [(user_id, f'test-{user_id[:8]}', f'{user_id}@test.example.com', '!', '13800000000', '测试', '')
+                           for user_id in user_ids])
+            conn.commit()
+        created.extend(user_ids)
+        return user_ids
+
+    yield create
+
+    with db_connection() as conn:
+        c = conn.cursor()
+        for user_id in created:
+            c.execute('DELETE FROM registrations WHERE user_id = %s', (user_id,))
+            c.execute('DELETE FROM users WHERE id = %s', (user_id,))
+        conn.commit()
@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('jwt')
+pytest.importorskip('sqlalchemy')
+
+import config
+import auth
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    calls = []
+    flags = {'u1': 1}
+
+    def load(user_id):
+        calls.append(user_id)
+        return flags.get(user_id, 0)
+
+    monkeypatch.setattr(auth, '_load_is_admin', load)
+    auth._admin_cache.clear()
+    yield calls, flags
+    auth._admin_cache.clear()
+
+
+# 未使用redis时管理员标记在进程内缓存 admin_ttl 秒，修改用户后立即失效
+@pytest.mark.skipif(auth.cache.shared, reason='使用redis缓存')
+def test_is_admin_cached_in_process(loads):
+    calls, flags = loads
+    assert auth.is_admin({'user_id': 'u1', 'is_admin': None})
+    assert auth.is_admin({'user_id': 'u1', 'is_admin': None})
+    assert calls == ['u1']
+
+    flags['u1'] = 0
+    auth.invalidate_user('u1')
+    assert not auth.is_admin({'user_id': 'u1', 'is_admin': None})
+    assert calls == ['u1', 'u1']
+
+
+@pytest.mark.skipif(auth.cache.shared, reason='使用redis缓存')
+def test_is_admin_cache_disabled(loads, monkeypatch):
+    calls, _ = loads
+    monkeypatch.setitem(config.AUTH_CACHE_CONFIG, 'admin_ttl', 0)
+    for _ in range(3):
+        assert auth.is_admin({'user_id': 'u1', 'is_admin': None})
+    assert calls == ['u1'] * 3
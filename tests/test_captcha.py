@@ -0,0 +1,135 @@
+import io
+import os
+import runpy
+import time
+import uuid
+import pytest
+
+pytest.importorskip('PIL')
+pytest.importorskip('itsdangerous')
+
+from PIL import Image
+import config
+import captcha
+from captcha import CaptchaPool, render_captcha
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def test_render_captcha_png():
+    png = render_captcha('Ab3x')
+    assert png.startswith(PNG_SIGNATURE)
+    with Image.open(io.BytesIO(png)) as img:
+        assert img.size == (captcha.WIDTH, captcha.HEIGHT)
+
+
+# 字体只在模块加载时加载一次
+def test_font_loaded_once(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('每次生成验证码都重新加载了字体')
+    monkeypatch.setattr(captcha.ImageFont, 'truetype', fail)
+    monkeypatch.setattr(captcha.ImageFont, 'load_default', fail)
+    render_captcha('abcd')
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+# 后台线程补满验证码池；取出的验证码不会重复，低于低水位时重新补满
+def test_pool_refills_to_size():
+    pool = CaptchaPool(size=10, low_watermark=5)
+    first = pool.take()
+    _wait_for(lambda: len(pool._items) == 10)
+
+    taken = [pool.take() for _ in range(6)]
+    assert len({png for _, png in taken + [first]}) == 7
+    _wait_for(lambda: len(pool._items) == 10)
+
+
+def test_take_from_empty_pool_renders_directly():
+    pool = CaptchaPool(size=0, low_watermark=0)
+    answer, png = pool.take()
+    assert len(answer) == 4 and answer == answer.lower()
+    assert png.startswith(PNG_SIGNATURE)
+
+
+@pytest.fixture
+def captcha_store(monkeypatch):
+    store = captcha.LocalCaptchaStore(ttl=300)
+    monkeypatch.setattr(captcha, 'captcha_store', store)
+    return store
+
+
+# 令牌自带签名的答案摘要，不依赖生成验证码的进程；每个验证码只能提交一次
+def test_verify_captcha_token(monkeypatch, captcha_store):
+    monkeypatch.setattr(captcha, '_pool', None)
+    monkeypatch.setattr(captcha, '_new_captcha', lambda: ('ab3x', b'png'))
+    token, png = captcha.generate_captcha()
+    assert png == b'png'
+    assert 'ab3x' not in token
+
+    # 另一个工作进程：只有空的已使用记录
+    monkeypatch.setattr(captcha, 'captcha_store', captcha.LocalCaptchaStore(ttl=300))
+    assert captcha.verify_captcha(token, 'AB3X')
+    assert not captcha.verify_captcha(token, 'ab3x')
+
+
+def test_wrong_answer_consumes_captcha(monkeypatch, captcha_store):
+    monkeypatch.setattr(captcha, '_pool', None)
+    monkeypatch.setattr(captcha, '_new_captcha', lambda: ('ab3x', b'png'))
+    token, _ = captcha.generate_captcha()
+    assert not captcha.verify_captcha(token, 'zzzz')
+    assert not captcha.verify_captcha(token, 'ab3x')
+
+
+@pytest.mark.parametrize('token', ['', 'garbage', None])
+def test_invalid_token(captcha_store, token):
+    assert not captcha.verify_captcha(token, 'ab3x')
+
+
+def test_expired_token(monkeypatch, captcha_store):
+    monkeypatch.setattr(captcha, '_pool', None)
+    monkeypatch.setattr(captcha, '_new_captcha', lambda: ('ab3x', b'png'))
+    token, _ = captcha.generate_captcha()
+    monkeypatch.setitem(captcha.CAPTCHA_CONFIG, 'ttl', -1)
+    assert not captcha.verify_captcha(token, 'ab3x')
+
+
+# 记录满时只清理过期项，不淘汰未过期的记录；仍然满时拒绝新的验证码
+def test_local_store_full(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(captcha.time, 'monotonic', lambda: now[0])
+    store = captcha.LocalCaptchaStore(ttl=10, max_entries=2)
+    assert store.claim('a') and store.claim('b')
+
+    assert not store.claim('c')
+    assert not store.claim('a')
+
+    now[0] += 11
+    assert store.claim('c')
+    assert not store.claim('c')
+
+
+# 数据库记录在所有工作进程间共享
+def test_database_store(mysql_db):
+    first, second = captcha.DatabaseCaptchaStore(ttl=300), captcha.DatabaseCaptchaStore(ttl=300)
+    captcha_id = uuid.uuid4().hex
+    assert first.claim(captcha_id)
+    assert not second.claim(captcha_id)
+    assert not first.claim(captcha_id)
+
+
+# 进程内记录不能用于多进程部署，gunicorn启动时直接报错
+def test_gunicorn_rejects_local_store_with_workers(monkeypatch):
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')
+    monkeypatch.setitem(config.CAPTCHA_CONFIG, 'store', 'local')
+    monkeypatch.setitem(config.ENVIRONMENT['production'], 'workers', 2)
+    with pytest.raises(RuntimeError):
+        runpy.run_path(path)
+
+    monkeypatch.setitem(config.ENVIRONMENT['production'], 'workers', 1)
+    runpy.run_path(path)
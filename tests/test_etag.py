@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+from cache import cache, course_key
+from db_init import db_connection
+
+
+def _get(client, url, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get(url, headers=headers)
+
+
+# 数据未变化时返回304，报名后人数变化，旧的ETag不再匹配
+@pytest.mark.parametrize('list_view', [False, True])
+def test_not_modified_until_registration(app, open_course, create_users, make_token, list_view):
+    course_id = open_course(5)
+    url = '/api/courses?per_page=100' if list_view else f'/api/courses/{course_id}'
+    with app.test_client() as client:
+        response = _get(client, url)
+        etag = response.headers['ETag'].strip('"')
+        assert response.status_code == 200
+
+        response = _get(client, url, etag)
+        assert response.status_code == 304
+        assert response.headers['ETag'].strip('"') == etag
+
+        headers = {'Authorization': f'Bearer {make_token(create_users(1)[0])}'}
+        assert client.post(f'/api/courses/{course_id}/register', headers=headers).status_code == 200
+
+        response = _get(client, url, etag)
+        assert response.status_code == 200
+        assert response.headers['ETag'].strip('"') != etag
+
+
+# 模拟其他工作进程修改课程：本进程的版本号不变，缓存过期后重新查询到新数据，不能再返回304
+@pytest.mark.skipif(cache.shared, reason='共享缓存下版本号在所有进程间一致')
+def test_update_on_other_worker(app, open_course):
+    course_id = open_course(5)
+    url = f'/api/courses/{course_id}'
+    with app.test_client() as client:
+        etag = _get(client, url).headers['ETag'].strip('"')
+
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute('UPDATE courses SET title = %s WHERE id = %s', ('已在其他进程修改', course_id))
+            conn.commit()
+        cache.backend.delete(course_key(course_id))
+
+        response = _get(client, url, etag)
+        assert response.status_code == 200
+        assert response.get_json()['title'] == '已在其他进程修改'
@@ -0,0 +1,262 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import pytest
+
+pytest.importorskip('requests')
+
+import config
+from http_client import HttpClient, HttpClientError, CircuitOpenError, CircuitBreaker
+
+
+# 模拟微信接口的本地服务：按路径依次返回预设的响应 (状态码, JSON, 延迟秒数[, 发送响应头后再延迟的秒数])，
+# 最后一个响应重复使用
+class StubWechat:
+    def __init__(self):
+        self.responses = {
+            '/sns/jscode2session': [(200, {'openid': 'o-test', 'session_key': 'c2Vzc2lvbi1rZXk='}, 0)],
+            '/sns/userinfo': [(200, {'openid': 'o-test', 'nickname': '微信用户'}, 0)]
+        }
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                stub.requests.append((url.path, {k: v[0] for k, v in parse_qs(url.query).items()}))
+                queue = stub.responses.get(url.path, [(404, {'errcode': 404}, 0)])
+                status, body, delay, body_delay = (queue.pop(0) if len(queue) > 1 else queue[0]) + (0,)
+                if delay:
+                    time.sleep(delay)
+                data = json.dumps(body).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    if body_delay:
+                        self.wfile.flush()
+                        time.sleep(body_delay)
+                    self.wfile.write(data)
+                except OSError:
+                    # 客户端已超时断开
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def hits(self, path):
+        return sum(1 for p, _ in self.requests if p == path)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    stub = StubWechat()
+    yield stub
+    stub.close()
+
+
+def _config(**overrides):
+    options = dict(config.HTTP_CLIENT_CONFIG, connect_timeout=1, read_timeout=0.5, retries=2,
+                   backoff=0.01, backoff_max=0.02, breaker_threshold=3, breaker_reset=0.3)
+    options.update(overrides)
+    return options
+
+
+@pytest.fixture
+def client():
+    return HttpClient(_config())
+
+
+def test_get_json_with_params(stub, client):
+    data = client.get_json(f'{stub.base_url}/sns/jscode2session', params={'js_code': 'abc', 'grant_type': 'authorization_code'})
+    assert data['openid'] == 'o-test'
+    assert stub.requests == [('/sns/jscode2session', {'js_code': 'abc', 'grant_type': 'authorization_code'})]
+
+
+# 连接复用：多次请求使用同一个Session
+def test_session_reused(stub, client):
+    for _ in range(3):
+        client.get_json(f'{stub.base_url}/sns/userinfo')
+    assert client._get_session() is client._get_session()
+    assert stub.hits('/sns/userinfo') == 3
+
+
+# 503在重试次数内恢复时请求成功
+def test_retries_on_503(stub, client):
+    stub.responses['/sns/jscode2session'].insert(0, (503, {}, 0))
+    stub.responses['/sns/jscode2session'].insert(0, (503, {}, 0))
+
+    data = client.get_json(f'{stub.base_url}/sns/jscode2session', params={'js_code': 'abc'})
+
+    assert data['openid'] == 'o-test'
+    assert stub.hits('/sns/jscode2session') == 3
+
+
+def test_gives_up_after_retries(stub, client):
+    stub.responses['/sns/userinfo'] = [(502, {}, 0)]
+    with pytest.raises(HttpClientError):
+        client.get_json(f'{stub.base_url}/sns/userinfo')
+    assert stub.hits('/sns/userinfo') == 3
+
+
+# 其他错误状态码不重试
+def test_no_retry_on_client_error(stub, client):
+    stub.responses['/sns/userinfo'] = [(400, {'errcode': 40003}, 0)]
+    with pytest.raises(HttpClientError):
+        client.get_json(f'{stub.base_url}/sns/userinfo')
+    assert stub.hits('/sns/userinfo') == 1
+
+
+# 读取超时不重试：上游可能已经用掉了只能使用一次的登录code
+def test_no_retry_on_read_timeout(stub, client):
+    stub.responses['/sns/jscode2session'] = [(200, {'openid': 'o-test'}, 1.5)]
+    started = time.monotonic()
+    with pytest.raises(HttpClientError):
+        client.get_json(f'{stub.base_url}/sns/jscode2session', params={'js_code': 'abc'})
+    assert time.monotonic() - started < 1.5
+    assert stub.hits('/sns/jscode2session') == 1
+
+
+# 读取响应体时超时（requests以ConnectionError抛出）同样不重试
+def test_no_retry_on_body_read_timeout(stub, client):
+    stub.responses['/sns/jscode2session'] = [(200, {'openid': 'o-test'}, 0, 1.5)]
+    with pytest.raises(HttpClientError):
+        client.get_json(f'{stub.base_url}/sns/jscode2session', params={'js_code': 'abc'})
+    assert stub.hits('/sns/jscode2session') == 1
+
+
+# 连接失败时重试，重试用尽后报错
+def test_retries_on_connection_error(client):
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    attempts = []
+    original = client._backoff
+    client._backoff = lambda attempt: attempts.append(attempt) or original(attempt)
+
+    with pytest.raises(HttpClientError):
+        client.get_json(f'http://127.0.0.1:{port}/sns/userinfo')
+    assert attempts == [1, 2]
+
+
+# 连续失败达到阈值后熔断，熔断期间不再请求上游
+def test_breaker_opens(stub):
+    client = HttpClient(_config(retries=0))
+    stub.responses['/sns/userinfo'] = [(503, {}, 0)]
+    for _ in range(3):
+        with pytest.raises(HttpClientError):
+            client.get_json(f'{stub.base_url}/sns/userinfo')
+
+    with pytest.raises(CircuitOpenError):
+        client.get_json(f'{stub.base_url}/sns/userinfo')
+    assert stub.hits('/sns/userinfo') == 3
+
+
+# 熔断时间过后放行一个试探请求：成功则恢复，失败则继续熔断
+def test_breaker_half_open_probe(stub):
+    client = HttpClient(_config(retries=0))
+    url = f'{stub.base_url}/sns/userinfo'
+    stub.responses['/sns/userinfo'] = [(503, {}, 0)] * 4 + [(200, {'openid': 'o-test'}, 0)]
+    for _ in range(3):
+        with pytest.raises(HttpClientError):
+            client.get_json(url)
+
+    # 试探失败，重新熔断
+    time.sleep(0.35)
+    with pytest.raises(HttpClientError) as excinfo:
+        client.get_json(url)
+    assert not isinstance(excinfo.value, CircuitOpenError)
+    with pytest.raises(CircuitOpenError):
+        client.get_json(url)
+
+    # 试探成功，恢复正常
+    time.sleep(0.35)
+    assert client.get_json(url)['openid'] == 'o-test'
+    assert client.get_json(url)['openid'] == 'o-test'
+    assert stub.hits('/sns/userinfo') == 6
+
+
+# 试探请求以意外异常结束时同样记录为失败，之后仍会放行新的试探请求
+def test_breaker_probe_unexpected_error(stub, monkeypatch):
+    client = HttpClient(_config(retries=0, breaker_threshold=1))
+    url = f'{stub.base_url}/sns/userinfo'
+    stub.responses['/sns/userinfo'] = [(503, {}, 0)]
+    with pytest.raises(HttpClientError):
+        client.get_json(url)
+
+    class BrokenSession:
+        def get(self, *args, **kwargs):
+            raise RuntimeError('unexpected')
+
+    time.sleep(0.35)
+    monkeypatch.setattr(client, '_get_session', lambda: BrokenSession())
+    with pytest.raises(RuntimeError):
+        client.get_json(url)
+    with pytest.raises(CircuitOpenError):
+        client.get_json(url)
+
+    monkeypatch.undo()
+    stub.responses['/sns/userinfo'] = [(200, {'openid': 'o-test'}, 0)]
+    time.sleep(0.35)
+    assert client.get_json(url)['openid'] == 'o-test'
+
+
+def test_breaker_allows_single_probe():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.is_open and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert not breaker.is_open and breaker.allow()
+
+
+# 熔断按主机区分，一个主机不可用不影响其他主机
+def test_breaker_per_host(stub):
+    client = HttpClient(_config(retries=0, breaker_threshold=1))
+    other = StubWechat()
+    try:
+        stub.responses['/sns/userinfo'] = [(503, {}, 0)]
+        with pytest.raises(HttpClientError):
+            client.get_json(f'{stub.base_url}/sns/userinfo')
+        with pytest.raises(CircuitOpenError):
+            client.get_json(f'{stub.base_url}/sns/userinfo')
+        assert client.get_json(f'{other.base_url}/sns/userinfo')['openid'] == 'o-test'
+    finally:
+        other.close()
+
+
+# wechat_utils 通过共享客户端调用微信接口
+def test_wechat_utils_against_stub(stub, client, monkeypatch):
+    pytest.importorskip('Crypto')
+    import wechat_utils
+    monkeypatch.setitem(config.WECHAT_CONFIG, 'api_base', stub.base_url)
+    monkeypatch.setattr(wechat_utils, 'wechat_client', client)
+
+    session = wechat_utils.get_wechat_session_key('code-1')
+    user_info = wechat_utils.get_wechat_user_info('token-1', session['openid'])
+
+    assert session['session_key'] == 'c2Vzc2lvbi1rZXk='
+    assert user_info['nickname'] == '微信用户'
+    assert stub.requests[0] == ('/sns/jscode2session', {
+        'appid': config.WECHAT_CONFIG['app_id'],
+        'secret': config.WECHAT_CONFIG['app_secret'],
+        'js_code': 'code-1',
+        'grant_type': 'authorization_code'
+    })
+    assert stub.requests[1] == ('/sns/userinfo', {'access_token': 'token-1', 'openid': 'o-test', 'lang': 'zh_CN'})
@@ -0,0 +1,37 @@
+import logging
+import queue
+import pytest
+
+pytest.importorskip('flask')
+
+from log_utils import DroppingQueueHandler
+
+
+def _record(message):
+    return logging.LogRecord('test', logging.INFO, __file__, 0, message, None, None)
+
+
+# 队列满时丢弃并计数，不向stderr输出 "--- Logging error ---"
+def test_full_queue_drops_silently(capsys):
+    handler = DroppingQueueHandler(queue.Queue(2))
+    for i in range(5):
+        handler.handle(_record(f'message {i}'))
+
+    assert handler.dropped == 3
+    assert capsys.readouterr().err == ''
+
+
+# 队列恢复后补发一条警告，说明丢弃的条数
+def test_reports_dropped_count_after_recovery():
+    log_queue = queue.Queue(2)
+    handler = DroppingQueueHandler(log_queue)
+    for i in range(4):
+        handler.handle(_record(f'message {i}'))
+    while not log_queue.empty():
+        log_queue.get_nowait()
+
+    handler.handle(_record('after'))
+
+    messages = [log_queue.get_nowait().getMessage() for _ in range(2)]
+    assert messages == ['after', '日志队列已满，丢弃了 2 条日志']
+    assert handler.dropped == 2
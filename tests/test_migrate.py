@@ -0,0 +1,165 @@
+import importlib
+import sqlite3
+import pytest
+from migrate import load_migrations, run_migrations, pending_migrations, MigrationContext, main
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'migrate.db'))
+    yield conn
+    conn.close()
+
+
+def _tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_versions_are_ordered():
+    versions = [version for version, _, _ in load_migrations()]
+    assert versions == sorted(versions)
+    assert versions[0] == 1
+
+
+# 迁移只执行一次，已执行的版本记录在schema_version中
+def test_upgrade_runs_once(conn):
+    _, executed = run_migrations(conn, 'sqlite', target=5)
+    assert executed == [1, 2, 3, 4, 5]
+    assert {'users', 'courses', 'registrations', 'schema_version'} <= _tables(conn)
+
+    _, executed = run_migrations(conn, 'sqlite', target=5)
+    assert executed == []
+    applied, pending = pending_migrations(MigrationContext(conn, 'sqlite'), 5)
+    assert applied == {1, 2, 3, 4, 5}
+    assert pending == []
+
+
+# 全新数据库上dry-run：输出所有迁移的语句，不建表也不记录版本
+def test_dry_run_on_fresh_database(conn):
+    pytest.importorskip('bcrypt')
+    ctx, executed = run_migrations(conn, 'sqlite', dry_run=True)
+
+    assert executed == [version for version, _, _ in load_migrations()]
+    assert any(statement.startswith('CREATE TABLE IF NOT EXISTS users') for statement in ctx.statements)
+    assert any(statement.startswith('INSERT INTO users') for statement in ctx.statements)
+    assert any(statement.startswith('INSERT INTO courses') for statement in ctx.statements)
+    assert _tables(conn) == set()
+
+
+# 查看状态和dry-run都不修改数据库
+def test_status_and_dry_run_write_nothing(tmp_path, capsys):
+    path = tmp_path / 'status.db'
+    assert main(['status', '--sqlite', str(path)]) == 0
+    assert main(['upgrade', '--dry-run', '--target', '2', '--sqlite', str(path)]) == 0
+    assert '待执行' in capsys.readouterr().out
+    conn = sqlite3.connect(str(path))
+    try:
+        assert _tables(conn) == set()
+    finally:
+        conn.close()
+
+
+# dry-run只在表确实不存在时按空表处理，其他查询错误照常抛出
+def test_dry_run_query_errors(conn):
+    ctx = MigrationContext(conn, 'sqlite', dry_run=True)
+    assert ctx.query('SELECT id FROM users') == []
+    with pytest.raises(sqlite3.OperationalError):
+        ctx.query('SELECT FROM')
+    with pytest.raises(sqlite3.OperationalError):
+        MigrationContext(conn, 'sqlite').query('SELECT id FROM users')
+
+
+class _ParserError(Exception):
+    def __init__(self, errno):
+        super().__init__(f'{errno}: Function \'ngram\' is not defined')
+        self.errno = errno
+
+
+# 记录执行的SQL，模拟不支持ngram解析器的MySQL/MariaDB
+class _NoNgramConnection:
+    def __init__(self, errno):
+        self.errno = errno
+        self.executed = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=()):
+        if 'WITH PARSER' in sql:
+            raise _ParserError(self.errno)
+        self.executed.append(sql)
+
+    def fetchall(self):
+        return []
+
+
+# 数据库不支持ngram时跳过全文索引并记录警告，不中断迁移
+@pytest.mark.parametrize('errno', [1128, 1524])
+def test_fulltext_index_skipped_without_parser(caplog, errno):
+    conn = _NoNgramConnection(errno)
+    ctx = MigrationContext(conn, 'mysql')
+
+    ctx.create_index('courses', 'ft_courses_search', ['title', 'description'], fulltext=True, parser='ngram')
+
+    assert 'ft_courses_search' in caplog.text
+    assert not any('ft_courses_search' in sql for sql in conn.executed)
+
+
+def test_other_index_errors_are_raised():
+    ctx = MigrationContext(_NoNgramConnection(1064), 'mysql')
+    with pytest.raises(_ParserError):
+        ctx.create_index('courses', 'ft_courses_search', ['title'], fulltext=True, parser='ngram')
+
+
+# 旧数据中无法解析的日期改为固定值并记录课程ID，不中断迁移
+def test_legacy_dates_with_invalid_values(conn, caplog):
+    migration = importlib.import_module('migrations.0003_datetime_columns')
+    conn.execute('CREATE TABLE courses (id VARCHAR(36), date VARCHAR(20), registration_start VARCHAR(20), registration_end VARCHAR(20))')
+    conn.execute('CREATE TABLE registrations (id VARCHAR(36), registration_date DATETIME)')
+    conn.executemany('INSERT INTO courses VALUES (?, ?, ?, ?)', [
+        ('ok', '2026-02-29', '2026-02-01T09:00', '2026-02-20 18:00'),
+        ('empty', '', '2026-02-01 09:00:00', '2026-02-20 18:00:00'),
+        ('garbage', '2026-03-01', '下周一', None)
+    ])
+
+    migration.upgrade(MigrationContext(conn, 'sqlite'))
+
+    rows = dict((row[0], row[1:]) for row in conn.execute('SELECT * FROM courses'))
+    assert rows['ok'] == ('2026-02-28', '2026-02-01 09:00:00', '2026-02-20 18:00:00')
+    assert rows['empty'] == ('1970-01-01', '2026-02-01 09:00:00', '2026-02-20 18:00:00')
+    assert rows['garbage'] == ('2026-03-01', '1970-01-01 00:00:00', '1970-01-01 00:00:00')
+    assert 'empty, garbage' in caplog.text
+
+
+# 记录执行的SQL，模拟MySQL会话变量查询
+class _RecordingConnection:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.executed = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=()):
+        self.executed.append(sql)
+        if self.fail and sql.startswith('ALTER TABLE'):
+            raise RuntimeError('rebuild failed')
+
+    def fetchall(self):
+        if self.executed[-1].startswith('SELECT @@SESSION'):
+            return [(1,)]
+        return []
+
+
+# 重建全文索引后恢复会话的停用词设置，重建失败时也要恢复
+@pytest.mark.parametrize('fail', [False, True])
+def test_stopword_setting_restored(fail):
+    migration = importlib.import_module('migrations.0009_fulltext_stopwords')
+    conn = _RecordingConnection(fail)
+    if fail:
+        with pytest.raises(RuntimeError):
+            migration.upgrade(MigrationContext(conn, 'mysql'))
+    else:
+        migration.upgrade(MigrationContext(conn, 'mysql'))
+    assert 'SET SESSION innodb_ft_enable_stopword = OFF' in conn.executed
+    assert conn.executed[-1] == 'SET SESSION innodb_ft_enable_stopword = ON'
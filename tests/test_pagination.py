@@ -0,0 +1,46 @@
+import pytest
+
+from pagination import CountCache
+
+
+# 记录执行次数的假游标
+class _Cursor:
+    def __init__(self, total):
+        self.total = total
+        self.executed = []
+
+    def execute(self, query, params):
+        self.executed.append((query, list(params)))
+
+    def fetchone(self):
+        return (self.total,)
+
+
+def test_count_cached_by_params():
+    cache = CountCache(ttl=30)
+    cursor = _Cursor(7)
+    assert cache.get_or_count(cursor, 'SELECT COUNT(*) FROM courses', []) == 7
+    cursor.total = 8
+    assert cache.get_or_count(cursor, 'SELECT COUNT(*) FROM courses', []) == 7
+    assert cache.get_or_count(cursor, 'SELECT COUNT(*) FROM courses WHERE title LIKE %s', ['%a%']) == 8
+    assert len(cursor.executed) == 2
+
+
+# 参数里的当前时间每次不同时，按调用方给出的key命中缓存
+@pytest.mark.parametrize('status', ['upcoming', 'ended'])
+def test_count_cached_by_key(status):
+    cache = CountCache(ttl=30)
+    cursor = _Cursor(3)
+    query = 'SELECT COUNT(*) FROM courses WHERE registration_end < %s'
+    assert cache.get_or_count(cursor, query, ['2026-01-01 10:00:00'], ((), status)) == 3
+    assert cache.get_or_count(cursor, query, ['2026-01-01 10:00:01'], ((), status)) == 3
+    assert cache.get_or_count(cursor, query, ['2026-01-01 10:00:02'], ((), 'ongoing')) == 3
+    assert len(cursor.executed) == 2
+
+
+def test_count_cache_disabled():
+    cache = CountCache(ttl=0)
+    cursor = _Cursor(1)
+    cache.get_or_count(cursor, 'SELECT COUNT(*) FROM courses', [])
+    cache.get_or_count(cursor, 'SELECT COUNT(*) FROM courses', [])
+    assert len(cursor.executed) == 2
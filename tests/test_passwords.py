@@ -0,0 +1,54 @@
+import threading
+import pytest
+
+pytest.importorskip('bcrypt')
+
+import passwords
+from passwords import UNUSABLE_PASSWORD, PasswordServiceBusy, hash_password, verify_password, needs_rehash
+
+
+@pytest.fixture(autouse=True)
+def fast_rounds(monkeypatch):
+    monkeypatch.setitem(passwords.PASSWORD_CONFIG, 'rounds', 4)
+
+
+def test_hash_and_verify():
+    hashed = hash_password('admin123')
+    assert hashed.startswith('$2b$04$')
+    assert verify_password('admin123', hashed)
+    assert not verify_password('wrong', hashed)
+
+
+# 微信账号的不可用密码、空值和无效哈希都不能通过校验
+@pytest.mark.parametrize('hashed', [UNUSABLE_PASSWORD, '', None, 'not-a-hash'])
+def test_unusable_hashes(hashed):
+    assert not verify_password('anything', hashed)
+
+
+def test_needs_rehash(monkeypatch):
+    hashed = hash_password('secret')
+    assert not needs_rehash(hashed)
+    monkeypatch.setitem(passwords.PASSWORD_CONFIG, 'rounds', 5)
+    assert needs_rehash(hashed)
+    assert not needs_rehash(UNUSABLE_PASSWORD)
+
+
+# 正在执行和排队的任务达到上限时立即失败，不阻塞请求线程
+def test_busy_when_saturated(monkeypatch):
+    slots = threading.BoundedSemaphore(2)
+    monkeypatch.setattr(passwords, '_slots', slots)
+    slots.acquire()
+    slots.acquire()
+    try:
+        with pytest.raises(PasswordServiceBusy):
+            hash_password('secret')
+    finally:
+        slots.release()
+        slots.release()
+    assert verify_password('secret', hash_password('secret'))
+
+
+# 任务完成后归还名额
+def test_slots_released():
+    for _ in range(passwords.PASSWORD_CONFIG['workers'] + passwords.PASSWORD_CONFIG['max_pending'] + 5):
+        hash_password('secret')
@@ -0,0 +1,82 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+from db_init import db_connection
+
+
+def _register_all(app, course_id, tokens, workers=20):
+    def register(token):
+        with app.test_client() as client:
+            response = client.post(f'/api/courses/{course_id}/register',
+                                   headers={'Authorization': f'Bearer {token}'})
+            return response.status_code, response.get_json()['message']
+
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(register, tokens))
+
+
+def _counts(course_id):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT capacity, registered FROM courses WHERE id = %s', (course_id,))
+        capacity, registered = c.fetchone()
+        c.execute('SELECT COUNT(*) FROM registrations WHERE course_id = %s', (course_id,))
+        return capacity, registered, c.fetchone()[0]
+
+
+# 并发报名同一门课程：报名成功人数恰好等于容量，其余请求返回409而不是500
+def test_parallel_registrations_do_not_oversell(app, open_course, create_users, make_token):
+    course_id = open_course(5)
+    tokens = [make_token(user_id) for user_id in create_users(60)]
+
+    results = _register_all(app, course_id, tokens)
+
+    statuses = [status for status, _ in results]
+    assert statuses.count(200) == 5
+    assert all(status == 409 for status in statuses if status != 200)
+    assert all(message == '课程已满' for status, message in results if status == 409)
+    capacity, registered, rows = _counts(course_id)
+    assert registered == rows == capacity
+
+
+# 同一用户并发重复报名：只有一次成功，名额只占用一个
+def test_parallel_duplicate_registrations(app, open_course, create_users, make_token):
+    course_id = open_course(10)
+    token = make_token(create_users(1)[0])
+
+    results = _register_all(app, course_id, [token] * 20)
+
+    statuses = [status for status, _ in results]
+    assert statuses.count(200) == 1
+    assert all(status == 409 for status in statuses if status != 200)
+    _, registered, rows = _counts(course_id)
+    assert registered == rows == 1
+
+
+# 不存在的课程返回404，已满的课程返回409
+def test_registration_failure_statuses(app, open_course, create_users, make_token):
+    course_id = open_course(0)
+    with app.test_client() as client:
+        headers = {'Authorization': f'Bearer {make_token(create_users(1)[0])}'}
+        assert client.post(f'/api/courses/{course_id}/register', headers=headers).status_code == 409
+        assert client.post(f'/api/courses/{uuid.uuid4()}/register', headers=headers).status_code == 404
+
+
+# 取消报名后名额从数据库重新加载，不会多放出名额
+def test_unregister_then_fill(app, open_course, create_users, make_token):
+    course_id = open_course(2)
+    tokens = [make_token(user_id) for user_id in create_users(3)]
+    with app.test_client() as client:
+        headers = {'Authorization': f'Bearer {tokens[0]}'}
+        assert client.post(f'/api/courses/{course_id}/register', headers=headers).status_code == 200
+        assert client.delete(f'/api/courses/{course_id}/unregister', headers=headers).status_code == 200
+
+    results = _register_all(app, course_id, tokens * 5)
+
+    statuses = [status for status, _ in results]
+    assert statuses.count(200) == 2
+    capacity, registered, rows = _counts(course_id)
+    assert registered == rows == capacity
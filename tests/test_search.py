@@ -0,0 +1,60 @@
+import uuid
+import pytest
+import config
+from search import build_search, _boolean_query
+
+
+@pytest.fixture
+def fulltext(monkeypatch):
+    monkeypatch.setitem(config.SEARCH_CONFIG, 'fulltext', True)
+    monkeypatch.setitem(config.SEARCH_CONFIG, 'ngram_token_size', 2)
+
+
+# 不短于ngram分词长度的词按短语匹配，更短的词按前缀匹配，布尔运算符被去掉
+def test_boolean_query(fulltext):
+    assert _boolean_query('急救 培训') == '+"急救" +"培训"'
+    assert _boolean_query('a') == '+a*'
+    assert _boolean_query('+xiao* -"ming"') == '+"xiao" +"ming"'
+    assert _boolean_query('+-*') == ''
+
+
+def test_build_search_fulltext(fulltext):
+    condition, params, order_sql, order_params = build_search(['title', 'description'], '心肺复苏')
+    assert condition == 'MATCH(title, description) AGAINST (%s IN BOOLEAN MODE)'
+    assert params == ['+"心肺复苏"']
+    assert order_sql == f'{condition} DESC'
+    assert order_params == params
+
+
+# 关闭全文索引或输入只有运算符时退回LIKE匹配
+@pytest.mark.parametrize('enabled, search', [(False, 'xiao'), (True, '***')])
+def test_build_search_like_fallback(monkeypatch, enabled, search):
+    monkeypatch.setitem(config.SEARCH_CONFIG, 'fulltext', enabled)
+    condition, params, order_sql, _ = build_search(['username', 'email'], search)
+    assert condition == '(username LIKE %s OR email LIKE %s)'
+    assert params == [f'%{search}%'] * 2
+    assert order_sql is None
+
+
+# 全文索引不受停用词影响：包含 a、i 的英文子串与LIKE匹配的结果一致
+@pytest.mark.parametrize('search', ['xia', 'mail', 'aid'])
+def test_fulltext_matches_like_for_ascii(mysql_db, fulltext, search):
+    from db_init import db_connection
+    user_id = str(uuid.uuid4())
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('''INSERT INTO users (id, username, email, password, phone, organization, address, is_admin)
+                     VALUES (%s, %s, %s, %s, %s, %s, %s, 0)''',
+                  (user_id, 'xiaoming', f'{user_id}@mail.example.com', '!', '13800000000', 'First Aid Team', ''))
+        conn.commit()
+        try:
+            results = {}
+            for enabled in (True, False):
+                config.SEARCH_CONFIG['fulltext'] = enabled
+                condition, params, _, _ = build_search(['username', 'email', 'phone', 'organization'], search)
+                c.execute(f'SELECT id FROM users WHERE id = %s AND {condition}', [user_id] + params)
+                results[enabled] = c.fetchall()
+            assert results[True] == results[False] == [(user_id,)]
+        finally:
+            c.execute('DELETE FROM users WHERE id = %s', (user_id,))
+            conn.commit()
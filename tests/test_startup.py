@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('sqlalchemy')
+
+import app as app_module
+import db_init
+
+
+# 同一进程内多次调用 init_db 只执行一次迁移
+def test_init_db_runs_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(db_init, '_initialized', False)
+    monkeypatch.setattr(db_init, 'run_migrations', lambda: calls.append(1) or [])
+
+    db_init.init_db()
+    db_init.init_db()
+
+    assert calls == [1]
+
+
+# 建库前迁移失败时先建库再重试
+def test_init_db_creates_database_on_failure(monkeypatch):
+    calls = []
+
+    def run_migrations():
+        calls.append('migrate')
+        if calls.count('migrate') == 1:
+            raise RuntimeError('Unknown database')
+        return []
+
+    monkeypatch.setattr(db_init, '_initialized', False)
+    monkeypatch.setattr(db_init, 'run_migrations', run_migrations)
+    monkeypatch.setattr(db_init, 'create_database', lambda: calls.append('create'))
+
+    db_init.init_db()
+
+    assert calls == ['migrate', 'create', 'migrate']
+
+
+# 快速启动模式下创建应用不访问数据库
+@pytest.mark.parametrize('fast', [True, False])
+def test_create_app_fast_startup(monkeypatch, fast):
+    calls = []
+    monkeypatch.setenv('FAST_STARTUP', '1' if fast else '0')
+    monkeypatch.setitem(app_module.STARTUP_CONFIG, 'fast_startup', False)
+    monkeypatch.setattr(app_module, 'init_db', lambda: calls.append(1))
+
+    application = app_module.create_app()
+
+    assert 'admin.admin_dashboard' in application.view_functions
+    assert calls == ([] if fast else [1])
@@ -0,0 +1,85 @@
+import os
+import time
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('PIL')
+
+import config
+
+DAY = 86400
+
+
+@pytest.fixture
+def gc(mysql_db, tmp_path, monkeypatch):
+    import upload_gc
+    uploads = tmp_path / 'uploads'
+    uploads.mkdir()
+    monkeypatch.setattr(upload_gc, 'UPLOADS_DIR', str(uploads))
+    monkeypatch.setattr(upload_gc, 'INCOMING_DIR', str(uploads / '.incoming'))
+    monkeypatch.setattr(upload_gc, 'QUARANTINE_DIR', str(uploads / '.quarantine'))
+    monkeypatch.setitem(config.UPLOAD_GC_CONFIG, 'batch_pause', 0)
+    monkeypatch.setitem(config.UPLOAD_GC_CONFIG, 'quarantine_retention', 7 * DAY)
+    return upload_gc, uploads
+
+
+# 创建文件并把修改时间设为 age 秒之前
+def _write(path, age, size=1000):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+# 早于保留期的孤儿文件先进入隔离区，同一轮不会被删除，也只统计一次
+def test_old_orphan_is_quarantined_not_deleted(gc):
+    upload_gc, uploads = gc
+    _write(uploads / 'orphan.png', 30 * DAY)
+
+    report = upload_gc.collect('quarantine')
+
+    assert (report['orphaned'], report['expired'], report['files'], report['bytes']) == (1, 0, 1, 1000)
+    assert not (uploads / 'orphan.png').exists()
+    assert (uploads / '.quarantine' / 'orphan.png').exists()
+    assert upload_gc.collect('quarantine')['files'] == 0
+
+
+# 保护期内的文件不处理；过期的临时文件和隔离文件被删除
+def test_expiry(gc):
+    upload_gc, uploads = gc
+    _write(uploads / 'recent.png', 60)
+    _write(uploads / '.incoming' / 'stale.part', 2 * config.UPLOAD_CONFIG['grace_period'])
+    _write(uploads / '.incoming' / 'active.part', 0)
+    _write(uploads / '.quarantine' / 'old.png', 8 * DAY)
+    _write(uploads / '.quarantine' / 'young.png', 1 * DAY)
+
+    report = upload_gc.collect('quarantine')
+
+    assert (report['recent'], report['orphaned'], report['expired'], report['files']) == (1, 0, 2, 2)
+    assert (uploads / 'recent.png').exists()
+    assert sorted(os.listdir(uploads / '.incoming')) == ['active.part']
+    assert sorted(os.listdir(uploads / '.quarantine')) == ['young.png']
+
+
+def test_delete_mode(gc):
+    upload_gc, uploads = gc
+    _write(uploads / 'orphan.png', 30 * DAY)
+
+    report = upload_gc.collect('delete')
+
+    assert report['files'] == 1
+    assert os.listdir(uploads) == []
+
+
+# dry-run只统计，不移动也不删除任何文件
+def test_dry_run(gc):
+    upload_gc, uploads = gc
+    _write(uploads / 'orphan.png', 30 * DAY)
+    _write(uploads / '.quarantine' / 'old.png', 8 * DAY)
+
+    report = upload_gc.collect('quarantine', dry_run=True)
+
+    assert (report['orphaned'], report['expired'], report['files'], report['bytes']) == (1, 1, 2, 2000)
+    assert (uploads / 'orphan.png').exists()
+    assert (uploads / '.quarantine' / 'old.png').exists()
@@ -0,0 +1,125 @@
+import hashlib
+import io
+import os
+import pytest
+
+flask = pytest.importorskip('flask')
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('mysql.connector')
+
+import config
+from uploads import UploadRequest, send_upload
+
+HASHED = 'a' * 64 + '.png'
+
+
+@pytest.fixture
+def uploads_dir(tmp_path):
+    path = tmp_path / 'uploads'
+    path.mkdir()
+    (path / HASHED).write_bytes(b'0123456789')
+    (path / 'legacy.png').write_bytes(b'0123456789')
+    return path
+
+
+@pytest.fixture
+def client(tmp_path, uploads_dir):
+    app = flask.Flask(__name__, root_path=str(tmp_path))
+    app.request_class = UploadRequest
+
+    @app.route('/uploads/<path:filename>')
+    def uploads(filename):
+        return send_upload(str(uploads_dir), filename)
+
+    @app.route('/ignore', methods=['POST'])
+    def ignore():
+        return str(len(flask.request.files.getlist('image')))
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        import images
+        try:
+            return images.save_upload(flask.request.files['image'], str(uploads_dir))
+        except images.InvalidImageError as e:
+            return str(e), 400
+
+    with app.test_client() as client:
+        yield client
+
+
+# 内容哈希命名的文件长期缓存，其他文件使用较短的缓存时间
+def test_cache_headers(client):
+    response = client.get(f'/uploads/{HASHED}')
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+    assert f"max-age={config.UPLOAD_CONFIG['immutable_max_age']}" in response.headers['Cache-Control']
+
+    response = client.get('/uploads/legacy.png')
+    assert 'immutable' not in response.headers['Cache-Control']
+    assert f"max-age={config.UPLOAD_CONFIG['max_age']}" in response.headers['Cache-Control']
+
+
+def test_range_request(client):
+    response = client.get(f'/uploads/{HASHED}', headers={'Range': 'bytes=2-5'})
+    assert response.status_code == 206
+    assert response.data == b'2345'
+
+
+# 不对外提供隐藏文件（如正在接收的 .incoming）
+@pytest.mark.parametrize('filename', ['.incoming/x.part', '.quarantine'])
+def test_hidden_files_not_served(client, filename):
+    assert client.get(f'/uploads/{filename}').status_code == 404
+
+
+# x-accel 模式只返回 X-Accel-Redirect 头，由nginx发送文件
+def test_x_accel_redirect(client, monkeypatch):
+    monkeypatch.setitem(config.UPLOAD_CONFIG, 'sendfile', 'x-accel')
+    response = client.get(f'/uploads/{HASHED}')
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == config.UPLOAD_CONFIG['accel_prefix'] + HASHED
+    assert response.headers['Content-Type'] == 'image/png'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert response.data == b''
+    assert client.get('/uploads/missing.png').status_code == 404
+
+
+def _png(color):
+    Image = pytest.importorskip('PIL.Image')
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+# 相同内容的图片只保存一份，文件名为内容的sha256
+def test_identical_uploads_are_deduplicated(client, uploads_dir):
+    data = _png('red')
+    urls = [client.post('/upload', data={'image': (io.BytesIO(data), 'a.png')}).get_data(as_text=True) for _ in range(2)]
+
+    assert urls[0] == urls[1]
+    assert urls[0] == f'/uploads/{hashlib.sha256(data).hexdigest()}.png'
+    assert os.listdir(uploads_dir / '.incoming') == []
+    assert client.get(urls[0]).data == data
+
+
+def test_non_image_rejected(client, uploads_dir):
+    pytest.importorskip('PIL')
+    response = client.post('/upload', data={'image': (io.BytesIO(b'not an image'), 'a.png')})
+    assert response.status_code == 400
+    assert os.listdir(uploads_dir / '.incoming') == []
+
+
+# 保存的原图与缩略图一样使用默认权限，而不是mkstemp的0600，前端服务器可以读取
+def test_saved_upload_is_world_readable(client, uploads_dir):
+    url = client.post('/upload', data={'image': (io.BytesIO(_png('blue')), 'b.png')}).get_data(as_text=True)
+    mode = os.stat(uploads_dir / os.path.basename(url)).st_mode & 0o777
+    umask = os.umask(0)
+    os.umask(umask)
+    assert mode == 0o666 & ~umask
+
+
+# 请求结束时删除所有未保存的上传文件，包括同一字段的多个文件
+def test_unsaved_uploads_are_removed(client, uploads_dir):
+    files = [(io.BytesIO(b'x' * 100), f'{i}.png') for i in range(3)]
+    response = client.post('/ignore', data={'image': files, 'other': (io.BytesIO(b'y'), 'o.png')})
+    assert response.get_data(as_text=True) == '3'
+    assert os.listdir(uploads_dir / '.incoming') == []
@@ -0,0 +1,42 @@
+import uuid
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('Crypto')
+
+from db_init import db_connection
+
+
+@pytest.fixture
+def openid(app, monkeypatch):
+    import wx_login
+    openid = f'o-{uuid.uuid4().hex}'
+    monkeypatch.setattr(wx_login, 'get_wechat_session_key', lambda code: {'openid': openid, 'session_key': ''})
+    yield openid
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('DELETE FROM users WHERE wechat_openid = %s', (openid,))
+        conn.commit()
+
+
+# 第一次登录创建用户，之后的登录（信息未变化时也一样）返回同一个用户及其在数据库中的字段
+def test_login_creates_then_reuses_user(app, openid):
+    with app.test_client() as client:
+        first = client.get('/api/wechat/login?code=c1').get_json()['user']
+        assert first['is_admin'] == 0
+
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute('UPDATE users SET is_admin = 1 WHERE id = %s', (first['id'],))
+            conn.commit()
+
+        for code in ('c2', 'c3'):
+            user = client.get(f'/api/wechat/login?code={code}').get_json()['user']
+            assert user['id'] == first['id']
+            assert user['email'] == f'{openid}@wechat.com'
+            assert user['is_admin'] == 1
+
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT COUNT(*) FROM users WHERE wechat_openid = %s', (openid,))
+        assert c.fetchone()[0] == 1
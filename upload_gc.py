@@ -0,0 +1,187 @@
+import argparse
+import logging
+import os
+import threading
+import time
+from config import UPLOAD_CONFIG, UPLOAD_GC_CONFIG
+from db_init import db_connection
+from images import parse_variants
+from uploads import image_files
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+INCOMING_DIR = os.path.join(UPLOADS_DIR, '.incoming')
+QUARANTINE_DIR = os.path.join(UPLOADS_DIR, '.quarantine')
+
+
+# 所有课程引用的文件名（原图和各个版本）
+def referenced_files(conn):
+    c = conn.cursor()
+    c.execute("SELECT image, image_variants FROM courses WHERE image IS NOT NULL AND image <> ''")
+    referenced = set()
+    for image, variants in c.fetchall():
+        referenced.update(image_files(image, parse_variants(variants)))
+    return referenced
+
+
+# 逐批遍历目录中的普通文件，os.scandir 不会一次性读出整个目录
+def _scan_batches(directory, batch_size):
+    batch = []
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                continue
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _remove(entry, mode):
+    if mode == 'quarantine':
+        os.makedirs(QUARANTINE_DIR, exist_ok=True)
+        target = os.path.join(QUARANTINE_DIR, entry.name)
+        os.replace(entry.path, target)
+        # 移动不改变修改时间；保留期从隔离时开始计算，否则早已过期的孤儿文件会在同一轮中被直接删除
+        os.utime(target)
+    else:
+        os.unlink(entry.path)
+
+
+# 删除超过时限的文件（未完成的上传、隔离区过期文件），返回 (文件数, 字节数)
+def _expire(directory, max_age, dry_run):
+    count = size = 0
+    cutoff = time.time() - max_age
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return count, size
+    with entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                continue
+            if not dry_run:
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    continue
+            count += 1
+            size += stat.st_size
+    return count, size
+
+
+# 清理上传目录：不被任何课程引用、且修改时间早于保护期的文件按配置隔离或删除。
+# 引用集合在每批删除前重新读取，清理期间新保存的课程不会丢失图片；
+# 多个进程同时清理时只有拿到数据库锁的进程执行，其余直接返回None
+def collect(mode=None, dry_run=False):
+    mode = mode or UPLOAD_GC_CONFIG['mode']
+    # files/bytes 为本轮处理（隔离或删除）的文件合计，其中 expired 个是过期的临时文件和隔离文件
+    report = {'mode': mode, 'dry_run': dry_run, 'scanned': 0, 'orphaned': 0, 'recent': 0, 'expired': 0, 'files': 0, 'bytes': 0}
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT GET_LOCK('upload_gc', 0)")
+        if c.fetchone()[0] != 1:
+            return None
+        try:
+            cutoff = time.time() - UPLOAD_CONFIG['grace_period']
+            for batch in _scan_batches(UPLOADS_DIR, UPLOAD_GC_CONFIG['batch_size']):
+                report['scanned'] += len(batch)
+                candidates = []
+                for entry in batch:
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    if stat.st_mtime > cutoff:
+                        report['recent'] += 1
+                        continue
+                    candidates.append((entry, stat.st_size))
+                if candidates:
+                    conn.commit()  # 结束上一个快照，读取最新的引用
+                    referenced = referenced_files(conn)
+                    for entry, size in candidates:
+                        if entry.name in referenced:
+                            continue
+                        report['orphaned'] += 1
+                        if not dry_run:
+                            try:
+                                _remove(entry, mode)
+                            except FileNotFoundError:
+                                continue
+                        report['files'] += 1
+                        report['bytes'] += size
+                time.sleep(UPLOAD_GC_CONFIG['batch_pause'])
+        finally:
+            c.execute("SELECT RELEASE_LOCK('upload_gc')")
+            c.fetchone()
+
+    # 中断的上传留下的临时文件，以及隔离期已过的文件
+    for directory, max_age in ((INCOMING_DIR, UPLOAD_CONFIG['grace_period']),
+                               (QUARANTINE_DIR, UPLOAD_GC_CONFIG['quarantine_retention'])):
+        count, size = _expire(directory, max_age, dry_run)
+        report['expired'] += count
+        report['files'] += count
+        report['bytes'] += size
+
+    if report['files']:
+        logger.info("上传目录清理完成：检查 %s 个文件，处理 %s 个，共 %s 字节（%s）",
+                    report['scanned'], report['files'], report['bytes'], mode)
+    return report
+
+
+_sweeper = None
+
+
+# 启动后台清理线程（同一进程只启动一次）
+def start_sweeper():
+    global _sweeper
+    interval = UPLOAD_GC_CONFIG['interval']
+    if interval <= 0 or _sweeper is not None:
+        return
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                collect()
+            except Exception:
+                logger.exception("上传目录清理失败")
+
+    _sweeper = threading.Thread(target=run, name='upload-gc', daemon=True)
+    _sweeper.start()
+
+
+# 命令行入口：python upload_gc.py [--dry-run] [--mode quarantine|delete]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='清理上传目录中不再被引用的文件')
+    parser.add_argument('--dry-run', action='store_true', help='只统计，不删除文件')
+    parser.add_argument('--mode', choices=['quarantine', 'delete'], help='隔离或直接删除（默认取配置）')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    report = collect(args.mode, args.dry_run)
+    if report is None:
+        print('其他进程正在清理，请稍后重试')
+        return 1
+    action = '可回收' if args.dry_run else '已回收'
+    print(f"检查 {report['scanned']} 个文件，未被引用 {report['orphaned']} 个，保护期内跳过 {report['recent']} 个，过期临时/隔离文件 {report['expired']} 个")
+    print(f"{action} {report['files']} 个文件，{report['bytes'] / 1024 / 1024:.2f}MB")
+    return 0
+
+
+# 导出
+__all__ = ['referenced_files', 'collect', 'start_sweeper']
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
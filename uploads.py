@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from flask import Request, current_app, send_from_directory, make_response, abort
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.security import safe_join
+from config import UPLOAD_CONFIG
+from db_init import db_connection
+
+logger = logging.getLogger(__name__)
+
+# 内容哈希命名的上传文件（images.save_upload 生成的文件及其缩略图版本）
+_CONTENT_ADDRESSED = re.compile(r'^[0-9a-f]{64}(_\w+)?\.\w+$')
+
+# 识别文件类型需要的文件头长度
+_SNIFF_BYTES = 16
+
+
+# 普通新建文件的权限（0666去掉umask）；mkstemp创建的文件是0600，改名后nginx等其他用户无法读取
+def _default_file_mode():
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+_FILE_MODE = _default_file_mode()
+
+
+def upload_folder():
+    return os.path.join(current_app.root_path, 'uploads')
+
+
+# 上传文件的接收流：表单解析时边接收边写入 uploads/.incoming，同时计算sha256、
+# 保留文件头用于识别类型，超过大小上限立即中止，不必等整个文件接收完。
+# 文件与最终目录在同一文件系统上，确认保存时直接改名，不再复制。
+class IncomingFile:
+    def __init__(self, directory, max_size):
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._digest = hashlib.sha256()
+        self.max_size = max_size
+        self.size = 0
+        self.head = b''
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            self.discard()
+            raise RequestEntityTooLarge(f'上传文件不能超过 {self.max_size // (1024 * 1024)}MB')
+        if len(self.head) < _SNIFF_BYTES:
+            self.head += data[:_SNIFF_BYTES - len(self.head)]
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+    # 把已接收的文件改名为最终路径；目标已存在（相同内容）时丢弃本文件
+    def commit(self, path):
+        self._file.close()
+        if os.path.exists(path):
+            os.unlink(self.path)
+            # 更新修改时间，避免被刚好在清理的旧文件逻辑当作过期文件删除
+            os.utime(path)
+        else:
+            os.chmod(self.path, _FILE_MODE)
+            os.replace(self.path, path)
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    # 其余文件操作（read/seek/tell/close等）交给底层文件
+    def __getattr__(self, name):
+        if name == '_file':
+            raise AttributeError(name)
+        return getattr(self._file, name)
+
+
+# 请求类：上传的文件写入 IncomingFile，而不是Werkzeug默认的内存/系统临时文件
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return IncomingFile(os.path.join(upload_folder(), '.incoming'), UPLOAD_CONFIG['max_file_size'])
+
+    # 请求结束时删除未被保存的上传文件
+    def close(self):
+        files = self.__dict__.get('files')
+        super().close()
+        # 同一字段可以上传多个文件，values()只返回每个字段的第一个
+        for _, file in (files.items(multi=True) if files else ()):
+            if isinstance(file.stream, IncomingFile):
+                file.stream.discard()
+
+
+# 发送上传文件：内容哈希命名的文件标记为immutable长期缓存；
+# 配置了 x-accel 时只返回 X-Accel-Redirect 头，由nginx直接发送文件
+def send_upload(uploads_dir, filename):
+    # 不对外提供正在接收的上传文件（.incoming）等隐藏文件
+    if filename.startswith('.'):
+        abort(404)
+    immutable = bool(_CONTENT_ADDRESSED.match(filename))
+    max_age = UPLOAD_CONFIG['immutable_max_age'] if immutable else UPLOAD_CONFIG['max_age']
+
+    if UPLOAD_CONFIG['sendfile'] == 'x-accel':
+        path = safe_join(uploads_dir, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = UPLOAD_CONFIG['accel_prefix'] + filename
+        response.headers['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    else:
+        # 支持Range和条件请求；x-sendfile 由 USE_X_SENDFILE 交给前端服务器发送
+        response = send_from_directory(uploads_dir, filename, max_age=max_age)
+
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+
+# 课程图片对应的所有文件（原图和各个版本）
+def image_files(image, variants):
+    files = [image] if image else []
+    for variant in variants.values():
+        files.extend([variant.get('src'), variant.get('webp')])
+    return [os.path.basename(f) for f in files if f and f.startswith('/uploads/')]
+
+
+# 课程更换或删除图片后调用：图片不再被任何课程引用时删除原图和各个版本。
+# 相同内容的图片只保存一份，删除前再确认一次引用；最近刚写入/复用的文件暂不删除，留给定期清理
+def remove_unreferenced(image, variants, uploads_dir):
+    if not image:
+        return 0
+    try:
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT 1 FROM courses WHERE image = %s LIMIT 1', (image,))
+            if c.fetchone():
+                return 0
+    except Exception:
+        # 课程数据已保存，清理失败不影响请求结果，留给定期清理
+        logger.exception("检查图片引用失败: %s", image)
+        return 0
+
+    removed = 0
+    cutoff = time.time() - UPLOAD_CONFIG['grace_period']
+    for filename in image_files(image, variants):
+        path = os.path.join(uploads_dir, filename)
+        try:
+            if os.path.getmtime(path) > cutoff:
+                continue
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.exception("删除图片文件失败: %s", path)
+    if removed:
+        logger.info("已删除不再使用的图片 %s（%s 个文件）", image, removed)
+    return removed
+
+
+# 导出
+__all__ = ['IncomingFile', 'UploadRequest', 'send_upload', 'image_files', 'remove_unreferenced', 'upload_folder']
@@ -1,13 +1,15 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 import uuid
-import bcrypt
-import jwt
 import datetime
-from functools import wraps
-from db_init import get_db_connection
-from auth import admin_required
-from config import FLASK_CONFIG
+import logging
+from db_init import get_db_connection, db_connection
+from auth import admin_required, login_required, invalidate_user
 from models import User
+from passwords import PasswordServiceBusy, hash_password, verify_password
+from search import build_search
+from pagination import InvalidCursorError, encode_cursor, decode_cursor, keyset_condition, count_cache, wants_total
+
+logger = logging.getLogger(__name__)
 
 # 创建蓝图
 user_bp = Blueprint('user', __name__)
@@ -52,7 +54,7 @@ def register():
             return jsonify({'message': '用户已存在'}), 400
 
         # 哈希密码
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = hash_password(password)
 
         # 创建用户
         user_id = str(uuid.uuid4())
@@ -71,12 +73,23 @@ def register():
         db.commit()
         db.close()
         return jsonify({'message': '注册成功'}), 201
+    except PasswordServiceBusy as e:
+        if 'db' in locals() and db:
+            db.close()
+        return jsonify({'message': str(e)}), 429
     except Exception as e:
         if 'db' in locals() and db:
             db.rollback()
             db.close()
         return jsonify({'message': f'注册失败: {str(e)}'}), 500
 
+# 用户类型筛选条件（与管理后台用户列表的筛选按钮对应）
+USER_TYPE_CONDITIONS = {
+    'admin': 'is_admin = 1',
+    'wechat': 'is_wechat_user = 1 AND is_admin = 0',
+    'normal': 'is_wechat_user = 0 AND is_admin = 0'
+}
+
 @user_bp.route('/api/admin/users', methods=['GET'])
 @admin_required
 def get_users():
@@ -90,37 +103,65 @@ def get_users():
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
         offset = (page - 1) * per_page
+        # 传入cursor参数时使用游标分页（首页传空字符串），否则沿用页码分页
+        cursor = request.args.get('cursor')
 
         # 构建SQL查询
-        query = 'SELECT id, username, email, phone, organization, is_admin, wechat_unionid FROM users'
+        query = 'SELECT id, username, email, phone, organization, is_admin, is_wechat_user FROM users'
         count_query = 'SELECT COUNT(*) FROM users'
         conditions = []
         params = []
+        order_sql, order_params = None, []
 
         # 添加搜索条件
         if search:
-            conditions.append('(username LIKE %s OR email LIKE %s OR phone LIKE %s OR organization LIKE %s)')
-            params.extend([f'%{search}%', f'%{search}%', f'%{search}%', f'%{search}%'])
+            search_sql, search_params, order_sql, order_params = build_search(['username', 'email', 'phone', 'organization'], search)
+            conditions.append(search_sql)
+            params.extend(search_params)
+
+        # 添加用户类型筛选条件
+        user_type = request.args.get('type', '')
+        if user_type in USER_TYPE_CONDITIONS:
+            conditions.append(USER_TYPE_CONDITIONS[user_type])
 
         # 组合查询条件
         if conditions:
-            query += ' WHERE ' + ' AND '.join(conditions)
             count_query += ' WHERE ' + ' AND '.join(conditions)
+        count_params = list(params)
 
-        # 添加排序
-        query += ' ORDER BY username ASC'
+        # 游标分页：从上一页最后一条记录的 (username, id) 之后继续取
+        if cursor:
+            keyset_sql, keyset_params = keyset_condition(['username', 'id'], decode_cursor(cursor, 2))
+            conditions.append(keyset_sql)
+            params.extend(keyset_params)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
 
-        # 添加分页
-        query += ' LIMIT %s OFFSET %s'
-        params.extend([per_page, offset])
+        # 添加排序：页码分页下的全文搜索按相关度排序，其余按 (username, id) 排序
+        order_by_relevance = order_sql is not None and cursor is None
+        if order_by_relevance:
+            query += f' ORDER BY {order_sql}, username ASC, id ASC'
+            params.extend(order_params)
+        else:
+            query += ' ORDER BY username ASC, id ASC'
+
+        # 添加分页，多取一条用于判断是否还有下一页
+        if cursor is not None:
+            query += ' LIMIT %s'
+            params.append(per_page + 1)
+        else:
+            query += ' LIMIT %s OFFSET %s'
+            params.extend([per_page + 1, offset])
 
         # 执行查询
         c.execute(query, params)
         users = c.fetchall()
+        has_more = len(users) > per_page
+        users = users[:per_page]
+        next_cursor = encode_cursor([users[-1][1], users[-1][0]]) if has_more and not order_by_relevance else None
 
-        # 获取总记录数
-        c.execute(count_query, params[:-2])
-        total = c.fetchone()[0]
+        # 获取总记录数（with_total=0 时跳过）
+        total = count_cache.get_or_count(c, count_query, count_params) if wants_total(request.args) else None
 
         # 转换为字典格式
         user_list = []
@@ -133,55 +174,55 @@ def get_users():
                     'phone': user[3],
                     'organization': user[4],
                     'is_admin': user[5] if len(user) > 5 else 0,
-                    'is_wechat_user': 1 if (len(user) > 6 and user[6]) else 0
+                    'is_wechat_user': user[6] if len(user) > 6 else 0
                 }
                 user_list.append(user_dict)
 
         # 返回带分页信息的响应
-        return jsonify({
-            'users': user_list,
-            'pagination': {
+        if cursor is not None:
+            pagination = {
+                'total': total,
+                'per_page': per_page,
+                'has_more': has_more,
+                'next_cursor': next_cursor
+            }
+        else:
+            pagination = {
                 'total': total,
                 'page': page,
                 'per_page': per_page,
-                'has_more': (page * per_page) < total
+                'has_more': has_more,
+                'next_cursor': next_cursor
             }
+        return jsonify({
+            'users': user_list,
+            'pagination': pagination
         }), 200
+    except InvalidCursorError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
-        print(f"获取用户列表失败: {str(e)}")
+        logger.exception("获取用户列表失败")
         return jsonify({'message': f'获取用户列表失败: {str(e)}'}), 500
     finally:
         if conn:
             conn.close()
 
 @user_bp.route('/api/user-info', methods=['GET'])
+@login_required
 def get_user_info():
     # 从查询参数获取user_id
     user_id = request.args.get('user_id')
     
-    # 从Authorization头中获取token
-    token = request.headers.get('Authorization') or request.headers.get('authorization')
-    if not token:
-        return jsonify({'message': '缺少认证令牌'}), 401
-
-    # 移除Bearer前缀
-    if token.startswith('Bearer '):
-        token = token[7:]
-
     try:
-        # 解码token
-        jwt.decode(token, FLASK_CONFIG['SECRET_KEY'], algorithms=['HS256'])
-        
         # 如果没有提供user_id，返回错误
         if not user_id:
             return jsonify({'message': '缺少用户ID参数'}), 400
 
         # 查找用户
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute('SELECT * FROM users WHERE id = %s', (user_id,))
-        user = c.fetchone()
-        conn.close()
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT * FROM users WHERE id = %s', (user_id,))
+            user = c.fetchone()
 
         if not user:
             return jsonify({'message': '用户不存在'}), 404
@@ -198,35 +239,20 @@ def get_user_info():
         }
 
         return jsonify(user_dict), 200
-    except jwt.ExpiredSignatureError:
-        return jsonify({'message': '认证令牌已过期'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'message': '无效的认证令牌'}), 401
     except Exception as e:
         return jsonify({'message': f'获取用户信息失败: {str(e)}'}), 500
 
 @user_bp.route('/api/user-profile', methods=['GET'])
+@login_required
 def get_user_profile():
-    # 从Authorization头中获取token
-    token = request.headers.get('Authorization') or request.headers.get('authorization')
-    if not token:
-        return jsonify({'message': '缺少认证令牌'}), 401
-
-    # 移除Bearer前缀
-    if token.startswith('Bearer '):
-        token = token[7:]
-
     try:
-        # 解码token
-        data = jwt.decode(token, FLASK_CONFIG['SECRET_KEY'], algorithms=['HS256'])
-        user_id = data['user_id']
+        user_id = g.user['user_id']
 
         # 查找用户
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute('SELECT * FROM users WHERE id = %s', (user_id,))
-        user = c.fetchone()
-        conn.close()
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT * FROM users WHERE id = %s', (user_id,))
+            user = c.fetchone()
 
         if not user:
             return jsonify({'message': '用户不存在'}), 404
@@ -244,28 +270,14 @@ def get_user_profile():
         }
 
         return jsonify(user_dict), 200
-    except jwt.ExpiredSignatureError:
-        return jsonify({'message': '认证令牌已过期'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'message': '无效的认证令牌'}), 401
     except Exception as e:
         return jsonify({'message': f'获取个人信息失败: {str(e)}'}), 500
 
 @user_bp.route('/api/user-profile', methods=['PUT'])
+@login_required
 def update_user_profile():
-    # 从Authorization头中获取token
-    token = request.headers.get('Authorization') or request.headers.get('authorization')
-    if not token:
-        return jsonify({'message': '缺少认证令牌'}), 401
-
-    # 移除Bearer前缀
-    if token.startswith('Bearer '):
-        token = token[7:]
-
     try:
-        # 解码token
-        data = jwt.decode(token, FLASK_CONFIG['SECRET_KEY'], algorithms=['HS256'])
-        user_id = data['user_id']
+        user_id = g.user['user_id']
 
         # 获取更新数据
         update_data = request.get_json()
@@ -276,43 +288,27 @@ def update_user_profile():
         address = update_data.get('address')
 
         # 查找用户
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute('SELECT id FROM users WHERE id = %s', (user_id,))
-        if not c.fetchone():
-            conn.close()
-            return jsonify({'message': '用户不存在'}), 404
-
-        # 更新用户信息
-        c.execute('''UPDATE users SET username = %s, email = %s, phone = %s, organization = %s, address = %s
-                     WHERE id = %s''',
-                  (username, email, phone, organization, address, user_id))
-        conn.commit()
-        conn.close()
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT id FROM users WHERE id = %s', (user_id,))
+            if not c.fetchone():
+                return jsonify({'message': '用户不存在'}), 404
+
+            # 更新用户信息
+            c.execute('''UPDATE users SET username = %s, email = %s, phone = %s, organization = %s, address = %s
+                         WHERE id = %s''',
+                      (username, email, phone, organization, address, user_id))
+            conn.commit()
 
         return jsonify({'message': '个人信息更新成功'}), 200
-    except jwt.ExpiredSignatureError:
-        return jsonify({'message': '认证令牌已过期'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'message': '无效的认证令牌'}), 401
     except Exception as e:
         return jsonify({'message': f'更新个人信息失败: {str(e)}'}), 500
 
 @user_bp.route('/api/change-password', methods=['POST'])
+@login_required
 def change_password():
-    # 从Authorization头中获取token
-    token = request.headers.get('Authorization') or request.headers.get('authorization')
-    if not token:
-        return jsonify({'message': '缺少认证令牌'}), 401
-
-    # 移除Bearer前缀
-    if token.startswith('Bearer '):
-        token = token[7:]
-
     try:
-        # 解码token
-        data = jwt.decode(token, FLASK_CONFIG['SECRET_KEY'], algorithms=['HS256'])
-        user_id = data['user_id']
+        user_id = g.user['user_id']
 
         # 获取请求数据
         password_data = request.get_json()
@@ -320,29 +316,24 @@ def change_password():
         new_password = password_data['new_password']
 
         # 校验当前密码
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute('SELECT password FROM users WHERE id = %s', (user_id,))
-        result = c.fetchone()
-        if not result:
-            conn.close()
-            return jsonify({'message': '用户不存在'}), 404
-        stored_password = result[0]
-        if not bcrypt.checkpw(current_password.encode('utf-8'), stored_password.encode('utf-8')):
-            conn.close()
-            return jsonify({'message': '当前密码错误'}), 400
-
-        # 更新密码
-        hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        c.execute('UPDATE users SET password = %s WHERE id = %s', (hashed_password, user_id))
-        conn.commit()
-        conn.close()
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT password FROM users WHERE id = %s', (user_id,))
+            result = c.fetchone()
+            if not result:
+                return jsonify({'message': '用户不存在'}), 404
+            stored_password = result[0]
+            if not verify_password(current_password, stored_password):
+                return jsonify({'message': '当前密码错误'}), 400
+
+            # 更新密码
+            hashed_password = hash_password(new_password)
+            c.execute('UPDATE users SET password = %s WHERE id = %s', (hashed_password, user_id))
+            conn.commit()
 
         return jsonify({'message': '密码修改成功'}), 200
-    except jwt.ExpiredSignatureError:
-        return jsonify({'message': '认证令牌已过期'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'message': '无效的认证令牌'}), 401
+    except PasswordServiceBusy as e:
+        return jsonify({'message': str(e)}), 429
     except Exception as e:
         return jsonify({'message': f'修改密码失败: {str(e)}'}), 500
 
@@ -351,26 +342,26 @@ def change_password():
 @admin_required
 def reset_user_password(user_id):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
+        with db_connection() as conn:
+            c = conn.cursor()
 
-        # 检查用户是否存在
-        c.execute('SELECT id FROM users WHERE id = %s', (user_id,))
-        if not c.fetchone():
-            conn.close()
-            return jsonify({'message': '用户不存在'}), 404
+            # 检查用户是否存在
+            c.execute('SELECT id FROM users WHERE id = %s', (user_id,))
+            if not c.fetchone():
+                return jsonify({'message': '用户不存在'}), 404
 
-        # 生成默认密码的哈希值
-        default_password = '123456'
-        hashed_password = bcrypt.hashpw(default_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+            # 生成默认密码的哈希值
+            default_password = '123456'
+            hashed_password = hash_password(default_password)
 
-        # 更新用户密码
-        c.execute('UPDATE users SET password = %s WHERE id = %s', (hashed_password, user_id))
-        conn.commit()
-        conn.close()
+            # 更新用户密码
+            c.execute('UPDATE users SET password = %s WHERE id = %s', (hashed_password, user_id))
+            conn.commit()
 
         return jsonify({'message': '密码重置成功，新密码为 "123456"'}), 200
 
+    except PasswordServiceBusy as e:
+        return jsonify({'message': str(e)}), 429
     except Exception as e:
         return jsonify({'message': f'重置密码失败: {str(e)}'}), 500
 
@@ -379,30 +370,31 @@ def reset_user_password(user_id):
 @admin_required
 def update_user(user_id):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-
-        # 检查用户是否存在
-        c.execute('SELECT id FROM users WHERE id = %s', (user_id,))
-        if not c.fetchone():
-            conn.close()
-            return jsonify({'message': '用户不存在'}), 404
-
-        # 获取更新数据
-        update_data = request.get_json()
-        username = update_data.get('username')
-        email = update_data.get('email')
-        phone = update_data.get('phone')
-        organization = update_data.get('organization')
-        address = update_data.get('address')
-        is_admin = update_data.get('is_admin', 0)
-
-        # 更新用户信息
-        c.execute('''UPDATE users SET username = %s, email = %s, phone = %s, organization = %s, address = %s, is_admin = %s
-                     WHERE id = %s''',
-                  (username, email, phone, organization, address, is_admin, user_id))
-        conn.commit()
-        conn.close()
+        with db_connection() as conn:
+            c = conn.cursor()
+
+            # 检查用户是否存在
+            c.execute('SELECT id FROM users WHERE id = %s', (user_id,))
+            if not c.fetchone():
+                return jsonify({'message': '用户不存在'}), 404
+
+            # 获取更新数据
+            update_data = request.get_json()
+            username = update_data.get('username')
+            email = update_data.get('email')
+            phone = update_data.get('phone')
+            organization = update_data.get('organization')
+            address = update_data.get('address')
+            is_admin = update_data.get('is_admin', 0)
+
+            # 更新用户信息
+            c.execute('''UPDATE users SET username = %s, email = %s, phone = %s, organization = %s, address = %s, is_admin = %s
+                         WHERE id = %s''',
+                      (username, email, phone, organization, address, is_admin, user_id))
+            conn.commit()
+
+        # 管理员标记可能变化，清除该用户的认证缓存
+        invalidate_user(user_id)
 
         return jsonify({'message': '用户信息更新成功'}), 200
 
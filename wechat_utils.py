@@ -1,8 +1,8 @@
-import requests
 import json
 import base64
 from Crypto.Cipher import AES
 from config import WECHAT_CONFIG
+from http_client import wechat_client
 
 # WXBizDataCrypt类，用于解密微信数据
 class WXBizDataCrypt:
@@ -34,33 +34,29 @@ class WXBizDataCrypt:
 
 # 获取微信access_token
 def get_wechat_access_token(code):
-    app_id = WECHAT_CONFIG['app_id']
-    app_secret = WECHAT_CONFIG['app_secret']
-    
-    access_token_url = f'https://api.weixin.qq.com/sns/oauth2/access_token?appid={app_id}&secret={app_secret}&code={code}&grant_type=authorization_code'
-    access_token_response = requests.get(access_token_url)
-    access_token_data = access_token_response.json()
-    
-    return access_token_data
+    return wechat_client.get_json(f"{WECHAT_CONFIG['api_base']}/sns/oauth2/access_token", params={
+        'appid': WECHAT_CONFIG['app_id'],
+        'secret': WECHAT_CONFIG['app_secret'],
+        'code': code,
+        'grant_type': 'authorization_code'
+    })
 
 # 获取微信用户信息
 def get_wechat_user_info(access_token, openid):
-    user_info_url = f'https://api.weixin.qq.com/sns/userinfo?access_token={access_token}&openid={openid}&lang=zh_CN'
-    user_info_response = requests.get(user_info_url)
-    user_info = user_info_response.json()
-    
-    return user_info
+    return wechat_client.get_json(f"{WECHAT_CONFIG['api_base']}/sns/userinfo", params={
+        'access_token': access_token,
+        'openid': openid,
+        'lang': 'zh_CN'
+    })
 
 # 获取微信session_key
 def get_wechat_session_key(code):
-    app_id = WECHAT_CONFIG['app_id']
-    app_secret = WECHAT_CONFIG['app_secret']
-    
-    session_url = f'https://api.weixin.qq.com/sns/jscode2session?appid={app_id}&secret={app_secret}&js_code={code}&grant_type=authorization_code'
-    session_response = requests.get(session_url)
-    session_data = session_response.json()
-    
-    return session_data
+    return wechat_client.get_json(f"{WECHAT_CONFIG['api_base']}/sns/jscode2session", params={
+        'appid': WECHAT_CONFIG['app_id'],
+        'secret': WECHAT_CONFIG['app_secret'],
+        'js_code': code,
+        'grant_type': 'authorization_code'
+    })
 
 # 解密微信手机号
 def decrypt_wechat_phone(app_id, session_key, encrypted_data, iv):
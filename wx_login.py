@@ -1,12 +1,12 @@
 from flask import Blueprint, request, jsonify, redirect
 import uuid
-import bcrypt
 import jwt
 import datetime
-import requests
 from db_init import get_db_connection
 from wechat_utils import get_wechat_access_token, get_wechat_user_info, get_wechat_session_key, decrypt_wechat_phone
 from config import WECHAT_CONFIG, FLASK_CONFIG
+from passwords import UNUSABLE_PASSWORD
+from http_client import HttpClientError
 
 # 创建蓝图
 wx_login_bp = Blueprint('wx_login', __name__)
@@ -88,57 +88,58 @@ def wx_login():
             conn = get_db_connection()
             c = conn.cursor()
 
-            # 检查微信用户是否已存在
-            c.execute('SELECT id FROM users WHERE wechat_openid = %s', (openid,))
-            existing_user = c.fetchone()
-
-            if not existing_user:
-                # 创建新的微信用户
-                user_id = str(uuid.uuid4())  # 生成UUID作为用户ID
-                email = f'{openid}@wechat.com'
-                hashed_password = bcrypt.hashpw('wechat'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                c.execute('''INSERT INTO users (id, username, email, password, phone, organization, is_admin, wechat_unionid, wechat_openid, is_wechat_user, address) 
-                             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)''',
-                          (user_id, nickname, email,
-                           hashed_password,
-                           phone, nickname, 0, user_info.get('unionId', ''), openid, 1, ''))
-                conn.commit()
-            else:
-                user_id = existing_user[0]
-                # 更新用户信息
-                c.execute('''UPDATE users SET username = %s, organization = %s, phone = %s 
-                             WHERE id = %s''',
-                          (nickname, nickname, phone, user_id))
-                conn.commit()
+            # 按openid插入或更新微信用户（一条语句）：微信用户不能用密码登录，保存不可用的密码标记，不做哈希；
+            # unionid为空时保存NULL，避免多个没有unionid的用户在唯一索引上冲突。
+            # 连接启用了FOUND_ROWS，信息未变化的更新影响行数也是1，无法和插入区分；
+            # 因此更新分支中调用 LAST_INSERT_ID(1) 作为标记：插入时 lastrowid 为0（表没有自增列），更新时为1
+            user_id = str(uuid.uuid4())  # 生成UUID作为用户ID
+            email = f'{openid}@wechat.com'
+            c.execute('''INSERT INTO users (id, username, email, password, phone, organization, is_admin, wechat_unionid, wechat_openid, is_wechat_user, address) 
+                         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                         ON DUPLICATE KEY UPDATE id = IF(LAST_INSERT_ID(1), id, id),
+                                                 username = VALUES(username), organization = VALUES(organization), phone = VALUES(phone)''',
+                      (user_id, nickname, email, UNUSABLE_PASSWORD,
+                       phone, nickname, 0, user_info.get('unionId') or None, openid, 1, ''))
+            created = not c.lastrowid
+            conn.commit()
+
+            user = {
+                'id': user_id,
+                'username': nickname,
+                'email': email,
+                'phone': phone,
+                'organization': nickname,
+                'is_admin': 0,
+                'is_wechat_user': 1
+            }
+            if not created:
+                # 已有用户：用户ID是UUID字符串，无法像自增ID那样通过 LAST_INSERT_ID(id) 带回，
+                # 只按openid唯一索引读取插入时无法确定的字段
+                c.execute('SELECT id, email, is_admin, is_wechat_user FROM users WHERE wechat_openid = %s', (openid,))
+                row = c.fetchone()
+                user.update({'id': row[0], 'email': row[1], 'is_admin': row[2], 'is_wechat_user': row[3]})
 
             # 生成JWT令牌
             token = jwt.encode(
-                {'user_id': user_id, 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)},
+                {'user_id': user['id'], 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)},
                 FLASK_CONFIG['SECRET_KEY'],
                 algorithm='HS256'
             )
 
-            # 查询完整的用户信息
-            c.execute('SELECT * FROM users WHERE id = %s', (user_id,))
-            user = c.fetchone()
-            conn.close()
-
             return jsonify({
                 'token': token,
-                'user': {
-                    'id': user[0],
-                    'username': user[1],
-                    'email': user[2],
-                    'phone': user[4],
-                    'organization': user[5],
-                    'is_admin': user[7] if len(user) > 7 else 0,
-                    'is_wechat_user': user[10] if len(user) > 10 else 0
-                }
+                'user': user
             }), 200
         except Exception as e:
             if conn:
                 conn.rollback()
             return jsonify({'error': f'数据库操作失败: {str(e)}'}), 500
+        finally:
+            if conn:
+                conn.close()
+    except HttpClientError as e:
+        # 微信接口超时、不可用或熔断中，提示客户端稍后重试
+        return jsonify({'error': f'微信服务暂时不可用: {str(e)}'}), 503
     except Exception as e:
         return jsonify({'error': f'微信登录失败: {str(e)}'}), 500
 